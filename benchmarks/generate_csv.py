@@ -0,0 +1,189 @@
+#!/usr/bin/env python
+# -*- coding:utf-8-*-
+"""
+ベンチマーク用の、ping応答結果のCSVファイルを生成するスクリプト
+
+README.mdの入力ファイルフォーマットで、確認日時順に並んだデータを書き出す。
+同じ引数と乱数のシードからは、いつも同じファイルを生成する。
+
+    python generate_csv.py out.csv --rows 1000000 --hosts 2000 --subnets 100
+"""
+import argparse
+import datetime
+import ipaddress
+import random
+from typing import Sequence
+
+# 確認日時の開始時刻
+START_TIME = datetime.datetime(2020, 10, 19, 0, 0, 0)
+# 応答時間の平均と、ばらつきの幅(ミリ秒)
+BASE_RESPONSE_TIME = 20
+RESPONSE_TIME_JITTER = 10
+
+
+class _Host(object):
+    """
+    1つのサーバアドレスの、生成途中の状態
+    """
+    __slots__ = [
+        'address',
+        'subnet_index',
+        'timeout_left',
+        'flap_left',
+        'spike_left',
+        'spike_factor'
+    ]
+
+    def __init__(self, address: str, subnet_index: int):
+        self.address = address
+        self.subnet_index = subnet_index
+        # 残りの無応答の回数
+        self.timeout_left = 0
+        # 残りの、無応答と応答を交互に繰り返す回数
+        self.flap_left = 0
+        # 残りの応答時間が大きくなる回数と、その倍率
+        self.spike_left = 0
+        self.spike_factor = 1
+
+
+def make_hosts(hosts: int, subnets: int, prefixlens: Sequence[int]
+               ) -> list[_Host]:
+    """
+    サーバアドレスをhosts個作成する。サーバアドレスはsubnets個のサブネットに順に振り分ける。
+    各サブネットのプレフィックス長はprefixlensから順に選び、サブネットは重ならないように並べる。
+    """
+    subnets = max(1, min(subnets, hosts))
+    per_subnet = -(-hosts // subnets)
+    networks = []
+    cursor = int(ipaddress.IPv4Address("10.0.0.0"))
+    for index in range(subnets):
+        prefixlen = prefixlens[index % len(prefixlens)]
+        size = 2 ** (32 - prefixlen)
+        if size < per_subnet + 2:
+            raise ValueError(
+                "prefixlen {0:} is too long for {1:} hosts per subnet".format(
+                    prefixlen, per_subnet))
+        # サブネットの境界にそろえる
+        cursor = -(-cursor // size) * size
+        networks.append((cursor, prefixlen))
+        cursor += size
+    result = []
+    for index in range(hosts):
+        subnet_index = index % subnets
+        base, prefixlen = networks[subnet_index]
+        address = ipaddress.IPv4Address(base + 1 + index // subnets)
+        result.append(_Host("{0:}/{1:}".format(address, prefixlen),
+                            subnet_index))
+    return result
+
+
+def generate(path: str, rows: int, hosts: int = 100, subnets: int = 10,
+             prefixlens: Sequence[int] = (16,), interval: int = 1,
+             timeout_rate: float = 0.001, burst_rate: float = 0.0005,
+             burst_length: int = 10, flap_rate: float = 0.0002,
+             flap_length: int = 10, spike_rate: float = 0.0005,
+             spike_length: int = 30, subnet_failure_rate: float = 0.001,
+             seed: int = 0) -> int:
+    """
+    rows行のCSVファイルをpathに書き出し、書き出した行数を返却する。
+    確認日時interval秒ごとに、すべてのサーバアドレスの応答結果を1行ずつ書き出す。
+    各サーバアドレスでは、1回ごとに次の確率で応答結果が変わる。
+        timeout_rate        : 1回だけ無応答になる
+        burst_rate          : 1〜burst_length回連続して無応答になる
+        flap_rate           : flap_length回の間、無応答と応答を交互に繰り返す
+        spike_rate          : spike_length回の間、応答時間が数倍になる
+        subnet_failure_rate : 同じサブネットのすべてのサーバアドレスが、
+                              1〜burst_length回連続して無応答になる
+    """
+    rnd = random.Random(seed)
+    host_list = make_hosts(hosts, subnets, prefixlens)
+    subnet_count = max(1, min(subnets, hosts))
+    written = 0
+    step = 0
+    with open(path, 'w', encoding='utf-8') as fd:
+        while written < rows:
+            log_time = (START_TIME + datetime.timedelta(
+                seconds=step * interval)).strftime("%Y%m%d%H%M%S")
+            # サブネット全体の故障
+            for subnet_index in range(subnet_count):
+                if rnd.random() < subnet_failure_rate:
+                    length = rnd.randint(1, burst_length)
+                    for host in host_list[subnet_index::subnet_count]:
+                        host.timeout_left = max(host.timeout_left, length)
+            lines = []
+            for host in host_list[:rows - written]:
+                lines.append("{0:},{1:},{2:}\n".format(
+                    log_time, host.address, _next_response(host, rnd, (
+                        timeout_rate, burst_rate, burst_length, flap_rate,
+                        flap_length, spike_rate, spike_length))))
+            fd.writelines(lines)
+            written += len(lines)
+            step += 1
+    return written
+
+
+def _next_response(host: _Host, rnd: random.Random, rates: tuple) -> str:
+    """
+    サーバアドレスの次の応答結果(無応答の場合は'-')を返却する。
+    """
+    (timeout_rate, burst_rate, burst_length, flap_rate, flap_length,
+     spike_rate, spike_length) = rates
+    if host.timeout_left <= 0 and host.flap_left <= 0:
+        value = rnd.random()
+        if value < timeout_rate:
+            host.timeout_left = 1
+        elif value < timeout_rate + burst_rate:
+            host.timeout_left = rnd.randint(1, burst_length)
+        elif value < timeout_rate + burst_rate + flap_rate:
+            host.flap_left = flap_length
+    if host.spike_left <= 0 and rnd.random() < spike_rate:
+        host.spike_left = spike_length
+        host.spike_factor = rnd.randint(3, 20)
+    timeout = False
+    if host.timeout_left > 0:
+        host.timeout_left -= 1
+        timeout = True
+    elif host.flap_left > 0:
+        host.flap_left -= 1
+        timeout = host.flap_left % 2 == 1
+    response_time = BASE_RESPONSE_TIME + rnd.randint(
+        -RESPONSE_TIME_JITTER, RESPONSE_TIME_JITTER)
+    if host.spike_left > 0:
+        host.spike_left -= 1
+        response_time *= host.spike_factor
+    return '-' if timeout else str(response_time)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="ベンチマーク用のping応答結果のCSVファイルを生成する")
+    parser.add_argument("path", help="出力するCSVファイルのパス")
+    parser.add_argument("--rows", type=int, default=10000, help="行数")
+    parser.add_argument("--hosts", type=int, default=100,
+                        help="サーバアドレスの数")
+    parser.add_argument("--subnets", type=int, default=10,
+                        help="サブネットの数")
+    parser.add_argument("--prefixlens", default="16",
+                        help="サブネットのプレフィックス長(カンマ区切りで複数指定できる)")
+    parser.add_argument("--interval", type=int, default=1,
+                        help="確認日時の間隔(秒)")
+    parser.add_argument("--timeout-rate", type=float, default=0.001)
+    parser.add_argument("--burst-rate", type=float, default=0.0005)
+    parser.add_argument("--burst-length", type=int, default=10)
+    parser.add_argument("--flap-rate", type=float, default=0.0002)
+    parser.add_argument("--flap-length", type=int, default=10)
+    parser.add_argument("--spike-rate", type=float, default=0.0005)
+    parser.add_argument("--spike-length", type=int, default=30)
+    parser.add_argument("--subnet-failure-rate", type=float, default=0.001)
+    parser.add_argument("--seed", type=int, default=0, help="乱数のシード")
+    args = parser.parse_args()
+    generate(args.path, args.rows, args.hosts, args.subnets,
+             [int(prefixlen) for prefixlen in args.prefixlens.split(',')],
+             args.interval, args.timeout_rate, args.burst_rate,
+             args.burst_length, args.flap_rate, args.flap_length,
+             args.spike_rate, args.spike_length, args.subnet_failure_rate,
+             args.seed)
+
+
+if __name__ == '__main__':
+    main()
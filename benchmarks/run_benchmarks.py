@@ -0,0 +1,247 @@
+#!/usr/bin/env python
+# -*- coding:utf-8-*-
+"""
+ResponseTimesのベンチマークスクリプト
+
+generate_csv.pyで生成したCSVファイルについて、取り込みと各検出メソッドの処理時間、
+最大メモリ使用量を行数ごとに計測し、結果をJSONファイルに保存する。
+基準の結果(--baseline)を指定した場合は比較し、閾値を超えて遅くなった項目があれば
+終了コード1で終了する。
+
+    python run_benchmarks.py --rows 1000,10000,100000 --output result.json
+    python run_benchmarks.py --rows 1000,10000,100000 --baseline result.json
+    python run_benchmarks.py --rows 1000 --max-import-ms 30
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import resource
+import re
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Callable, Optional
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(BENCHMARKS_DIR, "..", "src"))
+
+# 生成するデータの、1サーバアドレスあたりの行数とサブネットあたりのサーバアドレス数
+ROWS_PER_HOST = 1000
+HOSTS_PER_SUBNET = 10
+
+
+def measure(function: Callable[[], object], repeat: int) -> float:
+    """
+    functionをrepeat回呼び出し、最も短かった処理時間(秒)を返却する。
+    """
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def run_one(path: str, repeat: int) -> dict[str, float]:
+    """
+    1つのCSVファイルについて各処理の時間を計測する。
+    検出メソッドは検出途中の状態を保持するので、毎回新しいインスタンスで計測する。
+    """
+    import logging
+    from response_times import ResponseTimes
+    logging.getLogger("response_times").setLevel(logging.ERROR)
+
+    result = {"ingest": measure(lambda: ResponseTimes(path), repeat)}
+    detectors = {
+        "find_all_failure": lambda instance: instance.find_all_failure(2),
+        "find_all_high_load":
+            lambda instance: instance.find_all_high_load(5, 100),
+        "find_all_subnet_failure":
+            lambda instance: instance.find_all_subnet_failure(2),
+        "analyze": lambda instance: instance.analyze(2, (5, 100), 2),
+        "find_all_high_load_rollup":
+            lambda instance: instance.find_all_high_load_rollup(100),
+        "latency_percentiles": lambda instance: [
+            instance.latency_percentiles(address)
+            for address in instance.stats()["addresses"]]
+    }
+    for name, detector in detectors.items():
+        elapsed = []
+        for _ in range(repeat):
+            instance = ResponseTimes(path)
+            elapsed.append(measure(lambda: detector(instance), 1))
+        result[name] = min(elapsed)
+    result["live_ingest"] = measure(lambda: send_live(path), repeat)
+    # ru_maxrssはLinuxではKiB単位
+    result["peak_rss_mb"] = \
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return result
+
+
+def send_live(path: str) -> None:
+    """
+    LiveIngestServerにCSVファイルの内容をTCPで送り、すべて検出に反映されるまで待つ。
+    """
+    import asyncio
+    from response_times import LiveIngestServer, StreamingAnalyzer
+
+    async def run() -> None:
+        server = LiveIngestServer(StreamingAnalyzer(2, 5, 100, 2, live=True))
+        async with server:
+            reader, writer = await asyncio.open_connection(
+                *server.tcp_address)
+            with open(path, 'rb') as fd:
+                for block in iter(lambda: fd.read(1024 * 1024), b""):
+                    writer.write(block)
+                    await writer.drain()
+            # サーバが読み込みを終えて接続を閉じるのを待つ
+            writer.write_eof()
+            await reader.read()
+            writer.close()
+
+    asyncio.run(run())
+
+
+def measure_import_time(repeat: int) -> float:
+    """
+    新しいプロセスでresponse_timesをimportする時間(ミリ秒)を-X importtimeで計測し、
+    repeat回のうち最も短いものを返却する。
+    コンパイル済みのバイトコードを使うように、1回目は計測しない。
+    """
+    env = dict(os.environ)
+    env.pop("PYTHONDONTWRITEBYTECODE", None)
+    src_dir = os.path.join(BENCHMARKS_DIR, "..", "src")
+    best = None
+    with tempfile.TemporaryDirectory() as cache_dir:
+        for index in range(repeat + 1):
+            output = subprocess.run(
+                [sys.executable, "-X", "importtime",
+                 "-X", "pycache_prefix=" + cache_dir,
+                 "-c", "import response_times"],
+                check=True, stderr=subprocess.PIPE, text=True, env=env,
+                cwd=src_dir).stderr
+            # import time: self [us] | cumulative | imported package
+            match = re.search(r"\|\s*(\d+)\s*\|\s*response_times\s*$",
+                              output, re.MULTILINE)
+            elapsed = int(match.group(1)) / 1000
+            if index > 0 and (best is None or elapsed < best):
+                best = elapsed
+    return best
+
+
+def prepare(rows: int, data_dir: str, seed: int) -> str:
+    """
+    rows行のデータを生成して、そのパスを返却する。生成済みの場合はそれを使う。
+    """
+    sys.path.append(BENCHMARKS_DIR)
+    from generate_csv import generate
+    path = os.path.join(data_dir, "bench_{0:}_{1:}.csv".format(rows, seed))
+    if not os.path.exists(path):
+        hosts = max(1, rows // ROWS_PER_HOST)
+        generate(path + ".tmp", rows, hosts=hosts,
+                 subnets=max(1, hosts // HOSTS_PER_SUBNET), seed=seed)
+        os.replace(path + ".tmp", path)
+    return path
+
+
+def compare(result: dict, baseline: dict, threshold: float,
+            min_time: float = 0.0) -> list[str]:
+    """
+    resultとbaselineの同じ行数・項目の値を比較し、
+    baselineより(1 + threshold)倍を超えて大きくなった項目の説明の一覧を返却する。
+    処理時間がどちらもmin_time秒未満の項目は、誤差が大きいので比較しない。
+    """
+    regressions = []
+    for rows, metrics in result["results"].items():
+        base_metrics = baseline["results"].get(rows)
+        if base_metrics is None:
+            continue
+        for name, value in metrics.items():
+            base_value = base_metrics.get(name)
+            if not base_value:
+                continue
+            if name != "peak_rss_mb" and max(value, base_value) < min_time:
+                continue
+            ratio = value / base_value
+            if ratio > 1 + threshold:
+                regressions.append(
+                    "[{0:}] {1:}: {2:.4f} -> {3:.4f} ({4:+.0%})".format(
+                        rows, name, base_value, value, ratio - 1))
+    return regressions
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="ResponseTimesのベンチマーク")
+    parser.add_argument("--rows", default="1000,10000,100000",
+                        help="計測する行数(カンマ区切り、1e6のような表記もできる)")
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="各処理を繰り返す回数(最も短い時間を記録する)")
+    parser.add_argument("--data-dir", default=os.path.join(
+        BENCHMARKS_DIR, "data"), help="生成したデータを置くフォルダ")
+    parser.add_argument("--seed", type=int, default=0, help="乱数のシード")
+    parser.add_argument("--output", help="結果を保存するJSONファイル")
+    parser.add_argument("--baseline", help="比較する基準の結果のJSONファイル")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="基準より遅くなったとみなす割合")
+    parser.add_argument("--min-time", type=float, default=0.01,
+                        help="比較する処理時間の下限(秒)")
+    parser.add_argument("--max-import-ms", type=float,
+                        help="response_timesのimportにかかる時間(ミリ秒)の上限")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    # 最大メモリ使用量を行数ごとに計測するため、各行数は別のプロセスで計測する
+    if args.worker is not None:
+        print(json.dumps(run_one(args.worker, args.repeat)))
+        return 0
+
+    os.makedirs(args.data_dir, exist_ok=True)
+    result = {
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "repeat": args.repeat,
+        "results": {}
+    }
+    # importにかかる時間(ログの設定や、使わないモジュールの読み込みをしていないこと)
+    import_ms = measure_import_time(args.repeat)
+    result["results"]["import"] = {"import_ms": import_ms}
+    print("{0:>12}: import_ms={1:.1f}".format("import", import_ms))
+    for rows in (int(float(text)) for text in args.rows.split(',')):
+        path = prepare(rows, args.data_dir, args.seed)
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--worker", path,
+             "--repeat", str(args.repeat)],
+            check=True, stdout=subprocess.PIPE, text=True).stdout
+        metrics = json.loads(output.splitlines()[-1])
+        result["results"][str(rows)] = metrics
+        print("{0:>12} rows: ".format(rows) + ", ".join(
+            "{0:}={1:.4f}".format(name, value)
+            for name, value in metrics.items()))
+
+    if args.output is not None:
+        with open(args.output, 'w', encoding='utf-8') as fd:
+            json.dump(result, fd, indent=2)
+    if args.max_import_ms is not None and import_ms > args.max_import_ms:
+        print("REGRESSION import_ms {0:.1f} > {1:.1f}".format(
+            import_ms, args.max_import_ms))
+        return 1
+    if args.baseline is not None:
+        with open(args.baseline, 'r', encoding='utf-8') as fd:
+            baseline = json.load(fd)
+        regressions = compare(result, baseline, args.threshold,
+                              args.min_time)
+        for regression in regressions:
+            print("REGRESSION " + regression)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
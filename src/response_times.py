@@ -1,23 +1,70 @@
 #!/usr/bin/env python
 # -*- coding:utf-8-*-
+from __future__ import annotations
+import bisect
+import collections
 import datetime
 import functools
-import ipaddress
-from typing import Optional
+import heapq
+import itertools
+import math
+import mmap
+import operator
+import struct
+import sys
+import time
+from array import array
 import os
 
+# typingは読み込みに時間がかかるので、型ヒントは文字列のまま評価せず、型チェックのときだけ読み込む
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    from typing import (BinaryIO, Callable, Iterable, Iterator, Optional,
+                        Sequence, Union)
+
 ###################################
 # Loggerの初期化処理
 ###################################
-import json
-from logging import getLogger, config
-log_conf_path = os.path.join(
+# importの時間を短くするため、loggingの読み込みと設定は最初にログを出力するときに行う。
+# また、読み込み時間の長いモジュール(圧縮ファイル、並列処理など)は使うときに読み込む。
+LOG_CONFIG_PATH = os.path.join(
         os.path.dirname(os.path.abspath(__file__)),
         "log_config.json")
-with open(log_conf_path, 'r', encoding='utf-8') as f:
-    log_conf = json.load(f)
-config.dictConfig(log_conf)
-logger = getLogger(__name__)
+
+
+def configure_logging(path: Optional[str] = None) -> None:
+    """
+    ログの設定ファイル(省略した場合はlog_config.json)を読み込んで、loggingを設定する。
+    """
+    import json
+    import logging.config
+    with open(path if path is not None else LOG_CONFIG_PATH, 'r',
+              encoding='utf-8') as f:
+        logging.config.dictConfig(json.load(f))
+
+
+class _LazyLogger(object):
+    """
+    最初にログを出力するときにloggerを用意して、モジュールのloggerを置き換えるクラス
+
+    アプリケーションがloggingを設定していない(ルートロガーにハンドラがない)場合だけ
+    log_config.jsonで設定し、設定済みの場合はアプリケーションの設定を変えない。
+    """
+    __slots__ = []
+
+    def __getattr__(self, name: str):
+        global logger
+        import logging
+        if not logging.getLogger().handlers:
+            # log_config.jsonでルートロガーをINFOに設定する。
+            # このモジュールのloggerのレベルは設定せず、ルートロガーのレベルに従う
+            configure_logging()
+        real_logger = logging.getLogger(__name__)
+        logger = real_logger
+        return getattr(real_logger, name)
+
+
+logger = _LazyLogger()
 
 
 ###################################
@@ -59,6 +106,7 @@ def is_address(s_arg: str) -> bool:
     """
     与えられた引数の文字列がサーバアドレスになっているかを確認する。
     """
+    import ipaddress
     try:
         # ipaddress.IPv4Interfaceでは許可されるが、
         # 整数からIPアドレスへの変換は、ここでは許可しない。
@@ -81,296 +129,4015 @@ def is_response_time_result(s_arg: str) -> bool:
 
 
 ###################################
-class ResponseTimes(object):
+# サーバアドレスの内部表現
+###################################
+# サーバアドレスとサブネットは、IPv4アドレス(32ビット)とプレフィックス長(8ビット)を
+# 1つの整数(アドレス << 8 | プレフィックス長)にまとめて保持する。
+# サブネットはホスト部を0にしたもので、文字列にするのは出力するときだけ。
+_PREFIX_MASKS = tuple((0xFFFFFFFF << (32 - prefixlen)) & 0xFFFFFFFF
+                      for prefixlen in range(33))
+_DECIMAL_DIGITS = frozenset("0123456789")
+
+
+def _decimal(text: str, limit: int) -> Optional[int]:
     """
-    時系列の応答時間データクラス
+    先頭に0のつかない10進数の文字列で、limit以下のものを整数にする。それ以外はNoneを返却する。
+    """
+    if not text or len(text) > 3 or not _DECIMAL_DIGITS.issuperset(text) \
+       or (text[0] == '0' and len(text) > 1):
+        return None
+    value = int(text)
+    return value if value <= limit else None
+
+
+def _parse_address(text: str) -> Optional[int]:
+    """
+    サーバアドレスの文字列を内部表現の整数にする。サーバアドレスでない場合はNoneを返却する。
+    "10.20.30.1/16"のような一般的な形式はその場で変換し、それ以外の形式(ネットマスクでの
+    指定など)はis_address()と同じくipaddressで判定する。
+    """
+    host, separator, prefix = text.partition('/')
+    octets = host.split('.')
+    if len(octets) == 4:
+        prefixlen = _decimal(prefix, 32) if separator else 32
+        values = [_decimal(octet, 255) for octet in octets]
+        if prefixlen is not None and None not in values:
+            return (values[0] << 32 | values[1] << 24 | values[2] << 16
+                    | values[3] << 8 | prefixlen)
+    if not is_address(text):
+        return None
+    import ipaddress
+    address = ipaddress.IPv4Interface(text)
+    return int(address.ip) << 8 | address.network.prefixlen
+
+
+def _network_keys(keys: Iterable[int]) -> list[int]:
+    """
+    サーバアドレスの内部表現の並びから、それぞれの属するサブネットの内部表現の一覧を返却する。
+    """
+    masks = _PREFIX_MASKS
+    return [(key >> 8 & masks[key & 0xFF]) << 8 | (key & 0xFF)
+            for key in keys]
+
+
+@functools.lru_cache(maxsize=65536)
+def _format_address(key: int) -> str:
+    """
+    サーバアドレス(サブネット)の内部表現を"10.20.30.1/16"の形式の文字列にする。
+    """
+    ip = key >> 8
+    return "{0:}.{1:}.{2:}.{3:}/{4:}".format(
+        ip >> 24, ip >> 16 & 0xFF, ip >> 8 & 0xFF, ip & 0xFF, key & 0xFF)
+
+
+# 検出結果のキャッシュの状況
+CacheInfo = collections.namedtuple(
+    'CacheInfo', ['hits', 'misses', 'currsize'])
+
+
+class Period(object):
+    """
+    iter_failures(), iter_high_loads(), iter_subnet_failures()で検出した1つの期間
+
+    時刻は経過秒数(to_datetime()で日時にできる)のまま保持し、
+    サーバアドレス(サブネット)や期間の文字列は、参照したときに作成する。
+        kind        : 検出の種類(failure, high_load, subnet_failure)
+        start_time  : 開始時刻
+        last_time   : 最後の無応答(過負荷)時刻
+        return_time : 復帰時刻(継続中の場合はNone)
     """
     __slots__ = [
-        '_records',
-        '_subnets'
+        'kind',
+        '_key',
+        'start_time',
+        'last_time',
+        'return_time'
     ]
-    # サブネット内のサーバーアドレス内の障害期間の許容誤差
-    # (pingのデフォルトタイムアウト時間4秒 + デフォルトinterval 1秒?)とした
-    DEFAULT_SUBNET_FAILURE_TOLERANCE = 4 + 1
 
-    def __init__(self, csv_file_path: str):
-        self._records: dict[ipaddress.IPv4Interface, dict[datetime.datetime, str]] = {}
-        self._subnets: dict[ipaddress.IPv4Network, list[ipaddress.IPv4Interface]] = {}
-        self._import_csv(csv_file_path)
+    def __init__(self, kind: str, key: int, start_time: int, last_time: int,
+                 return_time: Optional[int]):
+        self.kind = kind
+        self._key = key
+        self.start_time = start_time
+        self.last_time = last_time
+        self.return_time = return_time
 
-    def _import_csv(self, file_path: str) -> None:
+    @property
+    def address(self) -> Optional[str]:
         """
-        指定されたパスのCSVファイルを読み込む
+        サーバアドレス(サブネットの故障期間の場合はNone)
         """
-        def is_valid_csv(file_path: str) -> bool:
-            if not os.path.isfile(file_path):
-                return False
-            if not os.access(file_path, os.R_OK):
-                return False
-            return True
+        if self.kind == "subnet_failure":
+            return None
+        return _format_address(self._key)
 
-        def is_valid_line(line: str) -> bool:
-            elements = line.strip().split(',')
-            if len(elements) >= 3:
-                if not is_datetime(elements[0].strip()):
-                    return False
-                if not is_address(elements[1].strip()):
-                    return False
-                if not is_response_time_result(elements[2].strip()):
-                    return False
-            else:
-                return False
-            return True
+    @property
+    def subnet(self) -> Optional[str]:
+        """
+        サブネット(サーバアドレスの期間の場合はNone)
+        """
+        if self.kind != "subnet_failure":
+            return None
+        return _format_address(self._key)
 
-        def conv_to_datetime(arg: str) -> datetime.datetime:
-            year = int(arg[0:4])
-            month = int(arg[4:6])
-            day = int(arg[6:8])
-            hour = int(arg[8:10])
-            minute = int(arg[10:12])
-            second = int(arg[12:14])
-            return datetime.datetime(year, month, day, hour, minute, second)
+    @property
+    def end_time(self) -> int:
+        """
+        終了時刻(復帰時刻、継続中の場合は最後の無応答(過負荷)時刻)
+        """
+        return self.return_time if self.return_time is not None \
+            else self.last_time
 
-        if is_valid_csv(file_path):
-            logger.info("Started importing csv: {0:}".format(file_path))
-            with open(file_path, "r", encoding="utf-8") as fd:
-                line_num = 1
-                while True:
-                    line = fd.readline()
-                    if not line:
-                        break
-                    if is_valid_line(line):
-                        elements = line.split(',')
-                        log_datetime = conv_to_datetime(elements[0].strip())
-                        address = ipaddress.IPv4Interface(elements[1].strip())
-                        response_time = elements[2].strip()
-                        if address not in self._records:
-                            self._records[address] = {}
-                        self._records[address][log_datetime] = response_time
-                    else:
-                        logger.warning("Skipped line({0:}): {1:}".format(
-                                                              line_num, line))
-                    line_num += 1
-            self._parse_subnet()
-            logger.info("Completed.")
-        else:
-            logger.error("Failed to import csv: {0:}".format(file_path))
+    @property
+    def start(self) -> datetime.datetime:
+        """
+        開始時刻のdatetime
+        """
+        return to_datetime(self.start_time)
 
-    def _parse_subnet(self):
+    @property
+    def end(self) -> datetime.datetime:
         """
-        サーバアドレスからサブネットを特定して、サブネット内のサーバアドレスの一覧を作成する。
+        終了時刻(end_time)のdatetime
         """
-        def get_subnet(address: str) -> ipaddress.IPv4Network:
-            return ipaddress.IPv4Interface(address).network
+        return to_datetime(self.end_time)
 
-        for address in self._records.keys():
-            subnet = get_subnet(address)
-            if subnet not in self._subnets:
-                self._subnets[subnet] = []
-            self._subnets[subnet].append(address)
+    @property
+    def period(self) -> str:
+        """
+        find_all_*()の結果と同じ形式の期間の文字列
+        """
+        return _format_period(self.start_time, self.last_time,
+                              self.return_time)
 
-    def _find_failure(self, address: ipaddress.IPv4Interface,
-                      threshold: int) -> list[dict]:
+    def to_dict(self) -> dict[str, str]:
         """
-        指定したサーバアドレスの故障期間を返却する。
+        find_all_*()の結果と同じ形式の辞書にする。
         """
-        result = []
-        records = self._records[address]
-        failed_count = 0  # レスポンスがない記録の回数
-        fail_start_time = None
-        last_failed_time = None
-        for log_datetime, response_time in sorted(
-                                records.items(), key=lambda x: x[0]):
-            if response_time == '-':
-                if failed_count <= 0:
-                    fail_start_time = log_datetime
-                failed_count += 1
-                last_failed_time = log_datetime
-            elif failed_count >= 1:
-                if failed_count >= threshold:
-                    result.append({
-                        "address": address,
-                        "occurrance_time": fail_start_time,
-                        "last_failed_time": last_failed_time,
-                        "return_time": log_datetime
-                        })
-                fail_start_time = None
-                last_failed_time = None
-                failed_count = 0
+        name = "subnet" if self.kind == "subnet_failure" else "address"
+        return {name: _format_address(self._key), "period": self.period}
+
+    def _astuple(self) -> tuple:
+        return (self.kind, self._key, self.start_time, self.last_time,
+                self.return_time)
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, Period):
+            return NotImplemented
+        return self._astuple() == other._astuple()
+
+    def __hash__(self) -> int:
+        return hash(self._astuple())
+
+    def __repr__(self) -> str:
+        name = "subnet" if self.kind == "subnet_failure" else "address"
+        return "Period(kind={0!r}, {1:}={2!r}, period={3!r})".format(
+            self.kind, name, _format_address(self._key), self.period)
+
+
+# スナップショットファイルの識別子・形式のバージョンと、各部の構造
+_SNAPSHOT_MAGIC = b"RTSNAP\x00\x01"
+_SNAPSHOT_VERSION = 2
+_SNAPSHOT_HEADER = struct.Struct('<8sIII')
+_SNAPSHOT_ADDRESS = struct.Struct('<IB3xQQ')
+_SNAPSHOT_SUBNET = struct.Struct('<IB3xI')
+# 削除したデータから引き継いだ状態(形式のバージョン2以降)
+_SNAPSHOT_CARRY_COUNT = struct.Struct('<I')
+_SNAPSHOT_CARRY = struct.Struct('<I?3xQqqqqI')
+_SNAPSHOT_HIGH_LOAD_CARRY = struct.Struct('<Id??2xqqI')
+
+
+def _pack_carry(index: int, state: tuple) -> bytes:
+    """
+    サーバアドレス表での位置indexのサーバアドレスの、_Series.carry_state()の組をバイト列にする。
+    """
+    evicted, evicted_until, failure_carry, high_load_carry = state
+    parts = [_SNAPSHOT_CARRY.pack(
+        index, evicted_until is not None, evicted,
+        evicted_until if evicted_until is not None else 0,
+        *failure_carry, len(high_load_carry))]
+    for (threshold_count, threshold_average), (head, (start, last)) \
+            in high_load_carry.items():
+        parts.append(_SNAPSHOT_HIGH_LOAD_CARRY.pack(
+            threshold_count, threshold_average,
+            start is not None, last is not None,
+            start if start is not None else 0,
+            last if last is not None else 0, len(head)))
+        parts.append(_little_endian_bytes(head))
+    return b"".join(parts)
+
+
+def _unpack_carry(view: memoryview, position: int
+                  ) -> tuple[int, tuple, int]:
+    """
+    _pack_carry()で作成したバイト列を読み込み、
+    (サーバアドレス表での位置, carry_state()の組, 次の位置)を返却する。
+    """
+    (index, has_until, evicted, evicted_until, failed_count, fail_start,
+     fail_last, key_count) = _SNAPSHOT_CARRY.unpack_from(view, position)
+    position += _SNAPSHOT_CARRY.size
+    high_load_carry = {}
+    for _ in range(key_count):
+        (threshold_count, threshold_average, has_start, has_last, start,
+         last, head_count) = _SNAPSHOT_HIGH_LOAD_CARRY.unpack_from(
+             view, position)
+        position += _SNAPSHOT_HIGH_LOAD_CARRY.size
+        head = array('i', struct.unpack_from(
+            '<{0:}i'.format(head_count), view, position))
+        position += head_count * 4
+        high_load_carry[(threshold_count, threshold_average)] = (
+            head, (start if has_start else None, last if has_last else None))
+    return index, (evicted, evicted_until if has_until else None,
+                   (failed_count, fail_start, fail_last),
+                   high_load_carry), position
+
+
+def _check_shared_memory_space(size: int) -> None:
+    """
+    共有メモリ(/dev/shm)にsizeバイトの空きがなければOSErrorにする。
+    空きを超えて書き込むとSIGBUSで終了してしまうので、作成する前に確認する。
+    """
+    if not os.path.isdir("/dev/shm"):
+        return
+    stat = os.statvfs("/dev/shm")
+    if stat.f_bavail * stat.f_frsize < size:
+        raise OSError("Not enough shared memory: {0:} bytes".format(size))
+
+
+# このプロセスでpublish_shared()で作成した共有メモリの名前
+_published_shared_memory: set[str] = set()
+
+
+def _attach_shared_memory(name: str) -> 'shared_memory.SharedMemory':
+    """
+    作成済みの共有メモリを開く。
+    Python 3.12以前は、開いただけのプロセスの終了時にも共有メモリが削除されてしまうので、
+    開いたあとに削除の対象から外す。
+    (同じプロセスで作成した共有メモリは、作成したときの登録も外れてしまうので外さない)
+    """
+    from multiprocessing import resource_tracker, shared_memory
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name, track=False)
+    shared = shared_memory.SharedMemory(name)
+    if shared._name not in _published_shared_memory:
+        resource_tracker.unregister(shared._name, "shared_memory")
+    return shared
+
+
+def _align8(size: int) -> int:
+    """
+    sizeを8の倍数に切り上げる。
+    """
+    return (size + 7) & ~7
+
+
+def _little_endian_bytes(values: Sequence[int]) -> bytes:
+    """
+    配列(またはmemoryview)の内容をリトルエンディアンのバイト列にする。
+    """
+    if sys.byteorder == 'little':
+        return values.tobytes()
+    swapped = array(values.typecode if isinstance(values, array)
+                    else values.format, values)
+    swapped.byteswap()
+    return swapped.tobytes()
+
+
+def _view_as(view: memoryview, typecode: str) -> Sequence[int]:
+    """
+    リトルエンディアンのバイト列を、指定した型の値の並びとして参照する。
+    ビッグエンディアンの環境では、並べ替えた配列にコピーする。
+    """
+    if sys.byteorder == 'little':
+        return view.cast(typecode)
+    values = array(typecode)
+    values.frombytes(view)
+    values.byteswap()
+    return values
+
+
+###################################
+# 列指向の時系列データ
+###################################
+# 応答結果がタイムアウト("-")であったことを表す値
+TIMEOUT = -1
+# 応答時間として保持できる最大値(int32)
+MAX_RESPONSE_TIME = 2 ** 31 - 1
+# 確認日時を整数の秒で保持するときの基準日時
+_EPOCH = datetime.datetime(1970, 1, 1)
+
+
+def to_seconds(log_datetime: datetime.datetime) -> int:
+    """
+    確認日時を基準日時からの経過秒数に変換する。
+    """
+    delta = log_datetime - _EPOCH
+    return delta.days * 86400 + delta.seconds
+
+
+def to_datetime(seconds: int) -> datetime.datetime:
+    """
+    基準日時からの経過秒数を確認日時に変換する。
+    """
+    return _EPOCH + datetime.timedelta(seconds=seconds)
+
+
+def _parse_minute(text: str) -> Optional[int]:
+    """
+    確認日時の文字列の先頭12桁(分まで)を経過秒数に変換する。
+    日時として正しくない場合はNoneを返却する。
+    """
+    try:
+        year = int(text[0:4])
+        month = int(text[4:6])
+        day = int(text[6:8])
+        hour = int(text[8:10])
+        minute = int(text[10:12])
+        return to_seconds(
+            datetime.datetime(year, month, day, hour, minute))
+    except ValueError:
+        return None
+
+
+def _expand_paths(paths: Union[str, Iterable[str]]) -> list[str]:
+    """
+    パスのリスト(または1つのパス)のうち、ワイルドカードを含むものを展開する。
+    展開したパスは名前順に並べる。
+    """
+    import glob
+    if isinstance(paths, str):
+        paths = [paths]
+    result = []
+    for path in paths:
+        if any(character in path for character in '*?['):
+            result.extend(sorted(glob.glob(path)))
         else:
-            # 応答が復帰したデータがみつからず最後に至ったら、最後の無応答時間までを故障期間にする。
-            if failed_count >= threshold:
-                result.append({
-                    "address": address,
-                    "occurrance_time": fail_start_time,
-                    "last_failed_time": last_failed_time,
-                    "return_time": None
-                    })
-        return result
+            result.append(path)
+    return result
+
+
+def _open_binary(file_path: str) -> BinaryIO:
+    """
+    ファイルをバイナリモードで開く。拡張子が.gz, .bz2の場合は圧縮を展開しながら読み込む。
+    """
+    if file_path.endswith('.gz'):
+        import gzip
+        return gzip.open(file_path, 'rb')
+    if file_path.endswith('.bz2'):
+        import bz2
+        return bz2.open(file_path, 'rb')
+    return open(file_path, 'rb')
+
+
+def _split_lines(block: bytes) -> tuple[list[str], bool]:
+    """
+    読み込んだバイト列を行のリストに分割する。
+    改行文字はテキストモードと同じく\\r\\n, \\rも行末として扱い、行には含めない。
+    最後の行が改行で終わっているかどうかもあわせて返却する。
+    """
+    text = block.decode('utf-8')
+    if '\r' in text:
+        text = text.replace('\r\n', '\n').replace('\r', '\n')
+    lines = text.split('\n')
+    terminated = lines[-1] == ''
+    if terminated:
+        lines.pop()
+    return lines, terminated
+
+
+def _read_line_blocks(fd, block_size: int, partial: bool = True
+                      ) -> Iterator[tuple[list[str], bool, int]]:
+    """
+    バイナリモードで開いたファイルからblock_sizeバイト程度ずつ読み込み、
+    行単位に区切った行のリストと、そのバイト数を返却する。
+    partialがFalseの場合、改行で終わっていない最後の行は返却しない。
+    """
+    rest = b''
+    while True:
+        chunk = fd.read(block_size)
+        if not chunk:
+            break
+        end = chunk.rfind(b'\n')
+        if end < 0:
+            rest += chunk
+            continue
+        block = rest + chunk[:end + 1] if rest else chunk[:end + 1]
+        rest = chunk[end + 1:]
+        yield _split_lines(block) + (len(block),)
+    if rest and partial:
+        yield _split_lines(rest) + (len(rest),)
 
-    def find_all_failure(self, threshold: int = 1) -> list[dict[str, str]]:
+
+def _to_array(typecode: str, values: Sequence[int]) -> array:
+    """
+    配列またはmemoryviewを、指定した型の配列にコピーする。
+    """
+    if isinstance(values, array):
+        return array(typecode, values)
+    result = array(typecode)
+    result.frombytes(values.cast('B'))
+    return result
+
+
+class _Series(object):
+    """
+    1つのサーバアドレスの時系列の応答時間データ
+
+    確認日時(経過秒数)をint64、応答時間(ミリ秒)をint32の配列で保持する。
+    タイムアウトは応答時間にTIMEOUTを入れて表す。
+    """
+    __slots__ = [
+        'times',
+        'responses',
+        'revision',
+        '_sorted',
+        '_committed',
+        '_pending_times',
+        '_pending_responses',
+        'duplicates',
+        'evicted',
+        'evicted_until',
+        'failure_carry',
+        'high_load_carry'
+    ]
+
+    def __init__(self):
+        self.times = array('q')
+        self.responses = array('i')
+        # 確定済みのデータが書き換えられるたびに増える番号
+        self.revision = 0
+        # 同じ確認日時のデータで上書きした件数
+        self.duplicates = 0
+        # 保持期間を過ぎて削除したデータの件数と、その最後の確認日時
+        self.evicted = 0
+        self.evicted_until: Optional[int] = None
+        # 削除したデータを走査し終えた時点の、無応答の連続区間の検出途中の状態
+        # (無応答の回数, 開始時刻, 最後の無応答時刻)。先頭から走査するときはこの状態から始める。
+        self.failure_carry: tuple[int, int, int] = (0, 0, 0)
+        # 過負荷の区間の検出の閾値(threshold_count, threshold_average)ごとの、
+        # 削除したデータのうち最後のthreshold_count件の応答時間と、
+        # 削除した時点の継続中の区間の(開始時刻, 最後の過負荷時刻)
+        self.high_load_carry: dict[tuple[int, float],
+                                   tuple[array, tuple]] = {}
+        self._sorted = True
+        # 確定済み(normalize済み)のデータ件数
+        self._committed = 0
+        # まとめて配列に追加するまでの一時的なデータ
+        self._pending_times: list[int] = []
+        self._pending_responses: list[int] = []
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+    def append(self, log_time: int, response_time: int) -> None:
         """
-        故障状態のサーバーアドレスと、そのサーバーの故障期間を返却する。
+        1件の応答結果を追加する。
+        同じ確認日時のデータが続いた場合は、あとに追加したほうで上書きする。
         """
-        result = []
-        if threshold <= 0:
-            threshold = 1
-        for address in self._records:
-            failures = self._find_failure(address, threshold)
-            for failure in failures:
-                end_time = failure['return_time'] \
-                    if failure['return_time'] is not None \
-                    else failure['last_failed_time']
-                period = "{0:} ~ {1:}".format(
-                    failure['occurrance_time'], end_time)
-                result.append({"address": failure['address'].with_prefixlen,
-                               "period": period})
-        return result
+        times = self.times
+        if times:
+            last_time = times[-1]
+            if log_time == last_time:
+                if len(times) <= self._committed:
+                    self.revision += 1
+                self.responses[-1] = response_time
+                self.duplicates += 1
+                return
+            if log_time < last_time:
+                self._sorted = False
+        times.append(log_time)
+        self.responses.append(response_time)
 
-    def _find_high_load(self, address: ipaddress.IPv4Interface,
-                        threshold_count: int,
-                        threshold_average: float) -> list[dict]:
+    def pending_appenders(self) -> tuple:
         """
-        指定したサーバアドレスの過負荷期間を返却する。
+        一時的なデータに確認日時と応答時間を追加する関数の組を返却する。
+        追加したデータはflush()を呼ぶまで配列に反映されない。
         """
-        def average(response_times: list[str]) -> Optional[float]:
-            only_num_list = list(filter(is_positive_integer, response_times))
-            if len(only_num_list) <= 0:
-                return None
-            total = functools.reduce(
-                lambda x, y: str(int(x) + int(y)), only_num_list)
-            return int(total) / len(only_num_list)
+        return (self._pending_times.append, self._pending_responses.append)
 
-        result = []
-        records = self._records[address]
-        sorted_records = sorted(records.items(), key=lambda x: x[0])
-        # 直近threshold_count回分のデータ
-        cached_responses = []
-
-        load_start_time = None
-        last_load_time = None
-        for log_datetime, response_time in sorted_records:
-            cached_responses.append(response_time)
-            if len(cached_responses) > threshold_count:
-                cached_responses.pop(0)
-                recent_average = average(cached_responses)
-                if recent_average is not None \
-                   and recent_average >= threshold_average:
-                    if load_start_time is None:
-                        load_start_time = log_datetime
-                    last_load_time = log_datetime
-                elif load_start_time is not None:
-                    result.append({
-                        "address": address,
-                        "occurrance_time": load_start_time,
-                        "last_load_time": last_load_time,
-                        "return_time": log_datetime
-                        })
-                    load_start_time = None
-                    last_load_time = None
+    def flush(self) -> None:
+        """
+        一時的なデータをまとめて配列に追加する。
+        """
+        pending_times = self._pending_times
+        if not pending_times:
+            return
+        self._ensure_writable()
+        pending_responses = self._pending_responses
+        times = self.times
+        if (not times or times[-1] < pending_times[0]) \
+           and all(map(operator.lt, pending_times,
+                       itertools.islice(pending_times, 1, None))):
+            # 確認日時順に並んでいて重複もなければ、そのまま追加する
+            times.fromlist(pending_times)
+            self.responses.fromlist(pending_responses)
         else:
-            # 応答が復帰したデータがみつからず最後に至ったら、最後の無応答時間までを故障期間にする。
-            if load_start_time is not None:
-                result.append({
-                    "address": address,
-                    "occurrance_time": load_start_time,
-                    "last_load_time": last_load_time,
-                    "return_time": None
-                    })
-        return result
+            for log_time, response_time in zip(pending_times,
+                                               pending_responses):
+                self.append(log_time, response_time)
+        pending_times.clear()
+        pending_responses.clear()
 
-    def find_all_high_load(self, threshold_count: int,
-                           threshold_average: int) -> list[dict[str, str]]:
+    def normalize(self) -> None:
         """
-        直近threshold_count回の平均応答時間がthreshold_averageを超えていたら、
-        そのサーバが過負荷になっているとみなし、その期間を取得する。
+        確認日時順に並べ替え、重複した確認日時はあとに追加したデータを残す。
+        前回の確定以降に追加したデータがすべて確定済みのデータより新しい場合は、
+        追加分だけを並べ替える。そうでない場合は全体を並べ替え、revisionを増やす。
         """
-        result = []
-        for address in self._records:
-            high_loads = self._find_high_load(
-                address, threshold_count, threshold_average)
-            for high_load in high_loads:
-                end_time = high_load['return_time'] \
-                    if high_load['return_time'] is not None \
-                    else high_load['last_load_time']
-                period = "{0:} ~ {1:}".format(
-                                  high_load['occurrance_time'], end_time)
-                result.append(
-                    {"address": high_load['address'].with_prefixlen,
-                     "period": period})
-        return result
+        if not self._sorted:
+            times = self.times
+            responses = self.responses
+            start = self._committed
+            if start <= 0 or min(itertools.islice(times, start, None)) \
+                    <= times[start - 1]:
+                if start > 0:
+                    self.revision += 1
+                start = 0
+            # 安定ソートなので、同じ確認日時のデータは追加順に並ぶ
+            order = sorted(range(start, len(times)), key=times.__getitem__)
+            sorted_times = times[:start]
+            sorted_responses = responses[:start]
+            for index in order:
+                log_time = times[index]
+                if len(sorted_times) > start \
+                   and sorted_times[-1] == log_time:
+                    sorted_responses[-1] = responses[index]
+                    self.duplicates += 1
+                else:
+                    sorted_times.append(log_time)
+                    sorted_responses.append(responses[index])
+            self.times = sorted_times
+            self.responses = sorted_responses
+            self._sorted = True
+        self._committed = len(self.times)
 
-    def _find_subnet_failure(self, subnet: ipaddress.IPv4Network,
-                             threshold_count: int,
-                             tolerance: int = None
-                             ) -> list[dict]:
+    def _ensure_writable(self) -> None:
         """
-        指定したサブネットの故障期間を返却する。
+        スナップショットのメモリマップ上のデータを参照している場合は、
+        追加できるように配列にコピーする。
         """
-        def is_in_tolerance(left: datetime.datetime, right: datetime.datetime,
-                            tolerance: int) -> bool:
-            dt = datetime.timedelta(seconds=tolerance)
-            if (right - dt) <= left and left <= (right + dt):
-                return True
-            return False
+        if not isinstance(self.times, array):
+            self.times = _to_array('q', self.times)
+            self.responses = _to_array('i', self.responses)
 
-        def nearly_equal(left_failure: dict,
-                         right_failure: dict, tolerance: int) -> bool:
-            if not is_in_tolerance(left_failure['occurrance_time'],
-                                   right_failure['occurrance_time'],
-                                   tolerance):
-                return False
-            l_end_time = left_failure['return_time'] \
-                if left_failure['return_time'] is not None \
-                else left_failure['last_failed_time']
-            r_end_time = right_failure['return_time'] \
-                if right_failure['return_time'] is not None \
-                else right_failure['last_failed_time']
-            if not is_in_tolerance(l_end_time, r_end_time, tolerance):
-                return False
-            return True
+    def evict(self, count: int, carry: bool = True) -> None:
+        """
+        先頭(最も古い)count件のデータを削除する。
+        carryを指定した場合は、削除したデータの無応答の連続区間の検出途中の状態を
+        failure_carryに、high_load_carryに登録した閾値の過負荷の区間の検出途中の状態を
+        high_load_carryに引き継ぐ。
+        """
+        if count <= 0:
+            return
+        self._ensure_writable()
+        if carry:
+            _, self.failure_carry = _scan_failures(
+                self.times, self.responses, 0, count, self.failure_carry)
+            for key, (head, state) in list(self.high_load_carry.items()):
+                threshold_count, threshold_average = key
+                responses = head + self.responses[:count]
+                _, state = _scan_high_loads(
+                    array('q', bytes(8 * len(head))) + self.times[:count],
+                    responses, len(head), len(responses),
+                    threshold_count, threshold_average, state)
+                self.high_load_carry[key] = (
+                    responses[len(responses) - min(
+                        threshold_count, len(responses)):], state)
+            self.evicted_until = self.times[count - 1]
+        del self.times[:count]
+        del self.responses[:count]
+        if not self.times:
+            # すべて削除した場合は、継続中の無応答・過負荷の区間も終了したものとみなす
+            self.failure_carry = (0, 0, 0)
+            for key in self.high_load_carry:
+                self.high_load_carry[key] = (array('i'), (None, None))
+        self.evicted += count
+        self._committed = max(self._committed - count, 0)
 
-        def includes(failures: list,
-                     target_failure: dict, tolerance: int) -> bool:
-            for failure in failures:
-                if nearly_equal(failure, target_failure, tolerance):
-                    return True
-            return False
+    @classmethod
+    def from_arrays(cls, times: Sequence[int],
+                    responses: Sequence[int]) -> '_Series':
+        """
+        確認日時順に並んだ配列から、確定済みのデータを生成する。
+        配列のかわりにメモリマップ上のmemoryviewを渡すこともできる。
+        """
+        series = cls()
+        series.times = times
+        series.responses = responses
+        series._committed = len(times)
+        return series
 
-        if tolerance is None:
-            tolerance = ResponseTimes.DEFAULT_SUBNET_FAILURE_TOLERANCE
-        # サブネットに属する2つの以上のホストがリストにない場合は、サブネットの故障とはしない
-        if len(self._subnets[subnet]) < 2:
-            return []
-        # 最初のホストの故障期間データをもとに他のホストの故障を調べる
-        first_address_failures = self._find_failure(
-                                     self._subnets[subnet][0], threshold_count)
-        result = [
-            {"subnet": subnet,
-             "occurrance_time": failure['occurrance_time'],
-             "last_failed_time": failure['last_failed_time'],
-             "return_time": failure['return_time']}
-            for failure in first_address_failures]
-        for address in self._subnets[subnet]:
-            address_failure = self._find_failure(address, threshold_count)
-            result = list(filter(
-                lambda r: includes(address_failure, r, tolerance), result))
-        return result
+    def carry_state(self) -> tuple:
+        """
+        削除したデータから引き継いだ状態を、ほかのインスタンスに渡せる組で返却する。
+        """
+        return (self.evicted, self.evicted_until, self.failure_carry,
+                dict(self.high_load_carry))
 
-    def find_all_subnet_failure(
-            self, threshold_count: int = 1) -> list[dict[str, str]]:
+    def set_carry_state(self, state: tuple) -> None:
         """
-        故障状態のサブネットと、その故障期間を返却する。
+        carry_state()で返却した組から、削除したデータから引き継いだ状態を設定する。
         """
-        result = []
-        for subnet in self._subnets:
-            failures = self._find_subnet_failure(subnet, threshold_count)
-            for failure in failures:
-                end_time = failure['return_time'] \
-                    if failure['return_time'] is not None \
-                    else failure['last_failed_time']
-                period = "{0:} ~ {1:}".format(
-                                    failure['occurrance_time'], end_time)
-                result.append({"subnet": failure['subnet'].with_prefixlen,
-                               "period": period})
+        (self.evicted, self.evicted_until, self.failure_carry,
+         self.high_load_carry) = state
+
+    def nbytes(self) -> int:
+        """
+        保持している配列のバイト数を返却する。
+        """
+        return (len(self.times) * self.times.itemsize
+                + len(self.responses) * self.responses.itemsize)
+
+
+def _scan_failures(times: Sequence[int], responses: Sequence[int],
+                   begin: int, stop: int, state: tuple[int, int, int]
+                   ) -> tuple[list[tuple[int, int, int, int]],
+                              tuple[int, int, int]]:
+    """
+    begin <= i < stopのデータを走査して、無応答(タイムアウト)が連続した区間を検出する。
+    stateは走査開始時点の(無応答の回数, 開始時刻, 最後の無応答時刻)。
+    復帰した区間の(開始時刻, 最後の無応答時刻, 復帰時刻, 無応答の回数)の一覧と、
+    走査終了時点のstateを返却する。
+    """
+    closed = []
+    failed_count, fail_start_time, last_failed_time = state
+    for log_time, response_time in zip(
+            itertools.islice(times, begin, stop),
+            itertools.islice(responses, begin, stop)):
+        if response_time == TIMEOUT:
+            if failed_count <= 0:
+                fail_start_time = log_time
+            failed_count += 1
+            last_failed_time = log_time
+        elif failed_count >= 1:
+            closed.append((fail_start_time, last_failed_time,
+                           log_time, failed_count))
+            failed_count = 0
+    return closed, (failed_count, fail_start_time, last_failed_time)
+
+
+def _scan_high_loads(times: Sequence[int], responses: Sequence[int],
+                     begin: int, stop: int,
+                     threshold_count: int, threshold_average: float,
+                     state: tuple[Optional[int], Optional[int]]
+                     ) -> tuple[list[tuple[int, int, int]],
+                                tuple[Optional[int], Optional[int]]]:
+    """
+    begin <= i < stopのデータを走査して、直近threshold_count回の平均応答時間が
+    threshold_average以上になっている区間を検出する。
+    stateは走査開始時点の(継続中の区間の開始時刻, 最後の過負荷時刻)。
+    復帰した区間の(開始時刻, 最後の過負荷時刻, 復帰時刻)の一覧と、
+    走査終了時点のstateを返却する。
+    """
+    periods = []
+    # 直近threshold_count回分のデータがそろうまでは判定しない
+    # (threshold_count + 1件目から判定する)
+    begin = max(begin, threshold_count)
+    if threshold_count <= 0 or begin >= stop:
+        return periods, state
+    load_start_time, last_load_time = state
+    sums, counts = _window_sums(responses, begin, stop, threshold_count)
+    for log_time, total, count in zip(
+            itertools.islice(times, begin, stop), sums, counts):
+        # タイムアウトしか含まない場合は平均なしとする
+        if count > 0 and total / count >= threshold_average:
+            if load_start_time is None:
+                load_start_time = log_time
+            last_load_time = log_time
+        elif load_start_time is not None:
+            periods.append((load_start_time, last_load_time, log_time))
+            load_start_time = None
+            last_load_time = None
+    return periods, (load_start_time, last_load_time)
+
+
+def _rewind_failure(responses: Sequence[int], index: int) -> int:
+    """
+    index - 1から過去にさかのぼって、無応答が連続している最初の位置を返却する。
+    index - 1が無応答でない場合はindexを返却する。
+    """
+    while index > 0 and responses[index - 1] == TIMEOUT:
+        index -= 1
+    return index
+
+
+def _rewind_high_load(responses: Sequence[int], index: int,
+                      threshold_count: int, threshold_average: float) -> int:
+    """
+    index - 1から過去にさかのぼって、直近threshold_count回の平均応答時間が
+    threshold_average以上の状態が続いている最初の位置を返却する。
+    index - 1がその状態でない場合はindexを返却する。
+    さかのぼる範囲を倍々に広げながら、まとめて平均を計算する。
+    """
+    size = 64
+    while index > threshold_count:
+        low = max(threshold_count, index - size)
+        sums, counts = _window_sums(responses, low, index, threshold_count)
+        flags = [count > 0 and total / count >= threshold_average
+                 for total, count in zip(sums, counts)]
+        for offset in range(len(flags) - 1, -1, -1):
+            if not flags[offset]:
+                return low + offset + 1
+        index = low
+        size *= 2
+    return index
+
+
+def _failure_runs_between(series: '_Series', start_time: Optional[int],
+                          end_time: Optional[int]
+                          ) -> list[tuple[int, int, Optional[int], int]]:
+    """
+    end_time以前のデータだけで検出した無応答の連続区間を、閾値によらずすべて
+    (開始時刻, 最後の無応答時刻, 復帰時刻, 無応答の回数)の組で返却する。
+    start_time以前に終了した区間は走査しないが、start_time以前から続いている区間は、
+    その区間の先頭までさかのぼって走査する。
+    削除したデータから続いている区間は、削除時の検出途中の状態から引き継ぐ。
+    """
+    times = series.times
+    begin = 0 if start_time is None else bisect.bisect_left(times, start_time)
+    stop = len(times) if end_time is None \
+        else bisect.bisect_right(times, end_time)
+    begin = _rewind_failure(series.responses, min(begin, stop))
+    closed, (count, open_start, open_last) = _scan_failures(
+        times, series.responses, begin, stop,
+        series.failure_carry if begin == 0 < stop else (0, 0, 0))
+    if count >= 1:
+        closed.append((open_start, open_last, None, count))
+    return closed
+
+
+def _select_runs(runs: list[tuple[int, int, Optional[int], int]],
+                 threshold: int, start_time: Optional[int]
+                 ) -> list[tuple[int, int, Optional[int]]]:
+    """
+    無応答の連続区間のうち、無応答がthreshold回以上で、終了時刻がstart_time以降のものを
+    (開始時刻, 最後の無応答時刻, 復帰時刻)の組で返却する。
+    """
+    return _ended_after([(start, last, returned)
+                         for start, last, returned, count in runs
+                         if count >= threshold], start_time)
+
+
+def _failures_between(series: '_Series', threshold: int,
+                      start_time: Optional[int], end_time: Optional[int]
+                      ) -> list[tuple[int, int, Optional[int]]]:
+    """
+    end_time以前のデータだけで検出した無応答の連続区間のうち、
+    終了時刻がstart_time以降のものを(開始時刻, 最後の無応答時刻, 復帰時刻)の組で返却する。
+    start_time以前から続いている区間は、その区間の先頭までさかのぼって走査する。
+    """
+    return _select_runs(_failure_runs_between(series, start_time, end_time),
+                        threshold, start_time)
+
+
+def _high_loads_between(series: '_Series', threshold_count: int,
+                        threshold_average: float,
+                        start_time: Optional[int], end_time: Optional[int]
+                        ) -> list[tuple[int, int, Optional[int]]]:
+    """
+    end_time以前のデータだけで検出した過負荷の区間のうち、
+    終了時刻がstart_time以降のものを(開始時刻, 最後の過負荷時刻, 復帰時刻)の組で返却する。
+    start_time以前から続いている区間は、その区間の先頭までさかのぼって走査する。
+    削除したデータから続いている区間は、high_load_carryに登録した閾値であれば、
+    削除時の検出途中の状態から引き継ぐ。
+    """
+    times = series.times
+    begin = 0 if start_time is None else bisect.bisect_left(times, start_time)
+    stop = len(times) if end_time is None \
+        else bisect.bisect_right(times, end_time)
+    responses = series.responses
+    state = (None, None)
+    if threshold_count > 0:
+        begin = _rewind_high_load(responses, min(begin, stop),
+                                  threshold_count, threshold_average)
+        head, head_state = series.high_load_carry.get(
+            (threshold_count, threshold_average), (array('i'), (None, None)))
+        if head and begin <= threshold_count and stop > 0:
+            # 先頭までさかのぼった場合は、削除したデータから引き継いだ応答時間を前につなげて、
+            # 引き継いだ検出途中の状態から走査する
+            times = array('q', bytes(8 * len(head))) + _to_array(
+                'q', times[:stop])
+            responses = head + _to_array('i', responses[:stop])
+            begin, stop = len(head), len(head) + stop
+            state = head_state
+    periods, (open_start, open_last) = _scan_high_loads(
+        times, responses, begin, stop,
+        threshold_count, threshold_average, state)
+    if open_start is not None:
+        periods.append((open_start, open_last, None))
+    return _ended_after(periods, start_time)
+
+
+def _high_load_sweep(series: '_Series', threshold_count: int,
+                     threshold_averages: Sequence[float],
+                     start_time: Optional[int], end_time: Optional[int]
+                     ) -> list[list[tuple[int, int, Optional[int]]]]:
+    """
+    _high_loads_between()を、同じthreshold_countの複数のthreshold_averageについてまとめて行い、
+    threshold_averagesの順に過負荷の区間の一覧を返却する。
+    直近threshold_count回の平均応答時間は1度だけ計算し、各threshold_averageとの比較と
+    区間の切れ目の検索はバイト列の操作で行う。
+    """
+    result = [[] for _ in threshold_averages]
+    if threshold_count <= 0:
+        return result
+    times = series.times
+    responses = series.responses
+    begin = 0 if start_time is None else bisect.bisect_left(times, start_time)
+    stop = len(times) if end_time is None \
+        else bisect.bisect_right(times, end_time)
+    begin = min(begin, stop)
+    # start_time以前から続いている区間の先頭は閾値ごとに異なる
+    begins = [_rewind_high_load(responses, begin, threshold_count,
+                                threshold_average)
+              for threshold_average in threshold_averages]
+    carry = series.high_load_carry
+    for index, (threshold_average, first) in enumerate(
+            zip(threshold_averages, begins)):
+        if first <= threshold_count and stop > 0 and carry.get(
+                (threshold_count, threshold_average), (None,))[0]:
+            # 削除したデータから引き継いだ状態がある閾値は、個別に走査する
+            result[index] = _high_loads_between(
+                series, threshold_count, threshold_average,
+                start_time, end_time)
+            begins[index] = stop
+        else:
+            begins[index] = max(threshold_count, first)
+    low = min(begins, default=stop)
+    if low >= stop:
         return result
+    sums, counts = _window_sums(responses, low, stop, threshold_count)
+    # タイムアウトしか含まない場合は平均なしとし、どの閾値以上にもならない
+    averages = [total / count if count > 0 else -math.inf
+                for total, count in zip(sums, counts)]
+    for periods, threshold_average, first in zip(
+            result, threshold_averages, begins):
+        flags = bytes(map(operator.ge, itertools.islice(
+            averages, first - low, None), itertools.repeat(threshold_average)))
+        position = 0
+        while True:
+            load_start = flags.find(1, position)
+            if load_start < 0:
+                break
+            load_end = flags.find(0, load_start)
+            if load_end < 0:
+                periods.append((times[first + load_start],
+                                times[stop - 1], None))
+                break
+            periods.append((times[first + load_start],
+                            times[first + load_end - 1],
+                            times[first + load_end]))
+            position = load_end
+        periods[:] = _ended_after(periods, start_time)
+    return result
+
+
+def _ended_after(periods: list[tuple[int, int, Optional[int]]],
+                 start_time: Optional[int]
+                 ) -> list[tuple[int, int, Optional[int]]]:
+    """
+    (開始時刻, 最後の時刻, 復帰時刻)の組の一覧のうち、終了時刻がstart_time以降のものを返却する。
+    """
+    if start_time is None:
+        return periods
+    return [period for period in periods
+            if (period[2] if period[2] is not None else period[1])
+            >= start_time]
+
+
+class _SeriesScan(object):
+    """
+    _Seriesを先頭から走査した結果を保持するクラスの基底クラス
+
+    走査済みの件数とrevisionを記録しておき、データが追加されたら追加分だけを、
+    確定済みのデータが書き換えられたら最初から走査しなおす。
+    走査済みの件数は、保持期間を過ぎて削除したデータ(_Series.evicted)を含めて数える。
+    """
+    __slots__ = [
+        '_revision',
+        '_scanned'
+    ]
+
+    def is_current(self, series: _Series) -> bool:
+        """
+        走査結果がseriesの最新のデータまで反映しているかを確認する。
+        """
+        return self._revision == series.revision \
+            and self._scanned == series.evicted + len(series)
+
+
+class _FailureRuns(_SeriesScan):
+    """
+    1つのサーバアドレスの無応答(タイムアウト)が連続した区間の一覧
+
+    閾値によらずすべての区間を保持し、データが追加されたら追加分だけを走査する。
+    最後まで復帰していない区間は、走査途中の状態(open_*)として保持する。
+    """
+    __slots__ = [
+        'starts',
+        'lasts',
+        'returns',
+        'counts',
+        'open_start',
+        'open_last',
+        'open_count'
+    ]
+
+    def __init__(self):
+        self._reset(0)
+
+    def _reset(self, revision: int) -> None:
+        self.starts = array('q')
+        self.lasts = array('q')
+        self.returns = array('q')
+        self.counts = array('q')
+        self.open_start = 0
+        self.open_last = 0
+        self.open_count = 0  # 復帰していない区間の無応答の回数
+        self._revision = revision
+        self._scanned = 0
+
+    def update(self, series: _Series) -> None:
+        """
+        前回からの追加分を走査する。
+        確定済みのデータが書き換えられていた場合は、最初から走査しなおす。
+        """
+        if self._revision != series.revision \
+           or self._scanned < series.evicted:
+            # 削除したデータは、削除時の検出途中の状態から引き継ぐ
+            self._reset(series.revision)
+            self._scanned = series.evicted
+            self.open_count, self.open_start, self.open_last = \
+                series.failure_carry
+        times = series.times
+        scanned = self._scanned - series.evicted
+        if scanned >= len(times):
+            return
+        closed, state = _scan_failures(
+            times, series.responses, scanned, len(times),
+            (self.open_count, self.open_start, self.open_last))
+        for start_time, last_time, return_time, count in closed:
+            self.starts.append(start_time)
+            self.lasts.append(last_time)
+            self.returns.append(return_time)
+            self.counts.append(count)
+        self.open_count, self.open_start, self.open_last = state
+        self._scanned = series.evicted + len(times)
+
+    def prune(self, before: int) -> None:
+        """
+        復帰時刻がbeforeより前の区間と、最後の無応答時刻がbeforeより前の継続中の区間を捨てる。
+        """
+        index = bisect.bisect_left(self.returns, before)
+        if index > 0:
+            del self.starts[:index]
+            del self.lasts[:index]
+            del self.returns[:index]
+            del self.counts[:index]
+        if self.open_count > 0 and self.open_last < before:
+            self.open_count = self.open_start = self.open_last = 0
+
+    def iter_runs(self, threshold: int
+                  ) -> Iterator[tuple[int, int, Optional[int]]]:
+        """
+        無応答がthreshold回以上連続した区間を
+        (開始時刻, 最後の無応答時刻, 復帰時刻)の組で返却する。
+        復帰していない区間の復帰時刻はNoneとする。
+        """
+        starts = self.starts
+        lasts = self.lasts
+        returns = self.returns
+        for index, count in enumerate(self.counts):
+            if count >= threshold:
+                yield (starts[index], lasts[index], returns[index])
+        if self.open_count >= 1 and self.open_count >= threshold:
+            yield (self.open_start, self.open_last, None)
+
+    def iter_counted_runs(self, threshold: int
+                          ) -> Iterator[tuple[int, int, Optional[int], int]]:
+        """
+        無応答がthreshold回以上連続した区間を
+        (開始時刻, 最後の無応答時刻, 復帰時刻, 無応答の回数)の組で返却する。
+        """
+        for run in zip(self.starts, self.lasts, self.returns, self.counts):
+            if run[3] >= threshold:
+                yield run
+        if self.open_count >= 1 and self.open_count >= threshold:
+            yield (self.open_start, self.open_last, None, self.open_count)
+
+
+def _time_range(start: Optional[datetime.datetime],
+                end: Optional[datetime.datetime]) -> Optional[tuple]:
+    """
+    検出する期間を経過秒数の組にする。どちらも指定されていなければNoneを返却する。
+    """
+    if start is None and end is None:
+        return None
+    return (to_seconds(start) if start is not None else None,
+            to_seconds(end) if end is not None else None)
+
+
+def _format_period(start_time: int, last_time: int,
+                   return_time: Optional[int]) -> str:
+    """
+    検出した期間を「開始時刻 ~ 終了時刻」の文字列にする。
+    復帰していない期間は、最後の時刻までを期間とする。
+    """
+    end_time = return_time if return_time is not None else last_time
+    return _format_time(start_time) + " ~ " + _format_time(end_time)
+
+
+@functools.lru_cache(maxsize=65536)
+def _format_time(seconds: int) -> str:
+    """
+    経過秒数を日時の文字列にする。
+    同じ時刻は多くのサーバアドレスの検出結果に現れるので、文字列をキャッシュする。
+    """
+    return str(to_datetime(seconds))
+
+
+def _match_failures(candidates: list[tuple], failures: list[tuple[int, int]],
+                    tolerance: int) -> list[tuple]:
+    """
+    candidatesのうち、開始時刻と終了時刻の差がどちらもtolerance秒以内の故障が
+    failuresにあるものだけを返却する。
+    どちらも(開始時刻, 終了時刻, ...)の組で、開始時刻順に並んでいること。
+    開始時刻順に並んだ2つの一覧を先頭から同時にたどるので、
+    計算量は一覧の長さの和に比例する。
+    """
+    result = []
+    count = len(failures)
+    low = 0
+    for candidate in candidates:
+        start_time = candidate[0]
+        end_time = candidate[1]
+        # 開始時刻が許容誤差より前の故障は、以降の候補とも一致しない
+        while low < count and failures[low][0] < start_time - tolerance:
+            low += 1
+        index = low
+        while index < count and failures[index][0] <= start_time + tolerance:
+            if end_time - tolerance <= failures[index][1] \
+               <= end_time + tolerance:
+                result.append(candidate)
+                break
+            index += 1
+    return result
+
+
+def _join_subnet_failures(failure_lists: Iterable[list[tuple]],
+                          tolerance: int
+                          ) -> list[tuple[int, int, Optional[int]]]:
+    """
+    サブネット内の各ホストの故障期間(開始時刻, 最後の無応答時刻, 復帰時刻)の一覧を突き合わせて、
+    すべてのホストが許容誤差の範囲で同時に故障していた期間を、最初のホストの故障期間で返却する。
+    failure_listsは先頭から順に取り出し、一致する候補がなくなったら残りは取り出さない。
+    """
+    failure_lists = iter(failure_lists)
+    # 最初のホストの故障期間データをもとに他のホストの故障を調べる
+    candidates = [
+        (start_time,
+         return_time if return_time is not None else last_time,
+         last_time, return_time)
+        for start_time, last_time, return_time in next(failure_lists, [])]
+    for failure_list in failure_lists:
+        if not candidates:
+            break
+        failures = [
+            (start_time,
+             return_time if return_time is not None else last_time)
+            for start_time, last_time, return_time in failure_list]
+        candidates = _match_failures(candidates, failures, tolerance)
+    return [(start_time, last_time, return_time)
+            for start_time, _, last_time, return_time in candidates]
+
+
+class _SubnetTrie(object):
+    """
+    サーバアドレスの二分プレフィックス木
+
+    プレフィックス長ごとに、その長さのネットワーク(ノード)と、ノード内のホストがすべて
+    同時に故障していた期間(_join_subnet_failures()と同じ判定)を保持する。
+    ノードの故障期間は、最初のホスト(取り込んだ順)を含む子ノードの故障期間を、
+    ほかの子ノードのホストの故障期間で絞り込んで求める。
+    そのため短いプレフィックス長の検出では、検出済みの長いプレフィックス長の結果を再利用する。
+    """
+    __slots__ = [
+        'hosts',
+        'levels',
+        'first_failures',
+        'other_failures',
+        'other_cache',
+        'tolerance'
+    ]
+
+    # 各ホスト自身を表すノードの階層
+    LEAF_LEVEL = 33
+
+    def __init__(self, hosts: list[int],
+                 first_failures: Callable[[int], list[tuple]],
+                 other_failures: Callable[[int], list[tuple]],
+                 tolerance: int):
+        # ホストはアドレス順(同じアドレスは取り込んだ順)に並べるので、
+        # 各ノードのホストは連続した範囲になる
+        order = sorted(range(len(hosts)), key=lambda index: hosts[index] >> 8)
+        self.hosts = [hosts[index] for index in order]
+        # 階層ごとのノード(ネットワークアドレス, ホストの範囲の先頭, 末尾,
+        # 最初のホストの取り込み順, 故障期間)の一覧。
+        # 故障期間がNoneのノードは、ホストが1つだけで、そのホストの故障期間を使う。
+        self.levels = {
+            self.LEAF_LEVEL: [(hosts[index] >> 8, position, position + 1,
+                               index, None)
+                              for position, index in enumerate(order)]}
+        # ホストの故障期間を(開始時刻, 最後の無応答時刻, 復帰時刻)の組で返却する関数
+        # (最初のホストと、ほかのホストでは調べる期間が異なる)
+        self.first_failures = first_failures
+        self.other_failures = other_failures
+        self.other_cache: dict[int, list[tuple[int, int]]] = {}
+        self.tolerance = tolerance
+
+    def failures(self, prefixlen: int
+                 ) -> list[tuple[int, list[tuple[int, int, Optional[int]]]]]:
+        """
+        プレフィックス長prefixlenのネットワークのうちホストが2つ以上のものについて、
+        (ネットワークアドレス, 故障期間の一覧)を最初のホストの取り込み順に返却する。
+        """
+        nodes = self.levels.get(prefixlen)
+        if nodes is None:
+            child_level = min(level for level in self.levels
+                              if level > prefixlen)
+            nodes = self._merge(prefixlen, self.levels[child_level])
+            self.levels[prefixlen] = nodes
+        result = []
+        for network, low, high, first, candidates in sorted(
+                nodes, key=operator.itemgetter(3)):
+            if high - low < 2:
+                continue
+            result.append((network, [
+                (start_time, last_time, return_time)
+                for start_time, _, last_time, return_time in candidates]))
+        return result
+
+    def _merge(self, prefixlen: int, children: list[tuple]) -> list[tuple]:
+        """
+        1つ下の階層のノードの一覧から、プレフィックス長prefixlenのノードの一覧を作成する。
+        """
+        mask = _PREFIX_MASKS[prefixlen]
+        nodes = []
+        count = len(children)
+        index = 0
+        while index < count:
+            network = children[index][0] & mask
+            end = index + 1
+            while end < count and children[end][0] & mask == network:
+                end += 1
+            group = children[index:end]
+            index = end
+            if len(group) == 1:
+                nodes.append((network, *group[0][1:]))
+                continue
+            first = min(group, key=operator.itemgetter(3))
+            candidates = self._candidates(first)
+            for child in group:
+                if child is first:
+                    continue
+                for host in self.hosts[child[1]:child[2]]:
+                    if not candidates:
+                        break
+                    failures = self.other_cache.get(host)
+                    if failures is None:
+                        failures = self.other_cache[host] = \
+                            self.other_failures(host)
+                    candidates = _match_failures(
+                        candidates, failures, self.tolerance)
+            nodes.append((network, group[0][1], group[-1][2], first[3],
+                          candidates))
+        return nodes
+
+    def _candidates(self, node: tuple) -> list[tuple]:
+        """
+        ノードの故障期間を、_join_subnet_failures()の候補の形式で返却する。
+        """
+        if node[4] is not None:
+            return node[4]
+        return [(start_time,
+                 return_time if return_time is not None else last_time,
+                 last_time, return_time)
+                for start_time, last_time, return_time
+                in self.first_failures(self.hosts[node[1]])]
+
+
+def _window_sums(responses: array, start: int, stop: int, width: int
+                 ) -> tuple[Iterator[int], Iterator[int]]:
+    """
+    start <= i < stopの各iについて、responses[i - width + 1:i + 1]の
+    タイムアウトを除いた応答時間の合計と件数を返却する。
+    累積和をとって差分を求めるので、1件あたりの計算量はwidthによらない。
+    """
+    segment = responses[start - width + 1:stop]
+    sums = array('q', itertools.accumulate(
+        map(max, segment, itertools.repeat(0)), initial=0))
+    counts = array('q', itertools.accumulate(
+        map(operator.ne, segment, itertools.repeat(TIMEOUT)), initial=0))
+    return (map(operator.sub, sums[width:], sums),
+            map(operator.sub, counts[width:], counts))
+
+
+class _HighLoadRuns(_SeriesScan):
+    """
+    1つのサーバアドレスの、直近threshold_count回の平均応答時間が
+    threshold_average以上になっていた区間の一覧
+
+    データが追加されたら、継続中の区間を引き継いで追加分だけを走査する。
+    """
+    __slots__ = [
+        'threshold_count',
+        'threshold_average',
+        'periods',
+        'open_start',
+        'open_last'
+    ]
+
+    def __init__(self, threshold_count: int, threshold_average: float):
+        self.threshold_count = threshold_count
+        self.threshold_average = threshold_average
+        self._reset(0)
+
+    def _reset(self, revision: int) -> None:
+        # (開始時刻, 最後の過負荷時刻, 復帰時刻)の一覧
+        self.periods: list[tuple[int, int, int]] = []
+        self.open_start: Optional[int] = None
+        self.open_last: Optional[int] = None
+        self._revision = revision
+        self._scanned = 0
+
+    def update(self, series: _Series) -> None:
+        """
+        前回からの追加分を走査する。
+        確定済みのデータが書き換えられていた場合は、最初から走査しなおす。
+        削除したデータをまたぐ平均は、series.high_load_carryに引き継いだ応答時間を使って計算する。
+        """
+        head, head_state = series.high_load_carry.get(
+            (self.threshold_count, self.threshold_average),
+            (array('i'), (None, None)))
+        if self._revision != series.revision \
+           or self._scanned < series.evicted:
+            self._reset(series.revision)
+            self._scanned = series.evicted
+            self.open_start, self.open_last = head_state
+        times = series.times
+        responses = series.responses
+        begin = self._scanned - series.evicted
+        stop = len(times)
+        if begin >= stop:
+            return
+        count = self.threshold_count
+        state = (self.open_start, self.open_last)
+        if head and begin < count:
+            # 直近threshold_count回に削除したデータを含む場合は、引き継いだ応答時間を前につなげる
+            head = head[len(head) - min(count - begin, len(head)):]
+            periods, state = _scan_high_loads(
+                array('q', bytes(8 * len(head))) + _to_array(
+                    'q', times[:stop]),
+                head + _to_array('i', responses[:stop]),
+                len(head) + begin, len(head) + stop,
+                count, self.threshold_average, state)
+        else:
+            periods, state = _scan_high_loads(
+                times, responses, begin, stop,
+                count, self.threshold_average, state)
+        self.periods.extend(periods)
+        self.open_start, self.open_last = state
+        self._scanned = series.evicted + stop
+
+    def prune(self, before: int) -> None:
+        """
+        復帰時刻がbeforeより前の区間と、最後の過負荷時刻がbeforeより前の継続中の区間を捨てる。
+        """
+        del self.periods[:bisect.bisect_left(
+            self.periods, before, key=operator.itemgetter(2))]
+        if self.open_last is not None and self.open_last < before:
+            self.open_start = self.open_last = None
+
+    def iter_periods(self) -> Iterator[tuple[int, int, Optional[int]]]:
+        """
+        過負荷の区間を(開始時刻, 最後の過負荷時刻, 復帰時刻)の組で返却する。
+        復帰していない区間の復帰時刻はNoneとする。
+        """
+        yield from self.periods
+        if self.open_start is not None:
+            yield (self.open_start, self.open_last, None)
+
+
+###################################
+# 応答時間の分位点の計算
+###################################
+# 応答時間は、上位LATENCY_SKETCH_BITSビットで丸めた対数ヒストグラムで数える。
+# 2 ** LATENCY_SKETCH_BITS未満の応答時間はそのまま数え、それ以上は2のべき乗ごとに
+# 2 ** (LATENCY_SKETCH_BITS - 1)個の区間に分けて、区間の中央の値を返却するので、
+# 誤差は2 ** -LATENCY_SKETCH_BITS(約0.8%)以内になる。区間の数はint32の範囲で1700個程度。
+LATENCY_SKETCH_BITS = 7
+# ヒストグラムを作成する期間の長さ(秒)。それぞれ前の長さで割り切れること。
+LATENCY_BUCKETS = (60, 60 * 60, 24 * 60 * 60)
+_SKETCH_HALF = 1 << (LATENCY_SKETCH_BITS - 1)
+
+
+def _latency_index(value: int) -> int:
+    """
+    応答時間を、ヒストグラムの区間の番号にする。
+    """
+    if value < 2 * _SKETCH_HALF:
+        return value
+    shift = value.bit_length() - LATENCY_SKETCH_BITS
+    return shift * _SKETCH_HALF + (value >> shift)
+
+
+def _latency_value(index: int) -> float:
+    """
+    ヒストグラムの区間の番号から、その区間の中央の応答時間を返却する。
+    """
+    if index < 2 * _SKETCH_HALF:
+        return float(index)
+    shift = index // _SKETCH_HALF - 1
+    low = (index - shift * _SKETCH_HALF) << shift
+    return low + ((1 << shift) - 1) / 2
+
+
+def _bucket_segments(times: Sequence[int], begin: int, stop: int, size: int
+                     ) -> Iterator[tuple[int, int, int]]:
+    """
+    times[begin:stop]を、経過秒数がsizeで割り切れる時刻から始まる長さsizeの期間ごとに分け、
+    (期間の開始時刻, 期間の最初のデータの位置, 期間の最後のデータの位置 + 1)の組を順に返却する。
+    """
+    while begin < stop:
+        bucket = times[begin] - times[begin] % size
+        end = bisect.bisect_left(times, bucket + size, begin, stop)
+        yield bucket, begin, end
+        begin = end
+
+
+def _count_latencies(responses: Sequence[int], begin: int, stop: int,
+                     counts: dict[int, int]) -> None:
+    """
+    responses[begin:stop]のうち無応答でないものを、区間の番号ごとにcountsに数える。
+    """
+    if begin >= stop:
+        return
+    for value, count in collections.Counter(responses[begin:stop]).items():
+        if value != TIMEOUT:
+            index = _latency_index(value)
+            counts[index] = counts.get(index, 0) + count
+
+
+def _merge_counts(counts: dict[int, int], other: dict[int, int]) -> None:
+    """
+    ヒストグラムotherをcountsに足し合わせる。
+    """
+    for index, count in other.items():
+        counts[index] = counts.get(index, 0) + count
+
+
+def _latency_quantiles(counts: dict[int, int], quantiles: Sequence[float]
+                       ) -> list[Optional[float]]:
+    """
+    ヒストグラムから、各分位点の応答時間を返却する。
+    分位点qの値は、小さいほうからceil(q * 件数)番目(最小で1番目)の応答時間とする。
+    データがない場合はNoneを返却する。
+    """
+    total = sum(counts.values())
+    if total == 0:
+        return [None] * len(quantiles)
+    indexes = sorted(counts)
+    cumulative = list(itertools.accumulate(counts[index] for index in indexes))
+    return [_latency_value(indexes[bisect.bisect_left(
+                cumulative, max(1, math.ceil(quantile * total)))])
+            for quantile in quantiles]
+
+
+class _LatencySketches(_SeriesScan):
+    """
+    1つのサーバアドレスの、LATENCY_BUCKETSの長さの期間ごとの応答時間のヒストグラム
+
+    データが追加されたら、追加分だけを数える。
+    期間は経過秒数がその長さで割り切れる時刻から始まり、長い期間は短い期間をまとめたものになる。
+    """
+    __slots__ = [
+        'starts',
+        'counts'
+    ]
+
+    def __init__(self):
+        self._reset(0)
+
+    def _reset(self, revision: int) -> None:
+        # 期間の長さごとの、期間の開始時刻の一覧と、その期間のヒストグラムの一覧
+        self.starts = [array('q') for _ in LATENCY_BUCKETS]
+        self.counts: list[list[dict[int, int]]] = [[] for _ in LATENCY_BUCKETS]
+        self._revision = revision
+        self._scanned = 0
+
+    def update(self, series: _Series) -> None:
+        """
+        前回からの追加分を数える。
+        確定済みのデータが書き換えられていた場合は、最初から数えなおす。
+        """
+        if self._revision != series.revision \
+           or self._scanned < series.evicted:
+            self._reset(series.revision)
+            self._scanned = series.evicted
+        times = series.times
+        stop = len(times)
+        for bucket, index, end in _bucket_segments(
+                times, self._scanned - series.evicted, stop,
+                LATENCY_BUCKETS[0]):
+            counts: dict[int, int] = {}
+            _count_latencies(series.responses, index, end, counts)
+            for starts, histograms, length in zip(
+                    self.starts, self.counts, LATENCY_BUCKETS):
+                start = bucket - bucket % length
+                if not starts or starts[-1] != start:
+                    starts.append(start)
+                    histograms.append({})
+                _merge_counts(histograms[-1], counts)
+        self._scanned = series.evicted + stop
+
+    def prune(self, series: _Series) -> None:
+        """
+        データを削除したあとに呼び出し、残っているデータより前の期間を捨てて、
+        残っているデータの先頭を含む期間を数えなおす。
+        """
+        times = series.times
+        finer: Optional[tuple[array, list]] = None
+        for starts, histograms, length in zip(
+                self.starts, self.counts, LATENCY_BUCKETS):
+            index = 0 if not times else bisect.bisect_right(
+                starts, times[0] - times[0] % length)
+            del starts[:index]
+            del histograms[:index]
+            if not times:
+                continue
+            start = times[0] - times[0] % length
+            counts: dict[int, int] = {}
+            if finer is None:
+                _count_latencies(series.responses, 0, bisect.bisect_left(
+                    times, start + length), counts)
+            else:
+                for histogram in finer[1][:bisect.bisect_left(
+                        finer[0], start + length)]:
+                    _merge_counts(counts, histogram)
+            starts.insert(0, start)
+            histograms.insert(0, counts)
+            finer = (starts, histograms)
+
+    def collect(self, series: _Series, low: int, high: int,
+                counts: dict[int, int], level: Optional[int] = None) -> None:
+        """
+        確認日時がlow以上high未満のデータを、区間の番号ごとにcountsに数える。
+        範囲に含まれる期間はヒストグラムを足し合わせ、長い期間から順に使う。
+        端の、どの期間にも収まらない部分だけデータを数える。
+        """
+        if low >= high:
+            return
+        if level is None:
+            level = len(LATENCY_BUCKETS) - 1
+        if level < 0:
+            times = series.times
+            _count_latencies(series.responses, bisect.bisect_left(times, low),
+                             bisect.bisect_left(times, high), counts)
+            return
+        length = LATENCY_BUCKETS[level]
+        first = -(-low // length) * length
+        last = high - high % length
+        if first >= last:
+            self.collect(series, low, high, counts, level - 1)
+            return
+        starts = self.starts[level]
+        for histogram in self.counts[level][bisect.bisect_left(
+                starts, first):bisect.bisect_left(starts, last)]:
+            _merge_counts(counts, histogram)
+        self.collect(series, low, first, counts, level - 1)
+        self.collect(series, last, high, counts, level - 1)
+
+
+###################################
+# 期間ごとの集計
+###################################
+# 集計する期間の長さ(秒)。それぞれ前の長さで割り切れること。
+ROLLUP_BUCKETS = (60, 60 * 60)
+# 1つの期間の集計値の数と、その並び
+# (最初の確認日時, 最後の確認日時, 応答の件数, 無応答の件数, 応答時間の合計, 最小, 最大)
+_ROLLUP_FIELDS = 7
+_ROLLUP_FIRST, _ROLLUP_LAST, _ROLLUP_COUNT, _ROLLUP_TIMEOUTS, _ROLLUP_TOTAL, \
+    _ROLLUP_MIN, _ROLLUP_MAX = range(_ROLLUP_FIELDS)
+# 応答が1件もない期間の最小・最大
+_NO_MINIMUM = MAX_RESPONSE_TIME + 1
+_NO_MAXIMUM = TIMEOUT
+
+# iter_rollups()で返却する1つの期間の集計
+#   start_time  : 期間の開始時刻(経過秒数が期間の長さで割り切れる時刻)
+#   first_time  : 期間内の最初の確認日時
+#   last_time   : 期間内の最後の確認日時
+#   count       : 応答があった件数
+#   timeouts    : 無応答の件数
+#   total       : 応答時間の合計
+#   minimum     : 応答時間の最小(応答がない場合はNone)
+#   maximum     : 応答時間の最大(応答がない場合はNone)
+Rollup = collections.namedtuple(
+    'Rollup', ['start_time', 'first_time', 'last_time', 'count', 'timeouts',
+               'total', 'minimum', 'maximum'])
+
+
+def _rollup(times: Sequence[int], responses: Sequence[int], begin: int,
+            stop: int) -> list[int]:
+    """
+    times[begin:stop], responses[begin:stop]を集計する(begin < stopであること)。
+    """
+    values = responses[begin:stop]
+    if not isinstance(values, array):
+        values = _to_array('i', values)
+    timeouts = values.count(TIMEOUT)
+    count = len(values) - timeouts
+    if count == 0:
+        minimum, maximum = _NO_MINIMUM, _NO_MAXIMUM
+    else:
+        minimum = min(filter(TIMEOUT.__ne__, values)) if timeouts \
+            else min(values)
+        maximum = max(values)
+    # 無応答は-1として合計に含まれているので、その分を足す
+    return [times[begin], times[stop - 1], count, timeouts,
+            sum(values) + timeouts, minimum, maximum]
+
+
+def _merge_rollup(values: array, offset: int, other: Sequence[int]) -> None:
+    """
+    values[offset:offset + _ROLLUP_FIELDS]の集計に、otherの集計を足し合わせる。
+    """
+    values[offset] = min(values[offset], other[_ROLLUP_FIRST])
+    values[offset + 1] = max(values[offset + 1], other[_ROLLUP_LAST])
+    values[offset + 2] += other[_ROLLUP_COUNT]
+    values[offset + 3] += other[_ROLLUP_TIMEOUTS]
+    values[offset + 4] += other[_ROLLUP_TOTAL]
+    values[offset + 5] = min(values[offset + 5], other[_ROLLUP_MIN])
+    values[offset + 6] = max(values[offset + 6], other[_ROLLUP_MAX])
+
+
+class _Rollups(_SeriesScan):
+    """
+    1つのサーバアドレスの、ROLLUP_BUCKETSの長さの期間ごとの集計
+
+    データが追加されたら、追加分だけを集計する。
+    期間の長さごとに、期間の開始時刻の配列と、各期間の_ROLLUP_FIELDS個の集計値を
+    順に並べた配列を保持する。長い期間は短い期間をまとめたものになる。
+    """
+    __slots__ = [
+        'starts',
+        'values'
+    ]
+
+    def __init__(self):
+        self._reset(0)
+
+    def _reset(self, revision: int) -> None:
+        self.starts = [array('q') for _ in ROLLUP_BUCKETS]
+        self.values = [array('q') for _ in ROLLUP_BUCKETS]
+        self._revision = revision
+        self._scanned = 0
+
+    def update(self, series: _Series) -> None:
+        """
+        前回からの追加分を集計する。
+        確定済みのデータが書き換えられていた場合は、最初から集計しなおす。
+        """
+        if self._revision != series.revision \
+           or self._scanned < series.evicted:
+            self._reset(series.revision)
+            self._scanned = series.evicted
+        times = series.times
+        stop = len(times)
+        for bucket, index, end in _bucket_segments(
+                times, self._scanned - series.evicted, stop,
+                ROLLUP_BUCKETS[0]):
+            rollup = _rollup(times, series.responses, index, end)
+            for starts, values, length in zip(
+                    self.starts, self.values, ROLLUP_BUCKETS):
+                start = bucket - bucket % length
+                if not starts or starts[-1] != start:
+                    starts.append(start)
+                    values.extend(rollup)
+                else:
+                    _merge_rollup(values, len(values) - _ROLLUP_FIELDS,
+                                  rollup)
+        self._scanned = series.evicted + stop
+
+    def prune(self, series: _Series) -> None:
+        """
+        データを削除したあとに呼び出し、残っているデータより前の期間を捨てて、
+        残っているデータの先頭を含む期間を集計しなおす。
+        """
+        times = series.times
+        finer: Optional[tuple[array, array]] = None
+        for starts, values, length in zip(
+                self.starts, self.values, ROLLUP_BUCKETS):
+            index = 0 if not times else bisect.bisect_right(
+                starts, times[0] - times[0] % length)
+            del starts[:index]
+            del values[:index * _ROLLUP_FIELDS]
+            if not times:
+                continue
+            start = times[0] - times[0] % length
+            if finer is None:
+                rollup = array('q', _rollup(
+                    times, series.responses, 0,
+                    bisect.bisect_left(times, start + length)))
+            else:
+                rollup = finer[1][:_ROLLUP_FIELDS]
+                for offset in range(
+                        _ROLLUP_FIELDS, bisect.bisect_left(
+                            finer[0], start + length) * _ROLLUP_FIELDS,
+                        _ROLLUP_FIELDS):
+                    _merge_rollup(rollup, 0,
+                                  finer[1][offset:offset + _ROLLUP_FIELDS])
+            starts.insert(0, start)
+            values[0:0] = rollup
+            finer = (starts, values)
+
+    def select(self, level: int, low: Optional[int], high: Optional[int]
+               ) -> tuple[int, int]:
+        """
+        期間の長さがROLLUP_BUCKETS[level]の期間のうち、low以上high以下の範囲に
+        収まるものの(最初の番号, 最後の番号 + 1)を返却する。
+        """
+        starts = self.starts[level]
+        length = ROLLUP_BUCKETS[level]
+        begin = 0 if low is None else bisect.bisect_left(starts, low)
+        stop = len(starts) if high is None \
+            else bisect.bisect_left(starts, high - length + 2)
+        return begin, max(begin, stop)
+
+
+def _rollup_runs(values: array, begin: int, stop: int, flags: Iterable[bool]
+                 ) -> list[tuple[int, int, Optional[int], int]]:
+    """
+    begin番目からstop - 1番目の期間のうち、flagsが真の期間が続いている区間を
+    (開始時刻, 最後の時刻, 復帰時刻, 無応答の件数)の組で返却する。
+    開始時刻は最初の期間の最初の確認日時、最後の時刻は最後の期間の最後の確認日時、
+    復帰時刻は次の期間の最初の確認日時(続いている場合はNone)とする。
+    """
+    runs = []
+    run_start = run_last = None
+    timeouts = 0
+    for index, flag in zip(range(begin, stop), flags):
+        offset = index * _ROLLUP_FIELDS
+        if flag:
+            if run_start is None:
+                run_start = values[offset + _ROLLUP_FIRST]
+                timeouts = 0
+            run_last = values[offset + _ROLLUP_LAST]
+            timeouts += values[offset + _ROLLUP_TIMEOUTS]
+        elif run_start is not None:
+            runs.append((run_start, run_last,
+                         values[offset + _ROLLUP_FIRST], timeouts))
+            run_start = None
+    if run_start is not None:
+        runs.append((run_start, run_last, None, timeouts))
+    return runs
+
+
+def _rollup_level(resolution: int) -> int:
+    """
+    集計する期間の長さから、ROLLUP_BUCKETSでの位置を返却する。
+    """
+    if resolution not in ROLLUP_BUCKETS:
+        raise ValueError("Invalid resolution: {0:}".format(resolution))
+    return ROLLUP_BUCKETS.index(resolution)
+
+
+class _PhaseTimer(object):
+    """
+    with文で囲んだ処理の時間を、処理名ごとに合計するクラス
+    """
+    __slots__ = ['_phases', '_name', '_start']
+
+    def __init__(self, phases: dict[str, list], name: str):
+        self._phases = phases
+        self._name = name
+        self._start = 0.0
+
+    def __enter__(self) -> None:
+        self._start = time.perf_counter()
+
+    def __exit__(self, *exc_info) -> None:
+        phase = self._phases.get(self._name)
+        if phase is None:
+            phase = self._phases[self._name] = [0.0, 0]
+        phase[0] += time.perf_counter() - self._start
+        phase[1] += 1
+
+
+class _NoPhase(object):
+    """
+    処理時間を計測しない場合に使う、何もしない_PhaseTimer
+    """
+    __slots__ = []
+
+    def __enter__(self) -> None:
+        pass
+
+    def __exit__(self, *exc_info) -> None:
+        pass
+
+
+_NO_PHASE = _NoPhase()
+
+
+def _timed(name: str):
+    """
+    メソッドの処理時間を、nameの処理時間として計測するデコレータ
+    """
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            if self._phases is None:
+                return method(self, *args, **kwargs)
+            with self._phase(name):
+                return method(self, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+###################################
+class ResponseTimes(object):
+    """
+    時系列の応答時間データクラス
+    """
+    __slots__ = [
+        '_records',
+        '_subnets',
+        '_minute_cache',
+        '_address_cache',
+        '_source_path',
+        '_source_offset',
+        '_source_line_num',
+        '_failure_runs',
+        '_high_load_runs',
+        '_subnet_tries',
+        '_latency_sketches',
+        '_rollups',
+        '_cache_stats',
+        '_workers',
+        '_executor',
+        '_executor_version',
+        '_data_version',
+        '_snapshot',
+        '_shared',
+        '_phases',
+        '_line_stats',
+        '_max_skip_warnings',
+        '_operation_skips',
+        '_max_age',
+        '_max_samples',
+        '_latest_time'
+    ]
+    # サブネット内のサーバーアドレス内の障害期間の許容誤差
+    # (pingのデフォルトタイムアウト時間4秒 + デフォルトinterval 1秒?)とした
+    DEFAULT_SUBNET_FAILURE_TOLERANCE = 4 + 1
+    # CSVファイルを1度に読み込むバイト数
+    READ_BLOCK_SIZE = 4 * 1024 * 1024
+    # append()で1度に取り込む行数
+    APPEND_BLOCK_LINES = 64 * 1024
+    # from_files()で各ファイルを1度に読み込むバイト数と、
+    # マージしたデータを配列に追加する間隔(件数)
+    MERGE_BLOCK_SIZE = 256 * 1024
+    MERGE_FLUSH_RECORDS = 256 * 1024
+    # 過負荷期間の検出結果を保持する(サーバアドレス, 閾値)の組の最大数
+    HIGH_LOAD_CACHE_SIZE = 65536
+    # 保持期間を過ぎたデータを削除するときに、サーバアドレスごとに検出途中の状態を引き継ぐ
+    # 過負荷期間の閾値の組の最大数
+    HIGH_LOAD_CARRY_SIZE = 16
+    # プレフィックス長を指定したサブネットの故障期間の検出で保持する
+    # (閾値, 期間)ごとのプレフィックス木の最大数
+    SUBNET_TRIE_CACHE_SIZE = 16
+    # 確認日時の分から経過秒数へのキャッシュの最大数(1週間分)
+    MINUTE_CACHE_SIZE = 7 * 24 * 60
+    # 保持期間を過ぎたデータは、サーバアドレスごとに保持している件数の
+    # 1/RETENTION_SLACK以上たまってからまとめて削除する
+    RETENTION_SLACK = 8
+    # 並列処理で1プロセスあたりに分割する処理の数
+    CHUNKS_PER_WORKER = 4
+
+    def __init__(self, csv_file_path: Optional[str] = None,
+                 workers: int = 1, collect_stats: bool = False,
+                 max_skip_warnings: Optional[int] = None,
+                 max_age: Optional[int] = None,
+                 max_samples: Optional[int] = None):
+        self._records: dict[int, _Series] = {}
+        self._subnets: dict[int, list[int]] = {}
+        # 確認日時の先頭12桁(分まで)から経過秒数へのキャッシュ
+        self._minute_cache: dict[str, int] = {}
+        # サーバアドレスの文字列から(サーバアドレス, 取り込み先の関数の組)へのキャッシュ
+        self._address_cache: dict[str, tuple] = {}
+        # 読み込んだCSVファイルと、読み込み済みのバイト数、次の行番号
+        self._source_path: Optional[str] = None
+        self._source_offset = 0
+        self._source_line_num = 1
+        # 故障期間・過負荷期間の検出途中の状態
+        self._failure_runs: dict[int, _FailureRuns] = {}
+        self._high_load_runs: dict[tuple, _HighLoadRuns] = {}
+        # (閾値, 期間)ごとの、サーバアドレスのプレフィックス木と、作成時のデータの番号
+        self._subnet_tries: dict[tuple, tuple[int, _SubnetTrie]] = {}
+        # サーバアドレスごとの、期間ごとの応答時間のヒストグラム
+        self._latency_sketches: dict[int, _LatencySketches] = {}
+        # サーバアドレスごとの、期間ごとの集計
+        self._rollups: dict[int, _Rollups] = {}
+        # 検出途中の状態が最新のデータまで反映済みだった回数(hits)と、
+        # 走査が必要だった回数(misses)
+        self._cache_stats = {"failure": [0, 0], "high_load": [0, 0]}
+        # 検出処理を並列に行うプロセス数と、そのプロセスプール
+        self._workers = workers
+        self._executor: Optional[
+            'concurrent.futures.ProcessPoolExecutor'] = None
+        self._executor_version = 0
+        # データを取り込むたびに増える番号
+        self._data_version = 0
+        # open_snapshot(), attach_shared()で開いたスナップショットのメモリマップ(共有メモリ)と、
+        # publish_shared()で作成した共有メモリの一覧
+        self._snapshot: Optional[object] = None
+        self._shared: list = []
+        # collect_statsを指定した場合の、処理名ごとの(処理時間, 回数)
+        self._phases: Optional[dict[str, list]] = {} if collect_stats else None
+        # 読み込んだ行数とスキップした行数
+        self._line_stats = {"read": 0, "skipped": 0}
+        # 1回の取り込みで、スキップした行ごとに出力する警告の最大数(Noneは無制限)と、
+        # 取り込み中の今回スキップした行数
+        self._max_skip_warnings = max_skip_warnings
+        self._operation_skips = 0
+        # データの保持期間(最も新しい確認日時からの秒数)と、サーバアドレスごとの最大件数
+        # (Noneは無制限)、これまでで最も新しい確認日時
+        self._max_age = max_age
+        self._max_samples = max_samples
+        self._latest_time: Optional[int] = None
+        if csv_file_path is not None:
+            self._import_csv(csv_file_path)
+
+    def _import_csv(self, file_path: str) -> None:
+        """
+        指定されたパスのCSVファイルを読み込む
+        改行で終わっていない最後の行は書き込み途中とみなし、refresh()で取り込む。
+        """
+        def is_valid_csv(file_path: str) -> bool:
+            if not os.path.isfile(file_path):
+                return False
+            if not os.access(file_path, os.R_OK):
+                return False
+            return True
+
+        self._source_path = file_path
+        if is_valid_csv(file_path):
+            logger.info("Started importing csv: {0:}".format(file_path))
+            self._read_source()
+            logger.info("Completed.")
+        else:
+            logger.error("Failed to import csv: {0:}".format(file_path))
+
+    def _read_source(self) -> int:
+        """
+        CSVファイルの読み込み済みの位置から末尾までを取り込み、取り込んだ行数を返却する。
+        改行で終わっていない最後の行は、読み込み済みの位置に含めない。
+        """
+        line_count = 0
+        with self._phase("ingest"), open(self._source_path, "rb") as fd:
+            fd.seek(self._source_offset)
+            line_num = self._source_line_num
+            for lines, terminated, size in _read_line_blocks(
+                    fd, ResponseTimes.READ_BLOCK_SIZE, False):
+                line_num = self._ingest_lines(lines, line_num, terminated)
+                line_count += len(lines)
+                if terminated:
+                    self._source_offset += size
+                    self._source_line_num = line_num
+            self._commit()
+        return line_count
+
+    def refresh(self) -> int:
+        """
+        読み込んだCSVファイルに追記された行だけを取り込み、取り込んだ行数を返却する。
+        改行で終わっていない最後の行は書き込み途中とみなし、次回に取り込む。
+        """
+        file_path = self._source_path
+        if file_path is None or not os.path.isfile(file_path) \
+           or not os.access(file_path, os.R_OK):
+            logger.error("Failed to refresh csv: {0:}".format(file_path))
+            return 0
+        if os.path.getsize(file_path) < self._source_offset:
+            # ファイルが切り詰められていたら最初から読み込みなおす
+            logger.warning("Truncated csv, reading from the beginning: "
+                           "{0:}".format(file_path))
+            self._source_offset = 0
+            self._source_line_num = 1
+        return self._read_source()
+
+    def append(self, lines: Iterable[str]) -> int:
+        """
+        CSVファイルと同じ形式の行を取り込み、取り込んだ行数を返却する。
+        スキップした行の行番号は、渡された行の先頭を1として数える。
+        """
+        line_num = 1
+        iterator = iter(lines)
+        with self._phase("ingest"):
+            while True:
+                block = [line.rstrip('\r\n') for line in itertools.islice(
+                            iterator, ResponseTimes.APPEND_BLOCK_LINES)]
+                if not block:
+                    break
+                line_num = self._ingest_lines(block, line_num)
+            self._commit()
+        return line_num - 1
+
+    @classmethod
+    def from_files(cls, paths: Union[str, Iterable[str]],
+                   workers: int = 1, collect_stats: bool = False,
+                   max_skip_warnings: Optional[int] = None,
+                   max_age: Optional[int] = None,
+                   max_samples: Optional[int] = None
+                   ) -> 'ResponseTimes':
+        """
+        複数のCSVファイルを、確認日時順にマージしながら読み込む。
+        pathsにはパスのリスト、またはワイルドカードを含むパターンを指定する。
+        拡張子が.gz, .bz2のファイルは圧縮を展開しながら読み込む。
+
+        各ファイルは確認日時順に並んでいることを前提に、各ファイルを少しずつ読み込んで
+        ヒープで1件ずつマージするので、使用メモリは読み込むファイル数に比例する。
+        同じサーバアドレス・確認日時のデータは、あとに指定したファイルのものを使う。
+        """
+        instance = cls(workers=workers, collect_stats=collect_stats,
+                       max_skip_warnings=max_skip_warnings,
+                       max_age=max_age, max_samples=max_samples)
+        streams = []
+        for file_path in _expand_paths(paths):
+            if os.path.isfile(file_path) and os.access(file_path, os.R_OK):
+                streams.append(instance._iter_file_records(file_path))
+            else:
+                logger.error("Failed to import csv: {0:}".format(file_path))
+        count = 0
+        # 各ファイルは先読みしながら解析するので、サーバアドレスは解析した順ではなく、
+        # マージした順(1つのファイルから読み込んだ場合と同じ順)に登録しなおす。
+        # サブネットの一覧はこの順に作り、サブネットの故障期間の判定に使う
+        merged_order: dict[int, None] = {}
+        with instance._phase("ingest"):
+            for log_time, target, response_time in heapq.merge(
+                    *streams, key=operator.itemgetter(0)):
+                if target[0] not in merged_order:
+                    merged_order[target[0]] = None
+                target[1](log_time)
+                target[2](response_time)
+                count += 1
+                if count >= ResponseTimes.MERGE_FLUSH_RECORDS:
+                    instance._flush()
+                    count = 0
+            instance._flush()
+            records = instance._records
+            instance._records = {address: records[address]
+                                 for address in merged_order}
+            instance._commit()
+        logger.info("Completed.")
+        return instance
+
+    def _iter_file_records(self, file_path: str) -> Iterator[tuple]:
+        """
+        CSVファイルを少しずつ読み込み、(確認日時, 取り込み先, 応答時間)の組を順に返却する。
+        """
+        logger.info("Started importing csv: {0:}".format(file_path))
+        with _open_binary(file_path) as fd:
+            line_num = 1
+            for lines, terminated, _ in _read_line_blocks(
+                    fd, ResponseTimes.MERGE_BLOCK_SIZE):
+                parsed = []
+                line_num = self._ingest_lines(
+                    lines, line_num, terminated, file_path, parsed)
+                yield from parsed
+
+    def _commit(self) -> None:
+        """
+        取り込んだデータを確認日時順に確定し、サブネットの一覧を更新する。
+        """
+        with self._phase("normalize"):
+            for series in self._records.values():
+                series.normalize()
+        if self._max_age is not None or self._max_samples is not None:
+            with self._phase("retention"):
+                self._apply_retention()
+        with self._phase("parse_subnet"):
+            self._parse_subnet()
+        # 出力しなかったスキップした行の警告は、まとめて1回だけ出力する
+        max_skip_warnings = self._max_skip_warnings
+        if max_skip_warnings is not None \
+           and self._operation_skips > max_skip_warnings:
+            logger.warning("Skipped {0:} more lines.".format(
+                self._operation_skips - max_skip_warnings))
+        self._operation_skips = 0
+
+    def _apply_retention(self) -> None:
+        """
+        保持期間を過ぎたデータと、サーバアドレスごとの最大件数を超えた古いデータを削除する。
+        削除する前に、そのサーバアドレスの検出途中の状態を最新のデータまで進めておき、
+        削除したデータをまたぐ故障期間・過負荷期間も検出できるようにする。
+        削除したデータより前の確認日時のデータがあとから届いた場合は、取り込まずに削除する。
+        """
+        records = self._records
+        for series in records.values():
+            if len(series) and (self._latest_time is None
+                                or series.times[-1] > self._latest_time):
+                self._latest_time = series.times[-1]
+        if self._latest_time is None:
+            return
+        oldest = None if self._max_age is None \
+            else self._latest_time - self._max_age
+        max_samples = self._max_samples
+        high_load_runs: dict[int, list[_HighLoadRuns]] = {}
+        for (address, _, _), runs in self._high_load_runs.items():
+            high_load_runs.setdefault(address, []).append(runs)
+        for address, series in records.items():
+            if series.evicted_until is not None:
+                # 削除済みの期間に届いたデータは、検出途中の状態に含めずに捨てる
+                series.evict(bisect.bisect_right(
+                    series.times, series.evicted_until), carry=False)
+            times = series.times
+            count = 0 if oldest is None else bisect.bisect_left(times, oldest)
+            if max_samples is not None:
+                count = max(count, len(times) - max_samples)
+            if count <= 0 or count < max(
+                    1, len(times) // ResponseTimes.RETENTION_SLACK):
+                continue
+            failure_runs = self._failure_runs.get(address)
+            if failure_runs is not None:
+                failure_runs.update(series)
+            sketches = self._latency_sketches.get(address)
+            if sketches is not None:
+                sketches.update(series)
+            rollups = self._rollups.get(address)
+            if rollups is not None:
+                rollups.update(series)
+            # 検出途中の過負荷の区間の閾値は、削除したデータの状態を引き継ぐように登録する
+            # (最近使ったものからHIGH_LOAD_CARRY_SIZE組まで)
+            carry = series.high_load_carry
+            for runs in high_load_runs.get(address, ()):
+                runs.update(series)
+                key = (runs.threshold_count, runs.threshold_average)
+                carry[key] = carry.pop(key, None) \
+                    or (array('i'), (None, None))
+            while len(carry) > ResponseTimes.HIGH_LOAD_CARRY_SIZE:
+                del carry[next(iter(carry))]
+            series.evict(count)
+            # 残っているデータより前に終了した期間は捨てる
+            before = series.times[0] if len(series) \
+                else series.evicted_until + 1
+            if failure_runs is not None:
+                failure_runs.prune(before)
+            for runs in high_load_runs.get(address, ()):
+                runs.prune(before)
+            if sketches is not None:
+                sketches.prune(series)
+            if rollups is not None:
+                rollups.prune(series)
+
+    def _ingest_lines(self, lines: list[str], line_num: int,
+                      terminated: bool = True, source: Optional[str] = None,
+                      parsed: Optional[list] = None) -> int:
+        """
+        CSVの行のリストを検証しながら取り込み、次の行番号を返却する。
+        各フィールドの検証と変換は1度で済ませ、
+        確認日時は分単位、サーバアドレスは文字列単位でキャッシュする。
+        parsedを指定した場合は取り込まずに、
+        (確認日時, (サーバアドレス, 取り込み先の関数の組), 応答時間)の組をparsedに追加する。
+        sourceはスキップした行のログに出力するファイル名。
+        """
+        if self._phases is not None:
+            with self._phase("parse"):
+                return self._parse_lines(lines, line_num, terminated, source,
+                                         parsed)
+        return self._parse_lines(lines, line_num, terminated, source, parsed)
+
+    def _parse_lines(self, lines: list[str], line_num: int, terminated: bool,
+                     source: Optional[str], parsed: Optional[list]) -> int:
+        """
+        _ingest_lines()の処理の本体
+        """
+        minute_cache = self._minute_cache
+        address_cache = self._address_cache
+        records = self._records
+        phases = self._phases
+        max_skip_warnings = self._max_skip_warnings
+        # 今回の取り込みで、この呼び出しより前にスキップした行数
+        skipped_before = self._operation_skips
+        skipped = 0
+        self._data_version += 1
+        self._line_stats["read"] += len(lines)
+        last_index = len(lines) - 1
+        for index, line in enumerate(lines):
+            elements = line.split(',')
+            if len(elements) >= 3:
+                # 確認日時
+                log_time = None
+                text = elements[0].strip()
+                if len(text) == 14:
+                    minute_time = minute_cache.get(text[:12])
+                    if minute_time is None:
+                        minute_time = _parse_minute(text)
+                        if minute_time is not None:
+                            # 長時間動かし続けても大きくならないように、上限を超えたら空にする
+                            if len(minute_cache) >= \
+                               ResponseTimes.MINUTE_CACHE_SIZE:
+                                minute_cache.clear()
+                            minute_cache[text[:12]] = minute_time
+                    if minute_time is not None:
+                        try:
+                            second = int(text[12:14])
+                            if 0 <= second <= 59:
+                                log_time = minute_time + second
+                        except ValueError:
+                            pass
+                # 応答結果
+                response_time = None
+                text = elements[2].strip()
+                if text == '-':
+                    response_time = TIMEOUT
+                else:
+                    try:
+                        response_time = int(text)
+                        if response_time < 0 \
+                           or response_time > MAX_RESPONSE_TIME:
+                            response_time = None
+                    except ValueError:
+                        pass
+                # サーバアドレス
+                if log_time is not None and response_time is not None:
+                    text = elements[1].strip()
+                    target = address_cache.get(text)
+                    if target is None:
+                        if phases is not None:
+                            with self._phase("address"):
+                                address = _parse_address(text)
+                        else:
+                            address = _parse_address(text)
+                        if address is not None:
+                            if address not in records:
+                                records[address] = _Series()
+                            target = (address,
+                                      *records[address].pending_appenders())
+                            address_cache[text] = target
+                    if target is not None:
+                        if parsed is None:
+                            target[1](log_time)
+                            target[2](response_time)
+                        else:
+                            parsed.append((log_time, target, response_time))
+                        line_num += 1
+                        continue
+            skipped += 1
+            line_num += 1
+            # 警告の数を制限する場合は、超えた分は取り込みの最後にまとめて出力する
+            if max_skip_warnings is not None \
+               and skipped_before + skipped > max_skip_warnings:
+                continue
+            if terminated or index < last_index:
+                line += '\n'
+            location = line_num - 1 if source is None \
+                else "{0:}:{1:}".format(source, line_num - 1)
+            logger.warning("Skipped line({0:}): {1:}".format(location, line))
+        self._line_stats["skipped"] += skipped
+        self._operation_skips = skipped_before + skipped
+        if parsed is None:
+            self._flush()
+        return line_num
+
+    def _flush(self) -> None:
+        """
+        各サーバアドレスの一時的なデータを配列に追加する。
+        """
+        for series in self._records.values():
+            series.flush()
+
+    def _parse_subnet(self):
+        """
+        サーバアドレスからサブネットを特定して、サブネット内のサーバアドレスの一覧を作成する。
+        """
+        # 前回までに一覧に加えたサーバアドレスは飛ばす
+        parsed = sum(len(addresses) for addresses in self._subnets.values())
+        addresses = list(itertools.islice(self._records.keys(), parsed, None))
+        subnets = self._subnets
+        for address, subnet in zip(addresses, _network_keys(addresses)):
+            hosts = subnets.get(subnet)
+            if hosts is None:
+                hosts = subnets[subnet] = []
+            hosts.append(address)
+
+    def _get_failure_runs(self, address: int
+                          ) -> _FailureRuns:
+        """
+        指定したサーバアドレスの無応答の連続区間の一覧を、最新のデータまで走査して返却する。
+        """
+        series = self._records[address]
+        runs = self._failure_runs.get(address)
+        if runs is None:
+            runs = self._failure_runs[address] = _FailureRuns()
+        elif runs.is_current(series):
+            self._cache_stats["failure"][0] += 1
+            return runs
+        self._cache_stats["failure"][1] += 1
+        runs.update(series)
+        return runs
+
+    def _find_failure(self, address: int,
+                      threshold: int) -> list[dict]:
+        """
+        指定したサーバアドレスの故障期間を返却する。
+        """
+        runs = self._get_failure_runs(address)
+        return [{"address": address,
+                 "occurrance_time": to_datetime(start_time),
+                 "last_failed_time": to_datetime(last_time),
+                 "return_time": to_datetime(return_time)
+                 if return_time is not None else None}
+                for start_time, last_time, return_time
+                in runs.iter_runs(threshold)]
+
+    @_timed("find_all_failure")
+    def find_all_failure(self, threshold: int = 1,
+                         start: Optional[datetime.datetime] = None,
+                         end: Optional[datetime.datetime] = None
+                         ) -> list[dict[str, str]]:
+        """
+        故障状態のサーバーアドレスと、そのサーバーの故障期間を返却する。
+        start, endを指定した場合は、end以前のデータで検出した故障期間のうち、
+        start以降に終了したもの(start以前から続いているものを含む)だけを返却する。
+        """
+        return [{"address": _format_address(address),
+                 "period": _format_period(*failure)}
+                for address, failure
+                in self._failure_periods(threshold, start, end)]
+
+    def iter_failures(self, threshold: int = 1,
+                      start: Optional[datetime.datetime] = None,
+                      end: Optional[datetime.datetime] = None
+                      ) -> Iterator['Period']:
+        """
+        find_all_failure()と同じ故障期間を、Periodとして1件ずつ返却する。
+        サーバアドレスごとに、必要になったときに検出する。
+        """
+        for address, failure in self._failure_periods(threshold, start, end):
+            yield Period("failure", address, *failure)
+
+    def _failure_periods(self, threshold: int,
+                         start: Optional[datetime.datetime],
+                         end: Optional[datetime.datetime]
+                         ) -> Iterator[tuple[int, tuple]]:
+        """
+        (サーバアドレス, (開始時刻, 最後の無応答時刻, 復帰時刻))の組を1件ずつ返却する。
+        """
+        if threshold <= 0:
+            threshold = 1
+        for address, failures in self._detect(
+                "failure", (threshold,), _time_range(start, end)):
+            for failure in failures:
+                yield address, failure
+
+    def _get_high_load_runs(self, address: int,
+                            threshold_count: int,
+                            threshold_average: float) -> _HighLoadRuns:
+        """
+        指定したサーバアドレスと閾値の過負荷の区間の一覧を、最新のデータまで走査して返却する。
+        保持する組の数がHIGH_LOAD_CACHE_SIZEを超えたら、最も長く使っていないものから捨てる。
+        """
+        series = self._records[address]
+        key = (address, threshold_count, threshold_average)
+        cache = self._high_load_runs
+        runs = cache.pop(key, None)
+        if runs is None:
+            runs = _HighLoadRuns(threshold_count, threshold_average)
+            if len(cache) >= ResponseTimes.HIGH_LOAD_CACHE_SIZE:
+                del cache[next(iter(cache))]
+        cache[key] = runs
+        if runs.is_current(series):
+            self._cache_stats["high_load"][0] += 1
+            return runs
+        self._cache_stats["high_load"][1] += 1
+        runs.update(series)
+        return runs
+
+    def _phase(self, name: str):
+        """
+        with文で囲んだ処理の時間を、nameの処理時間として計測する。
+        collect_statsを指定していない場合は何もしない。
+        """
+        if self._phases is None:
+            return _NO_PHASE
+        return _PhaseTimer(self._phases, name)
+
+    def stats(self) -> dict[str, dict]:
+        """
+        処理の統計情報を返却する。
+            phases    : 処理名ごとの{"time": 処理時間(秒), "calls": 回数}
+                        (collect_statsを指定した場合だけ計測する)
+            lines     : 読み込んだ行数(read), スキップした行数(skipped),
+                        同じ確認日時のデータで上書きした行数(duplicated),
+                        保持期間を過ぎて削除した件数(evicted)
+            addresses : サーバアドレスごとのデータ件数
+        処理名は次のとおりで、ingestはparse, address, normalize, parse_subnetを含み、
+        parseはaddressを含む。
+            ingest       : CSVファイルの読み込みから確定まで
+            parse        : 行の検証と変換
+            address      : サーバアドレスの文字列の変換
+            normalize    : 確認日時順の並べ替えと重複の除去
+            retention    : 保持期間を過ぎたデータの削除
+            parse_subnet : サブネットの一覧の更新
+            subnet_join  : サブネット内の故障期間の突き合わせ
+            その他        : 各検出メソッドの名前(find_all_failureなど)
+        並列処理(workers)の場合は、ワーカープロセス内の処理時間は含まない。
+        """
+        phases = {}
+        if self._phases is not None:
+            phases = {name: {"time": elapsed, "calls": calls}
+                      for name, (elapsed, calls) in self._phases.items()}
+        return {
+            "phases": phases,
+            "lines": {
+                "read": self._line_stats["read"],
+                "skipped": self._line_stats["skipped"],
+                "duplicated": sum(series.duplicates
+                                  for series in self._records.values()),
+                "evicted": sum(series.evicted
+                               for series in self._records.values())},
+            "addresses": {_format_address(address): len(series)
+                          for address, series in self._records.items()}
+        }
+
+    def cache_info(self) -> dict[str, CacheInfo]:
+        """
+        故障期間(failure)・過負荷期間(high_load)の検出結果のキャッシュの状況を返却する。
+        hitsはデータの走査を省略できた回数、missesは走査が必要だった回数。
+        """
+        return {
+            "failure": CacheInfo(*self._cache_stats["failure"],
+                                 len(self._failure_runs)),
+            "high_load": CacheInfo(*self._cache_stats["high_load"],
+                                   len(self._high_load_runs))
+            }
+
+    def cache_clear(self) -> None:
+        """
+        検出結果のキャッシュと、その状況を初期化する。
+        """
+        self._failure_runs.clear()
+        self._high_load_runs.clear()
+        self._subnet_tries.clear()
+        self._latency_sketches.clear()
+        self._rollups.clear()
+        for stats in self._cache_stats.values():
+            stats[0] = stats[1] = 0
+
+    def _find_high_load(self, address: int,
+                        threshold_count: int,
+                        threshold_average: float) -> list[dict]:
+        """
+        指定したサーバアドレスの過負荷期間を返却する。
+        """
+        runs = self._get_high_load_runs(
+            address, threshold_count, threshold_average)
+        return [{"address": address,
+                 "occurrance_time": to_datetime(start_time),
+                 "last_load_time": to_datetime(last_time),
+                 "return_time": to_datetime(return_time)
+                 if return_time is not None else None}
+                for start_time, last_time, return_time
+                in runs.iter_periods()]
+
+    @_timed("find_all_high_load")
+    def find_all_high_load(self, threshold_count: int,
+                           threshold_average: int,
+                           start: Optional[datetime.datetime] = None,
+                           end: Optional[datetime.datetime] = None
+                           ) -> list[dict[str, str]]:
+        """
+        直近threshold_count回の平均応答時間がthreshold_averageを超えていたら、
+        そのサーバが過負荷になっているとみなし、その期間を取得する。
+        start, endを指定した場合は、end以前のデータで検出した過負荷期間のうち、
+        start以降に終了したもの(start以前から続いているものを含む)だけを返却する。
+        """
+        return [{"address": _format_address(address),
+                 "period": _format_period(*high_load)}
+                for address, high_load in self._high_load_periods(
+                    threshold_count, threshold_average, start, end)]
+
+    def iter_high_loads(self, threshold_count: int, threshold_average: int,
+                        start: Optional[datetime.datetime] = None,
+                        end: Optional[datetime.datetime] = None
+                        ) -> Iterator['Period']:
+        """
+        find_all_high_load()と同じ過負荷期間を、Periodとして1件ずつ返却する。
+        サーバアドレスごとに、必要になったときに検出する。
+        """
+        for address, high_load in self._high_load_periods(
+                threshold_count, threshold_average, start, end):
+            yield Period("high_load", address, *high_load)
+
+    def _high_load_periods(self, threshold_count: int,
+                           threshold_average: int,
+                           start: Optional[datetime.datetime],
+                           end: Optional[datetime.datetime]
+                           ) -> Iterator[tuple[int, tuple]]:
+        """
+        (サーバアドレス, (開始時刻, 最後の過負荷時刻, 終了時刻))の組を1件ずつ返却する。
+        """
+        self._register_high_load_carry([(threshold_count, threshold_average)])
+        for address, high_loads in self._detect(
+                "high_load", (threshold_count, threshold_average),
+                _time_range(start, end)):
+            for high_load in high_loads:
+                yield address, high_load
+
+    def _register_high_load_carry(self, keys: Iterable[tuple[int, float]]
+                                  ) -> None:
+        """
+        保持期間を指定している場合に、削除するデータの過負荷の区間の検出途中の状態を
+        引き継ぐように、使った(threshold_count, threshold_average)をデータに登録しておく。
+        検出結果のキャッシュを捨てた場合や、ほかのプロセスで検出した場合、
+        期間を指定して検出する場合にも、登録した状態を使う。
+        """
+        if self._max_age is None and self._max_samples is None:
+            return
+        keys = list(keys)
+        for series in self._records.values():
+            for key in keys:
+                series.high_load_carry.setdefault(
+                    key, (array('i'), (None, None)))
+
+    def _failure_list(self, address: int, threshold: int,
+                      time_range: Optional[tuple] = None
+                      ) -> list[tuple[int, int, Optional[int]]]:
+        """
+        指定したサーバアドレスの故障期間を(開始時刻, 最後の無応答時刻, 復帰時刻)の組で返却する。
+        time_rangeを指定しない場合は、キャッシュした検出結果を使う。
+        """
+        if time_range is None:
+            return list(self._get_failure_runs(address).iter_runs(threshold))
+        return _failures_between(self._records[address], threshold,
+                                 *time_range)
+
+    def _subnet_failure_runs(self, subnet: int,
+                             threshold_count: int,
+                             tolerance: int = None,
+                             time_range: Optional[tuple] = None
+                             ) -> list[tuple[int, int, Optional[int]]]:
+        """
+        指定したサブネットの故障期間を(開始時刻, 最後の無応答時刻, 復帰時刻)の組で返却する。
+        """
+        if tolerance is None:
+            tolerance = ResponseTimes.DEFAULT_SUBNET_FAILURE_TOLERANCE
+        addresses = self._subnets[subnet]
+        # サブネットに属する2つの以上のホストがリストにない場合は、サブネットの故障とはしない
+        if len(addresses) < 2:
+            return []
+        # 他のホストは、許容誤差の分だけ前に終了した故障期間まで調べる
+        other_range = time_range
+        if time_range is not None and time_range[0] is not None:
+            other_range = (time_range[0] - tolerance, time_range[1])
+        failure_lists = itertools.chain(
+            [self._failure_list(addresses[0], threshold_count, time_range)],
+            (self._failure_list(address, threshold_count, other_range)
+             for address in addresses[1:]))
+        with self._phase("subnet_join"):
+            return _join_subnet_failures(failure_lists, tolerance)
+
+    def _find_subnet_failure(self, subnet: int,
+                             threshold_count: int,
+                             tolerance: int = None
+                             ) -> list[dict]:
+        """
+        指定したサブネットの故障期間を返却する。
+        """
+        return [{"subnet": subnet,
+                 "occurrance_time": to_datetime(start_time),
+                 "last_failed_time": to_datetime(last_time),
+                 "return_time": to_datetime(return_time)
+                 if return_time is not None else None}
+                for start_time, last_time, return_time
+                in self._subnet_failure_runs(
+                    subnet, threshold_count, tolerance)]
+
+    def _get_subnet_trie(self, threshold_count: int,
+                         time_range: Optional[tuple]) -> _SubnetTrie:
+        """
+        閾値と期間に対応する、サーバアドレスのプレフィックス木を返却する。
+        データが追加されていなければ、前回作成したもの(検出済みの階層を含む)を使う。
+        """
+        key = (threshold_count, time_range)
+        cached = self._subnet_tries.pop(key, None)
+        if cached is None or cached[0] != self._data_version:
+            tolerance = ResponseTimes.DEFAULT_SUBNET_FAILURE_TOLERANCE
+            # 他のホストは、許容誤差の分だけ前に終了した故障期間まで調べる
+            other_range = time_range
+            if time_range is not None and time_range[0] is not None:
+                other_range = (time_range[0] - tolerance, time_range[1])
+
+            def first_failures(address: int) -> list[tuple]:
+                return self._failure_list(address, threshold_count,
+                                          time_range)
+
+            def other_failures(address: int) -> list[tuple]:
+                return [(start_time,
+                         return_time if return_time is not None
+                         else last_time)
+                        for start_time, last_time, return_time
+                        in self._failure_list(address, threshold_count,
+                                              other_range)]
+
+            cached = (self._data_version,
+                      _SubnetTrie(list(self._records), first_failures,
+                                  other_failures, tolerance))
+        # 最後に使ったものを末尾に置き、最大数を超えたら最も古くに使ったものを捨てる
+        self._subnet_tries[key] = cached
+        while len(self._subnet_tries) > self.SUBNET_TRIE_CACHE_SIZE:
+            del self._subnet_tries[next(iter(self._subnet_tries))]
+        return cached[1]
+
+    @_timed("find_all_subnet_failure")
+    def find_all_subnet_failure(
+            self, threshold_count: int = 1,
+            start: Optional[datetime.datetime] = None,
+            end: Optional[datetime.datetime] = None,
+            prefixlen: Optional[int] = None) -> list[dict[str, str]]:
+        """
+        故障状態のサブネットと、その故障期間を返却する。
+        start, endを指定した場合は、end以前のデータで検出した故障期間のうち、
+        start以降に終了したもの(start以前から続いているものを含む)だけを返却する。
+        prefixlenを指定した場合は、各サーバアドレスのプレフィックス長によらず、
+        その長さのネットワークごとにまとめたものをサブネットとする。
+        """
+        return [{"subnet": _format_address(subnet),
+                 "period": _format_period(*failure)}
+                for subnet, failure in self._subnet_failure_periods(
+                    threshold_count, start, end, prefixlen)]
+
+    def iter_subnet_failures(self, threshold_count: int = 1,
+                             start: Optional[datetime.datetime] = None,
+                             end: Optional[datetime.datetime] = None,
+                             prefixlen: Optional[int] = None
+                             ) -> Iterator['Period']:
+        """
+        find_all_subnet_failure()と同じサブネットの故障期間を、Periodとして1件ずつ返却する。
+        prefixlenを指定しない場合は、サブネットごとに、必要になったときに検出する。
+        """
+        for subnet, failure in self._subnet_failure_periods(
+                threshold_count, start, end, prefixlen):
+            yield Period("subnet_failure", subnet, *failure)
+
+    def _subnet_failure_periods(self, threshold_count: int,
+                                start: Optional[datetime.datetime],
+                                end: Optional[datetime.datetime],
+                                prefixlen: Optional[int]
+                                ) -> Iterator[tuple[int, tuple]]:
+        """
+        (サブネット, (開始時刻, 最後の無応答時刻, 復帰時刻))の組を1件ずつ返却する。
+        """
+        if prefixlen is not None:
+            if not 0 <= prefixlen <= 32:
+                raise ValueError("Invalid prefixlen: {0:}".format(prefixlen))
+            trie = self._get_subnet_trie(threshold_count,
+                                         _time_range(start, end))
+            with self._phase("subnet_join"):
+                networks = trie.failures(prefixlen)
+            for network, failures in networks:
+                for failure in failures:
+                    yield network << 8 | prefixlen, failure
+            return
+        for subnet, failures in self._detect(
+                "subnet_failure", (threshold_count,),
+                _time_range(start, end)):
+            for failure in failures:
+                yield subnet, failure
+
+    @_timed("failure_sweep")
+    def failure_sweep(self, thresholds: Iterable[int],
+                      start: Optional[datetime.datetime] = None,
+                      end: Optional[datetime.datetime] = None
+                      ) -> dict[int, list[dict[str, str]]]:
+        """
+        複数の閾値についてfind_all_failure()をまとめて行い、閾値から検出結果への辞書を返却する。
+        無応答の連続区間は閾値によらないので1度だけ求め、各区間を
+        無応答の回数以下の閾値の検出結果に振り分ける。
+        """
+        thresholds = list(thresholds)
+        levels = sorted(set(max(threshold, 1) for threshold in thresholds))
+        sweep = {level: [] for level in levels}
+        if levels:
+            for address, runs in self._detect(
+                    "failure_runs", (levels[0],), _time_range(start, end)):
+                name = _format_address(address)
+                for start_time, last_time, return_time, count in runs:
+                    period = _format_period(start_time, last_time,
+                                            return_time)
+                    for level in levels[:bisect.bisect_right(levels, count)]:
+                        sweep[level].append(
+                            {"address": name, "period": period})
+        return {threshold: list(sweep[max(threshold, 1)])
+                for threshold in thresholds}
+
+    @_timed("subnet_failure_sweep")
+    def subnet_failure_sweep(self, thresholds: Iterable[int],
+                             start: Optional[datetime.datetime] = None,
+                             end: Optional[datetime.datetime] = None
+                             ) -> dict[int, list[dict[str, str]]]:
+        """
+        複数の閾値についてfind_all_subnet_failure()をまとめて行い、
+        閾値から検出結果への辞書を返却する。
+        各ホストの無応答の連続区間は1度だけ求め、閾値ごとに突き合わせる。
+        """
+        thresholds = list(dict.fromkeys(thresholds))
+        sweep = {threshold: [] for threshold in thresholds}
+        if not thresholds:
+            return sweep
+        for subnet, grid in self._detect(
+                "subnet_failure_sweep", (thresholds,),
+                _time_range(start, end)):
+            for threshold, failures in zip(thresholds, grid):
+                sweep[threshold].extend(
+                    {"subnet": _format_address(subnet),
+                     "period": _format_period(*failure)}
+                    for failure in failures)
+        return sweep
+
+    def _subnet_failure_sweep(self, subnet: int,
+                              thresholds: list[int],
+                              time_range: Optional[tuple] = None
+                              ) -> list[list[tuple[int, int, Optional[int]]]]:
+        """
+        指定したサブネットの故障期間を、thresholdsの順に閾値ごとに返却する。
+        """
+        tolerance = ResponseTimes.DEFAULT_SUBNET_FAILURE_TOLERANCE
+        addresses = self._subnets[subnet]
+        # サブネットに属する2つの以上のホストがリストにない場合は、サブネットの故障とはしない
+        if len(addresses) < 2:
+            return [[] for _ in thresholds]
+        start_time = None
+        if time_range is not None and time_range[0] is not None:
+            start_time = time_range[0]
+            time_range = (start_time - tolerance, time_range[1])
+        # 各ホストの無応答の連続区間は、突き合わせで必要になったときに1度だけ求める
+        runs = []
+
+        def host_runs(index: int) -> list[tuple]:
+            while len(runs) <= index:
+                runs.append(self._counted_failure_runs(
+                    addresses[len(runs)], min(thresholds), time_range))
+            return runs[index]
+
+        result = []
+        for threshold in thresholds:
+            # 最初のホストは、start以降に終了した故障期間だけを候補にする
+            failure_lists = itertools.chain(
+                [_select_runs(host_runs(0), threshold, start_time)],
+                (_select_runs(host_runs(index), threshold, None)
+                 for index in range(1, len(addresses))))
+            with self._phase("subnet_join"):
+                result.append(_join_subnet_failures(failure_lists,
+                                                    tolerance))
+        return result
+
+    def _counted_failure_runs(self, address: int,
+                              threshold: int,
+                              time_range: Optional[tuple] = None
+                              ) -> list[tuple[int, int, Optional[int], int]]:
+        """
+        指定したサーバアドレスの無応答がthreshold回以上連続した区間を
+        (開始時刻, 最後の無応答時刻, 復帰時刻, 無応答の回数)の組で返却する。
+        """
+        if time_range is None:
+            return list(self._get_failure_runs(address)
+                        .iter_counted_runs(threshold))
+        start_time, end_time = time_range
+        return _ended_after(
+            [run for run in _failure_runs_between(
+                self._records[address], start_time, end_time)
+             if run[3] >= threshold], start_time)
+
+    @_timed("high_load_sweep")
+    def high_load_sweep(self, threshold_counts: Iterable[int],
+                        threshold_averages: Iterable[float],
+                        start: Optional[datetime.datetime] = None,
+                        end: Optional[datetime.datetime] = None
+                        ) -> dict[tuple[int, float], list[dict[str, str]]]:
+        """
+        threshold_countsとthreshold_averagesのすべての組み合わせについて
+        find_all_high_load()をまとめて行い、(threshold_count, threshold_average)から
+        検出結果への辞書を返却する。
+        直近threshold_count回の平均応答時間は、threshold_countごとに1度だけ計算する。
+        """
+        threshold_counts = list(dict.fromkeys(threshold_counts))
+        threshold_averages = list(dict.fromkeys(threshold_averages))
+        self._register_high_load_carry(itertools.product(threshold_counts,
+                                                         threshold_averages))
+        sweep = {(threshold_count, threshold_average): []
+                 for threshold_count in threshold_counts
+                 for threshold_average in threshold_averages}
+        for address, grid in self._detect(
+                "high_load_sweep", (threshold_counts, threshold_averages),
+                _time_range(start, end)):
+            name = _format_address(address)
+            for threshold_count, row in zip(threshold_counts, grid):
+                for threshold_average, periods in zip(threshold_averages,
+                                                      row):
+                    sweep[(threshold_count, threshold_average)].extend(
+                        {"address": name, "period": _format_period(*period)}
+                        for period in periods)
+        return sweep
+
+    @_timed("analyze")
+    def analyze(self, failure_threshold: int = 1,
+                high_load: Optional[tuple[int, float]] = None,
+                subnet_threshold: int = 1,
+                start: Optional[datetime.datetime] = None,
+                end: Optional[datetime.datetime] = None
+                ) -> dict[str, list[dict[str, str]]]:
+        """
+        故障期間・過負荷期間・サブネットの故障期間をまとめて検出し、
+        find_all_failure(), find_all_high_load(), find_all_subnet_failure()と
+        同じ形式の一覧を"failure", "high_load", "subnet_failure"の辞書で返却する。
+        high_loadには(threshold_count, threshold_average)を指定し、
+        指定しない場合は過負荷期間を検出しない。
+
+        各サーバアドレスのデータの走査は1度で済ませ、無応答の連続区間は
+        故障期間とサブネットの故障期間の両方の判定に使う。
+        """
+        if failure_threshold <= 0:
+            failure_threshold = 1
+        if high_load is not None:
+            self._register_high_load_carry([tuple(high_load)])
+        tolerance = ResponseTimes.DEFAULT_SUBNET_FAILURE_TOLERANCE
+        time_range = _time_range(start, end)
+        result = {"failure": [], "high_load": [], "subnet_failure": []}
+        subnet_failure_lists = {}
+        for address, (failures, high_loads, subnet_failures) in self._detect(
+                "analyze", (failure_threshold, high_load, subnet_threshold),
+                time_range):
+            name = _format_address(address)
+            for failure in failures:
+                result["failure"].append({
+                    "address": name, "period": _format_period(*failure)})
+            for period in high_loads:
+                result["high_load"].append({
+                    "address": name, "period": _format_period(*period)})
+            subnet_failure_lists[address] = subnet_failures
+        for subnet, addresses in self._subnets.items():
+            # サブネットに属する2つの以上のホストがリストにない場合は、サブネットの故障とはしない
+            if len(addresses) < 2:
+                continue
+            # 最初のホストは、start以降に終了した故障期間だけを候補にする
+            first = subnet_failure_lists[addresses[0]]
+            if time_range is not None:
+                first = _ended_after(first, time_range[0])
+            with self._phase("subnet_join"):
+                failures = _join_subnet_failures(
+                    itertools.chain([first], (subnet_failure_lists[address]
+                                              for address in addresses[1:])),
+                    tolerance)
+            for failure in failures:
+                result["subnet_failure"].append({
+                    "subnet": _format_address(subnet),
+                    "period": _format_period(*failure)})
+        return result
+
+    def _analyze_one(self, address: int,
+                     failure_threshold: int,
+                     high_load: Optional[tuple[int, float]],
+                     subnet_threshold: int,
+                     time_range: Optional[tuple] = None) -> tuple:
+        """
+        指定したサーバアドレスの故障期間、過負荷期間と、サブネットの故障の判定に使う故障期間を返却する。
+        サブネットの故障の判定には、許容誤差の分だけ前に終了した故障期間まで使う。
+        """
+        series = self._records[address]
+        if time_range is None:
+            runs = self._get_failure_runs(address)
+            failures = list(runs.iter_runs(failure_threshold))
+            subnet_failures = list(runs.iter_runs(subnet_threshold))
+        else:
+            start_time, end_time = time_range
+            if start_time is not None:
+                start_time -= ResponseTimes.DEFAULT_SUBNET_FAILURE_TOLERANCE
+            runs = _failure_runs_between(series, start_time, end_time)
+            failures = _select_runs(runs, failure_threshold, time_range[0])
+            subnet_failures = _select_runs(runs, subnet_threshold, start_time)
+        high_loads = []
+        if high_load is not None:
+            if time_range is None:
+                high_loads = list(
+                    self._get_high_load_runs(address, *high_load)
+                    .iter_periods())
+            else:
+                high_loads = _high_loads_between(series, *high_load,
+                                                 *time_range)
+        return failures, high_loads, subnet_failures
+
+    ###################################
+    # 応答時間の分位点
+    ###################################
+    @_timed("latency_percentiles")
+    def latency_percentiles(self, target: str,
+                            quantiles: Sequence[float] = (0.5, 0.95, 0.99),
+                            start: Optional[datetime.datetime] = None,
+                            end: Optional[datetime.datetime] = None
+                            ) -> dict[float, Optional[float]]:
+        """
+        サーバアドレスまたはサブネット(targetの文字列)の、無応答を除いた応答時間の分位点を
+        {分位点: 応答時間}の辞書で返却する。データがない場合の応答時間はNoneとする。
+        サブネットと同じ文字列のサーバアドレス(ホスト部が0)は、サブネットとみなす。
+        start, endを指定した場合は、確認日時がその範囲のデータだけを使う。
+
+        分位点qの値は、小さいほうからceil(q * 件数)番目の応答時間で、
+        誤差は2 ** -LATENCY_SKETCH_BITS(約0.8%)以内。
+        サーバアドレスごとに期間ごとのヒストグラムを作成しておき、範囲に含まれる期間の
+        ヒストグラムを足し合わせるので、計算量は範囲内のデータ件数にほぼよらない。
+        """
+        for quantile in quantiles:
+            if not 0 <= quantile <= 1:
+                raise ValueError("Invalid quantile: {0:}".format(quantile))
+        addresses = self._target_addresses(target)
+        low = to_seconds(start) if start is not None else None
+        high = to_seconds(end) + 1 if end is not None else None
+        counts: dict[int, int] = {}
+        for address in addresses:
+            series = self._records[address]
+            if not len(series):
+                continue
+            sketches = self._latency_sketches.get(address)
+            if sketches is None:
+                sketches = self._latency_sketches[address] = \
+                    _LatencySketches()
+            if not sketches.is_current(series):
+                sketches.update(series)
+            sketches.collect(
+                series, low if low is not None else series.times[0],
+                high if high is not None else series.times[-1] + 1, counts)
+        return dict(zip(quantiles, _latency_quantiles(counts, quantiles)))
+
+    def _target_addresses(self, target: str) -> list[int]:
+        """
+        サーバアドレスまたはサブネットの文字列から、対象のサーバアドレスの一覧を返却する。
+        サブネットと同じ文字列のサーバアドレス(ホスト部が0)は、サブネットとみなす。
+        """
+        key = _parse_address(target)
+        if key in self._subnets:
+            return self._subnets[key]
+        if key in self._records:
+            return [key]
+        raise ValueError("Unknown address: {0:}".format(target))
+
+    ###################################
+    # 期間ごとの集計
+    ###################################
+    def _get_rollups(self, address: int) -> _Rollups:
+        """
+        指定したサーバアドレスの期間ごとの集計を、最新のデータまで集計して返却する。
+        """
+        series = self._records[address]
+        rollups = self._rollups.get(address)
+        if rollups is None:
+            rollups = self._rollups[address] = _Rollups()
+        if not rollups.is_current(series):
+            rollups.update(series)
+        return rollups
+
+    def iter_rollups(self, target: str, resolution: int = 60,
+                     start: Optional[datetime.datetime] = None,
+                     end: Optional[datetime.datetime] = None
+                     ) -> Iterator[Rollup]:
+        """
+        サーバアドレスまたはサブネット(targetの文字列)の、resolution秒(ROLLUP_BUCKETSの
+        いずれか)の期間ごとの集計を、Rollupとして期間の順に1件ずつ返却する。
+        サブネットの場合は、属するサーバアドレスの集計を期間ごとに足し合わせる。
+        start, endを指定した場合は、その範囲に収まる期間だけを返却する。
+        """
+        level = _rollup_level(resolution)
+        addresses = self._target_addresses(target)
+        time_range = _time_range(start, end) or (None, None)
+        merged: dict[int, array] = {}
+        for address in addresses:
+            rollups = self._get_rollups(address)
+            begin, stop = rollups.select(level, *time_range)
+            starts = rollups.starts[level]
+            values = rollups.values[level]
+            for index in range(begin, stop):
+                offset = index * _ROLLUP_FIELDS
+                rollup = values[offset:offset + _ROLLUP_FIELDS]
+                current = merged.get(starts[index])
+                if current is None:
+                    merged[starts[index]] = rollup
+                else:
+                    _merge_rollup(current, 0, rollup)
+        for start_time in sorted(merged):
+            first, last, count, timeouts, total, minimum, maximum = \
+                merged[start_time]
+            yield Rollup(start_time, first, last, count, timeouts, total,
+                         minimum if count else None,
+                         maximum if count else None)
+
+    def _rollup_periods(self, level: int, end_time: Optional[int],
+                        flag: Callable[[int, int, int], bool]
+                        ) -> Iterator[tuple[int, list[tuple]]]:
+        """
+        サーバアドレスごとに、end_time以前に終わる期間のうち、
+        flag(応答の件数, 無応答の件数, 応答時間の合計)が真の期間が続いている区間を
+        (サーバアドレス, [(開始時刻, 最後の時刻, 復帰時刻, 無応答の件数), ...])の組で返却する。
+        """
+        for address in self._records:
+            rollups = self._get_rollups(address)
+            _, stop = rollups.select(level, None, end_time)
+            values = rollups.values[level]
+            size = stop * _ROLLUP_FIELDS
+            yield address, _rollup_runs(values, 0, stop, map(
+                flag, values[_ROLLUP_COUNT:size:_ROLLUP_FIELDS],
+                values[_ROLLUP_TIMEOUTS:size:_ROLLUP_FIELDS],
+                values[_ROLLUP_TOTAL:size:_ROLLUP_FIELDS]))
+
+    @_timed("find_all_failure_rollup")
+    def find_all_failure_rollup(self, threshold: int = 1,
+                                resolution: int = 60,
+                                start: Optional[datetime.datetime] = None,
+                                end: Optional[datetime.datetime] = None
+                                ) -> list[dict[str, str]]:
+        """
+        find_all_failure()を、resolution秒(ROLLUP_BUCKETSのいずれか)の期間ごとの集計で
+        行う。期間内のデータがすべて無応答だった期間が続いている間を故障とみなし、
+        無応答がthreshold回以上のものを同じ形式で返却する。
+        故障と復帰が期間の境界で起きている場合は、find_all_failure()と同じ結果になる。
+        start, endを指定した場合は、end以前に終わる期間で検出した故障期間のうち、
+        start以降に終了したものだけを返却する。
+        """
+        if threshold <= 0:
+            threshold = 1
+        start_time, end_time = _time_range(start, end) or (None, None)
+        result = []
+        for address, runs in self._rollup_periods(
+                _rollup_level(resolution), end_time,
+                lambda count, timeouts, total: count == 0):
+            name = _format_address(address)
+            for period in _ended_after(
+                    [run[:3] for run in runs if run[3] >= threshold],
+                    start_time):
+                result.append({"address": name,
+                               "period": _format_period(*period)})
+        return result
+
+    @_timed("find_all_high_load_rollup")
+    def find_all_high_load_rollup(self, threshold_average: float,
+                                  resolution: int = 60,
+                                  start: Optional[datetime.datetime] = None,
+                                  end: Optional[datetime.datetime] = None
+                                  ) -> list[dict[str, str]]:
+        """
+        find_all_high_load()を、resolution秒(ROLLUP_BUCKETSのいずれか)の期間ごとの集計で
+        行う。期間内の平均応答時間がthreshold_average以上だった期間が続いている間を
+        過負荷とみなし、同じ形式で返却する。
+        各期間のデータがすべて過負荷か、すべて過負荷でない場合は、
+        find_all_high_load(1, threshold_average)と同じ結果になる。
+        ただし、find_all_high_load()はサーバアドレスごとの最初のデータを判定しないので、
+        最初の期間が過負荷の場合は、開始時刻が最初のデータの確認日時になる点が異なる
+        (最初の期間のデータが1件だけの場合は、find_all_high_load()では過負荷にならない)。
+        start, endはfind_all_failure_rollup()と同じ。
+        """
+        start_time, end_time = _time_range(start, end) or (None, None)
+        result = []
+        for address, runs in self._rollup_periods(
+                _rollup_level(resolution), end_time,
+                lambda count, timeouts, total:
+                count > 0 and total / count >= threshold_average):
+            name = _format_address(address)
+            for period in _ended_after([run[:3] for run in runs],
+                                       start_time):
+                result.append({"address": name,
+                               "period": _format_period(*period)})
+        return result
+
+    ###################################
+    # スナップショット
+    ###################################
+    def save_snapshot(self, path: str) -> None:
+        """
+        取り込んだデータをバイナリ形式のスナップショットファイルに保存する。
+
+        ファイルの構成(すべてリトルエンディアン)
+        1. ヘッダ: 識別子, 形式のバージョン, サーバアドレス数, サブネット数
+        2. サーバアドレス表: アドレス(uint32), プレフィックス長, データ件数, データの位置
+        3. サブネット表: ネットワーク(uint32), プレフィックス長, ホスト数,
+           ホストのサーバアドレス表での位置(uint32)の並び
+        4. 引き継いだ状態: 件数(uint32), 保持期間を過ぎてデータを削除したサーバアドレスごとの
+           サーバアドレス表での位置, 削除件数, 最後の確認日時, 無応答・過負荷の検出途中の状態
+        5. データ: サーバアドレスごとに確認日時(int64)の並び, 応答時間(int32)の並び
+           (各サーバアドレスのデータは8バイト境界から始まる)
+        """
+        temporary_path = path + ".tmp"
+        with open(temporary_path, "wb") as fd:
+            fd.writelines(self._snapshot_parts()[1])
+        os.replace(temporary_path, path)
+
+    def _snapshot_parts(self) -> tuple[int, Iterator[bytes]]:
+        """
+        スナップショットの形式のバイト数と、その内容を先頭から順に返却するイテレータを返却する。
+        """
+        addresses = list(self._records)
+        address_index = {address: index
+                         for index, address in enumerate(addresses)}
+        carries = [_pack_carry(index, self._records[address].carry_state())
+                   for index, address in enumerate(addresses)
+                   if self._records[address].evicted]
+        table_size = _SNAPSHOT_HEADER.size \
+            + _SNAPSHOT_ADDRESS.size * len(addresses) \
+            + sum(_SNAPSHOT_SUBNET.size + 4 * len(hosts)
+                  for hosts in self._subnets.values()) \
+            + _SNAPSHOT_CARRY_COUNT.size + sum(map(len, carries))
+        offset = _align8(table_size)
+        entries = []
+        for address in addresses:
+            count = len(self._records[address])
+            entries.append(_SNAPSHOT_ADDRESS.pack(
+                address >> 8, address & 0xFF, count, offset))
+            offset += _align8(count * 12)
+
+        def iter_parts() -> Iterator[bytes]:
+            yield _SNAPSHOT_HEADER.pack(
+                _SNAPSHOT_MAGIC, _SNAPSHOT_VERSION,
+                len(addresses), len(self._subnets))
+            yield from entries
+            for subnet, hosts in self._subnets.items():
+                yield _SNAPSHOT_SUBNET.pack(
+                    subnet >> 8, subnet & 0xFF,
+                    len(hosts))
+                yield _little_endian_bytes(
+                    array('I', [address_index[host] for host in hosts]))
+            yield _SNAPSHOT_CARRY_COUNT.pack(len(carries))
+            yield from carries
+            yield bytes(_align8(table_size) - table_size)
+            for address in addresses:
+                series = self._records[address]
+                yield _little_endian_bytes(series.times)
+                yield _little_endian_bytes(series.responses)
+                size = len(series) * 12
+                yield bytes(_align8(size) - size)
+
+        return offset, iter_parts()
+
+    @classmethod
+    def open_snapshot(cls, path: str, workers: int = 1) -> 'ResponseTimes':
+        """
+        save_snapshot()で保存したスナップショットファイルを開く。
+        データはメモリマップ上で参照するので、参照したページだけが読み込まれる。
+        """
+        if not os.path.isfile(path) or not os.access(path, os.R_OK):
+            logger.error("Failed to open snapshot: {0:}".format(path))
+            return cls(workers=workers)
+        with open(path, "rb") as fd:
+            if os.fstat(fd.fileno()).st_size < _SNAPSHOT_HEADER.size:
+                raise ValueError("Invalid snapshot: {0:}".format(path))
+            snapshot = mmap.mmap(fd.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls._from_snapshot(snapshot, memoryview(snapshot), path,
+                                  workers)
+
+    @classmethod
+    def _from_snapshot(cls, owner: object, view: memoryview, name: str,
+                       workers: int) -> 'ResponseTimes':
+        """
+        スナップショットの形式のバッファviewを、コピーせずに参照するインスタンスを生成する。
+        ownerはバッファを保持するオブジェクト(メモリマップ、共有メモリ)で、
+        インスタンスが使われている間は閉じないように保持しておく。
+        """
+        instance = cls(workers=workers)
+        if len(view) < _SNAPSHOT_HEADER.size:
+            raise ValueError("Invalid snapshot: {0:}".format(name))
+        magic, version, address_count, subnet_count = \
+            _SNAPSHOT_HEADER.unpack_from(view, 0)
+        # バージョン1の形式(引き継いだ状態がない)も読み込める
+        if magic != _SNAPSHOT_MAGIC or not 1 <= version <= _SNAPSHOT_VERSION:
+            raise ValueError("Invalid snapshot: {0:}".format(name))
+        position = _SNAPSHOT_HEADER.size
+        addresses = []
+        for _ in range(address_count):
+            ip, prefixlen, count, offset = \
+                _SNAPSHOT_ADDRESS.unpack_from(view, position)
+            position += _SNAPSHOT_ADDRESS.size
+            address = ip << 8 | prefixlen
+            middle = offset + count * 8
+            instance._records[address] = _Series.from_arrays(
+                _view_as(view[offset:middle], 'q'),
+                _view_as(view[middle:middle + count * 4], 'i'))
+            addresses.append(address)
+        for _ in range(subnet_count):
+            network, prefixlen, host_count = \
+                _SNAPSHOT_SUBNET.unpack_from(view, position)
+            position += _SNAPSHOT_SUBNET.size
+            hosts = _view_as(view[position:position + host_count * 4], 'I')
+            position += host_count * 4
+            instance._subnets[network << 8 | prefixlen] = \
+                [addresses[index] for index in hosts]
+        if version >= 2:
+            carry_count, = _SNAPSHOT_CARRY_COUNT.unpack_from(view, position)
+            position += _SNAPSHOT_CARRY_COUNT.size
+            for _ in range(carry_count):
+                index, state, position = _unpack_carry(view, position)
+                instance._records[addresses[index]].set_carry_state(state)
+        instance._snapshot = owner
+        instance._data_version += 1
+        return instance
+
+    ###################################
+    # 共有メモリ
+    ###################################
+    def publish_shared(self, name: Optional[str] = None) -> str:
+        """
+        取り込んだデータをスナップショットの形式で共有メモリに書き込み、共有メモリの名前を返却する。
+        ほかのプロセスはattach_shared()でその名前を指定して、コピーせずに参照できる。
+        共有メモリはclose()(またはwith文の終わり)で削除するので、
+        参照するプロセスが使い終わるまでは閉じないこと。
+        共有メモリの空き容量が足りない場合はOSErrorになる。
+        """
+        from multiprocessing import shared_memory
+        size, parts = self._snapshot_parts()
+        _check_shared_memory_space(size)
+        shared = shared_memory.SharedMemory(name, create=True, size=size)
+        try:
+            position = 0
+            for part in parts:
+                shared.buf[position:position + len(part)] = part
+                position += len(part)
+        except BaseException:
+            shared.close()
+            shared.unlink()
+            raise
+        self._shared.append(shared)
+        _published_shared_memory.add(shared._name)
+        return shared.name
+
+    @classmethod
+    def attach_shared(cls, name: str, workers: int = 1) -> 'ResponseTimes':
+        """
+        publish_shared()で書き込んだ共有メモリを読み取り専用で参照するインスタンスを生成する。
+        データはコピーしないので、サーバアドレス・サブネットの一覧を作る時間しかかからない。
+        データを追加した場合は、そのサーバアドレスのデータだけをコピーする。
+        """
+        shared = _attach_shared_memory(name)
+        return cls._from_snapshot(shared, shared.buf.toreadonly(), name,
+                                  workers)
+
+    ###################################
+    # 並列処理
+    ###################################
+    def _detect_one(self, task: str, key, args: tuple,
+                    time_range: Optional[tuple] = None) -> list[tuple]:
+        """
+        1つのサーバアドレス(またはサブネット)について検出処理を行い、
+        (開始時刻, 最後の時刻, 復帰時刻)の組の一覧を返却する。
+        time_rangeには検出する期間(開始時刻, 終了時刻)を経過秒数で指定する。
+        """
+        if task == "failure":
+            return self._failure_list(key, *args, time_range)
+        if task == "analyze":
+            return self._analyze_one(key, *args, time_range)
+        if task == "failure_runs":
+            return self._counted_failure_runs(key, *args, time_range)
+        if task == "subnet_failure_sweep":
+            return self._subnet_failure_sweep(key, *args, time_range)
+        if task == "high_load_sweep":
+            threshold_counts, threshold_averages = args
+            start_time, end_time = time_range \
+                if time_range is not None else (None, None)
+            return [_high_load_sweep(self._records[key], threshold_count,
+                                     threshold_averages, start_time, end_time)
+                    for threshold_count in threshold_counts]
+        if task == "high_load":
+            if time_range is None:
+                return list(
+                    self._get_high_load_runs(key, *args).iter_periods())
+            return _high_loads_between(self._records[key], *args,
+                                       *time_range)
+        return self._subnet_failure_runs(key, *args, time_range=time_range)
+
+    def _detect(self, task: str, args: tuple,
+                time_range: Optional[tuple] = None) -> Iterator[tuple]:
+        """
+        すべてのサーバアドレス(subnet_failureの場合はサブネット)について検出処理を行い、
+        (サーバアドレスまたはサブネット, 検出結果)の組を1件ずつ返却する。
+        1プロセスの場合は、各サーバアドレスの検出は取り出されたときに行う。
+        workersが2以上の場合は複数のプロセスに分けて処理する。
+        結果の順序は並列処理の有無によらない。
+        """
+        keys = list(self._subnets if task.startswith("subnet_failure")
+                    else self._records)
+        if self._workers <= 1 or len(keys) <= 1:
+            return ((key, self._detect_one(task, key, args, time_range))
+                    for key in keys)
+        executor = self._get_executor()
+        chunk_size = -(-len(keys) // (self._workers
+                                      * ResponseTimes.CHUNKS_PER_WORKER))
+        chunks = [range(start, min(start + chunk_size, len(keys)))
+                  for start in range(0, len(keys), chunk_size)]
+        results = executor.map(_run_worker_task, itertools.repeat(task),
+                               chunks, itertools.repeat(args),
+                               itertools.repeat(time_range))
+        return zip(keys, itertools.chain.from_iterable(results))
+
+    def _get_executor(self) -> 'concurrent.futures.ProcessPoolExecutor':
+        """
+        並列処理に使うプロセスプールを返却する。
+        各プロセスにはデータ全体をプロセスの起動時に1度だけ渡す。
+        データが変わっていたら、プロセスプールを作りなおす。
+        """
+        if self._executor is not None \
+           and self._executor_version != self._data_version:
+            self._shutdown_executor()
+        if self._executor is None:
+            import concurrent.futures
+            self._executor = concurrent.futures.ProcessPoolExecutor(
+                max_workers=self._workers, initializer=_init_worker,
+                initargs=(self._dataset(),))
+            self._executor_version = self._data_version
+        return self._executor
+
+    def _dataset(self) -> list[tuple]:
+        """
+        ほかのプロセスに渡すための
+        (サーバアドレス, 確認日時, 応答時間, 削除したデータから引き継いだ状態)の
+        一覧を返却する。
+        """
+        return [(address, _to_array('q', series.times),
+                 _to_array('i', series.responses), series.carry_state())
+                if not isinstance(series.times, array)
+                else (address, series.times, series.responses,
+                      series.carry_state())
+                for address, series in self._records.items()]
+
+    @classmethod
+    def _from_dataset(cls, dataset: list[tuple]) -> 'ResponseTimes':
+        """
+        _dataset()で作成した一覧からインスタンスを生成する。
+        """
+        instance = cls()
+        for address, times, responses, carry_state in dataset:
+            series = instance._records[address] = _Series.from_arrays(
+                times, responses)
+            series.set_carry_state(carry_state)
+        instance._commit()
+        return instance
+
+    def close(self) -> None:
+        """
+        並列処理に使っているプロセスプールを終了し、publish_shared()で作成した共有メモリを削除する。
+        open_snapshot(), attach_shared()で開いたインスタンスは、スナップショットも閉じる。
+        """
+        self._shutdown_executor()
+        if self._snapshot is not None:
+            self._release_snapshot()
+        for shared in self._shared:
+            shared.close()
+            shared.unlink()
+            _published_shared_memory.discard(shared._name)
+        self._shared.clear()
+
+    def _release_snapshot(self) -> None:
+        """
+        スナップショットのメモリマップ(共有メモリ)を閉じる。
+        その上のデータを参照したままでは閉じられないので、先に参照を解放してデータを手放す。
+        閉じたあとのインスタンスはデータを持たない。
+        """
+        for series in self._records.values():
+            for values in (series.times, series.responses):
+                if isinstance(values, memoryview):
+                    values.release()
+        self._records.clear()
+        self._subnets.clear()
+        self._address_cache.clear()
+        self.cache_clear()
+        self._data_version += 1
+        self._snapshot.close()
+        self._snapshot = None
+
+    def _shutdown_executor(self) -> None:
+        """
+        並列処理に使っているプロセスプールを終了する。
+        """
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def __enter__(self) -> 'ResponseTimes':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+###################################
+# 並列処理のワーカープロセス
+###################################
+# ワーカープロセスが保持するインスタンスと、サーバアドレス・サブネットの一覧
+_worker_state: Optional[tuple] = None
+
+
+def _init_worker(dataset: list[tuple]) -> None:
+    """
+    ワーカープロセスの起動時に、渡されたデータからインスタンスを生成する。
+    """
+    global _worker_state
+    instance = ResponseTimes._from_dataset(dataset)
+    _worker_state = (instance, list(instance._records),
+                     list(instance._subnets))
+
+
+def _run_worker_task(task: str, indices: range, args: tuple,
+                     time_range: Optional[tuple]) -> list[list[tuple]]:
+    """
+    ワーカープロセスで、指定した位置のサーバアドレス(またはサブネット)の検出処理を行う。
+    """
+    instance, addresses, subnets = _worker_state
+    keys = subnets if task.startswith("subnet_failure") else addresses
+    return [instance._detect_one(task, keys[index], args, time_range)
+            for index in indices]
+
+
+###################################
+# ストリーミング解析
+###################################
+class _StreamState(object):
+    """
+    ストリーミング解析での、1つのサーバアドレスの検出途中の状態
+    """
+    __slots__ = [
+        'address',
+        'failed_count',
+        'fail_start',
+        'fail_last',
+        'window',
+        'window_total',
+        'window_count',
+        'seen',
+        'load_start',
+        'load_last',
+        'failures'
+    ]
+
+    def __init__(self, address: int,
+                 threshold_count: int):
+        self.address = address
+        # 無応答の回数, 開始時刻, 最後の無応答時刻
+        self.failed_count = 0
+        self.fail_start = 0
+        self.fail_last = 0
+        # 直近threshold_count回の応答時間と、タイムアウトを除いた合計と件数
+        self.window: collections.deque = collections.deque(
+            maxlen=max(threshold_count, 0))
+        self.window_total = 0
+        self.window_count = 0
+        self.seen = 0
+        # 継続中の過負荷期間の開始時刻, 最後の過負荷時刻
+        self.load_start: Optional[int] = None
+        self.load_last: Optional[int] = None
+        # サブネットの故障の判定に使う、復帰した故障期間の一覧
+        self.failures: list[tuple[int, int, int]] = []
+
+
+class StreamingAnalyzer(object):
+    """
+    CSVを1度だけ先頭から読みながら、故障期間・過負荷期間・サブネットの故障期間を検出するクラス
+
+    データは保持せず、サーバアドレスごとの検出途中の状態(直近threshold_count回の応答時間と、
+    サブネットの判定に使う故障期間)だけを保持するので、メモリに載らない大きさのCSVファイルも解析できる。
+    サブネットの故障期間は、サブネット内のサーバアドレスがすべてそろう最後にまとめて返却する。
+    データは確認日時順に並んでいることを前提とする。reorder_window秒以内の順序の入れ替わりは
+    並べなおしてから検出し、それより遅れて届いたデータは警告を出力してスキップする。
+    liveを指定した場合は、故障期間・過負荷期間の開始(failure_opened, high_load_opened)も返却し、
+    サブネットの故障期間も、サブネット内のすべてのホストの故障が終了して確定した時点で返却する。
+    ただし返却したあとにサブネットに新しいホストが加わった場合、finish()(ResponseTimes)の結果では
+    そのホストも故障していない期間はサブネットの故障期間にならないが、返却済みの期間は取り消さない。
+    また、使わなくなった古い故障期間はPRUNE_INTERVAL秒ごとに削除するので、長時間動かし続けても
+    保持する状態は大きくならない。
+    """
+    __slots__ = [
+        '_parser',
+        '_threshold',
+        '_threshold_count',
+        '_threshold_average',
+        '_subnet_threshold',
+        '_tolerance',
+        '_reorder_window',
+        '_states',
+        '_pending',
+        '_pending_times',
+        '_latest_time',
+        '_released_time',
+        '_line_num',
+        '_live',
+        '_subnet_count',
+        '_reported',
+        '_pruned_time',
+        '_offsets'
+    ]
+
+    # チェックポイントファイルの形式のバージョン
+    CHECKPOINT_VERSION = 1
+    # liveの場合に、使わなくなった故障期間を削除する間隔(確認日時の秒数)
+    PRUNE_INTERVAL = 60
+
+    def __init__(self, threshold: int = 1,
+                 threshold_count: Optional[int] = None,
+                 threshold_average: Optional[float] = None,
+                 subnet_threshold: int = 1,
+                 tolerance: Optional[int] = None,
+                 reorder_window: int = 0, live: bool = False):
+        # CSVの行の検証と変換に使う(データは取り込まない)
+        self._parser = ResponseTimes()
+        self._threshold = max(threshold, 1)
+        # threshold_count, threshold_averageを指定しない場合は、過負荷期間を検出しない
+        self._threshold_count = threshold_count \
+            if threshold_count is not None \
+            and threshold_average is not None else 0
+        self._threshold_average = threshold_average
+        self._subnet_threshold = subnet_threshold
+        self._tolerance = tolerance if tolerance is not None \
+            else ResponseTimes.DEFAULT_SUBNET_FAILURE_TOLERANCE
+        self._reorder_window = reorder_window
+        # サーバアドレスごとの検出途中の状態
+        self._states: dict[int, _StreamState] = {}
+        # 並べなおし待ちのデータ(確認日時ごとに、検出途中の状態から応答時間への辞書)と
+        # その確認日時のヒープ
+        self._pending: dict[int, dict[_StreamState, int]] = {}
+        self._pending_times: list[int] = []
+        # これまでで最も新しい確認日時と、検出に反映済みの確認日時
+        self._latest_time: Optional[int] = None
+        self._released_time: Optional[int] = None
+        self._line_num = 1
+        # liveの場合の、サブネットの一覧を更新したときのサーバアドレス数と、
+        # 返却済みのサブネットの故障期間
+        self._live = live
+        self._subnet_count = 0
+        self._reported: set[tuple[int, tuple]] = set()
+        # liveの場合の、最後に古い故障期間を削除したときの反映済みの確認日時
+        self._pruned_time: Optional[int] = None
+        # run()で読み込んだCSVファイルごとの、読み込み済みのバイト数
+        self._offsets: dict[str, int] = {}
+
+    def run(self, file_path: str,
+            finish: bool = True) -> Iterator[dict[str, str]]:
+        """
+        CSVファイルを読み込み済みの位置(はじめは先頭)から読みながら、検出した期間を順に返却する。
+        finishにFalseを指定した場合はfinish()を呼ばず、改行で終わっていない最後の行も読み込まない。
+        そのあとにsave_checkpoint()で保存しておけば、次回は追記された行だけを読み込んで続きを検出できる。
+        """
+        key = os.path.abspath(file_path)
+        offset = self._offsets.get(key, 0)
+        if not file_path.endswith(('.gz', '.bz2')) \
+           and os.path.getsize(file_path) < offset:
+            # ファイルが切り詰められていたら最初から読み込みなおす
+            logger.warning("Truncated csv, reading from the beginning: "
+                           "{0:}".format(file_path))
+            offset = 0
+        logger.info("Started analyzing csv: {0:}".format(file_path))
+        with _open_binary(file_path) as fd:
+            fd.seek(offset)
+            for lines, terminated, size in _read_line_blocks(
+                    fd, ResponseTimes.MERGE_BLOCK_SIZE, finish):
+                events = self.feed(lines, terminated)
+                if terminated:
+                    offset += size
+                    self._offsets[key] = offset
+                yield from events
+        if finish:
+            yield from self.finish()
+        logger.info("Completed.")
+
+    def save_checkpoint(self, path: str) -> None:
+        """
+        検出途中の状態をチェックポイントファイル(JSON)に保存する。
+        保存するのは閾値、run()で読み込み済みのバイト数、最後に古い故障期間を削除した確認日時、
+        サーバアドレスごとの継続中の故障期間・
+        過負荷期間と直近threshold_count回の応答時間、サブネットの判定に使う故障期間、
+        並べなおし待ちのデータで、読み込んだデータそのものは保存しない。
+        """
+        import json
+        checkpoint = {
+            "version": StreamingAnalyzer.CHECKPOINT_VERSION,
+            "settings": [self._threshold, self._threshold_count,
+                         self._threshold_average, self._subnet_threshold,
+                         self._tolerance, self._reorder_window, self._live],
+            "offsets": self._offsets,
+            "line_num": self._line_num,
+            "latest_time": self._latest_time,
+            "released_time": self._released_time,
+            "pruned_time": self._pruned_time,
+            # サブネットの一覧は、サーバアドレスを最初に読み込んだ順に作るので、その順に保存する
+            "addresses": list(self._parser._records),
+            "states": [[state.address, state.failed_count, state.fail_start,
+                        state.fail_last, list(state.window), state.seen,
+                        state.load_start, state.load_last, state.failures]
+                       for state in self._states.values()],
+            "pending": [[log_time, [[state.address, response_time]
+                                    for state, response_time
+                                    in samples.items()]]
+                        for log_time, samples in self._pending.items()],
+            "reported": [[subnet, failure]
+                         for subnet, failure in self._reported]
+        }
+        temporary_path = path + ".tmp"
+        with open(temporary_path, 'w', encoding='utf-8') as fd:
+            json.dump(checkpoint, fd, separators=(',', ':'))
+        os.replace(temporary_path, path)
+
+    @classmethod
+    def load_checkpoint(cls, path: str) -> 'StreamingAnalyzer':
+        """
+        save_checkpoint()で保存したチェックポイントファイルから、検出途中の状態を復元する。
+        閾値も保存したときのものを使う。
+        """
+        import json
+        with open(path, 'r', encoding='utf-8') as fd:
+            try:
+                checkpoint = json.load(fd)
+            except ValueError:
+                raise ValueError("Invalid checkpoint: {0:}".format(path))
+        if not isinstance(checkpoint, dict) or checkpoint.get("version") \
+           != StreamingAnalyzer.CHECKPOINT_VERSION:
+            raise ValueError("Invalid checkpoint: {0:}".format(path))
+        (threshold, threshold_count, threshold_average, subnet_threshold,
+         tolerance, reorder_window, live) = checkpoint["settings"]
+        analyzer = cls(threshold, threshold_count, threshold_average,
+                       subnet_threshold, tolerance, reorder_window, live)
+        analyzer._offsets = checkpoint["offsets"]
+        analyzer._line_num = checkpoint["line_num"]
+        analyzer._latest_time = checkpoint["latest_time"]
+        analyzer._released_time = checkpoint["released_time"]
+        analyzer._pruned_time = checkpoint.get("pruned_time")
+        for address in checkpoint["addresses"]:
+            analyzer._parser._records[address] = _Series()
+        states = analyzer._states
+        for (address, failed_count, fail_start, fail_last, window, seen,
+             load_start, load_last, failures) in checkpoint["states"]:
+            state = states[address] = _StreamState(address, threshold_count)
+            state.failed_count = failed_count
+            state.fail_start = fail_start
+            state.fail_last = fail_last
+            state.window.extend(window)
+            responses = [value for value in window if value != TIMEOUT]
+            state.window_total = sum(responses)
+            state.window_count = len(responses)
+            state.seen = seen
+            state.load_start = load_start
+            state.load_last = load_last
+            state.failures = [tuple(failure) for failure in failures]
+        for log_time, samples in checkpoint["pending"]:
+            analyzer._pending[log_time] = {
+                states[address]: response_time
+                for address, response_time in samples}
+        analyzer._pending_times = list(analyzer._pending)
+        heapq.heapify(analyzer._pending_times)
+        analyzer._reported = {(subnet, tuple(failure))
+                              for subnet, failure in checkpoint["reported"]}
+        return analyzer
+
+    def feed(self, lines: Iterable[str],
+             terminated: bool = True) -> list[dict[str, str]]:
+        """
+        CSVの行を読み込み、それによって終了が確定した期間を返却する。
+        """
+        parsed = []
+        self._line_num = self._parser._ingest_lines(
+            list(lines), self._line_num, terminated, parsed=parsed)
+        pending = self._pending
+        pending_times = self._pending_times
+        states = self._states
+        threshold_count = self._threshold_count
+        released_time = self._released_time
+        latest_time = self._latest_time
+        for log_time, target, response_time in parsed:
+            if released_time is not None and log_time <= released_time:
+                logger.warning("Skipped late data: {0:},{1:},{2:}".format(
+                    to_datetime(log_time), _format_address(target[0]),
+                    response_time))
+                continue
+            state = states.get(target[0])
+            if state is None:
+                state = states[target[0]] = _StreamState(
+                    target[0], threshold_count)
+            samples = pending.get(log_time)
+            if samples is None:
+                samples = pending[log_time] = {}
+                heapq.heappush(pending_times, log_time)
+            # 同じサーバアドレス・確認日時のデータは、あとから読み込んだものを使う
+            samples[state] = response_time
+            if latest_time is None or log_time > latest_time:
+                latest_time = log_time
+        self._latest_time = latest_time
+        if latest_time is None:
+            return []
+        if self._live and self._subnet_count != len(self._parser._records):
+            self._parser._parse_subnet()
+            self._subnet_count = len(self._parser._records)
+        # 確認日時がlatest_time - reorder_windowより前のデータは、もう並べなおす必要はない
+        events = self._release(latest_time - self._reorder_window)
+        if self._live:
+            self._prune_failures()
+        return events
+
+    def finish(self) -> list[dict[str, str]]:
+        """
+        並べなおし待ちのデータをすべて反映し、継続中の期間とサブネットの故障期間を返却する。
+        """
+        events = self._release(None)
+        states = self._states
+        for state in states.values():
+            if state.failed_count >= self._threshold:
+                events.append(self._event(
+                    "failure", state.address,
+                    (state.fail_start, state.fail_last, None)))
+            if state.load_start is not None:
+                events.append(self._event(
+                    "high_load", state.address,
+                    (state.load_start, state.load_last, None)))
+        self._parser._parse_subnet()
+        for subnet, addresses in self._parser._subnets.items():
+            for failure in self._subnet_failures(addresses, states):
+                if (subnet, failure) not in self._reported:
+                    events.append(self._event("subnet_failure", subnet,
+                                              failure))
+        return events
+
+    def _release(self, until: Optional[int]) -> list[dict[str, str]]:
+        """
+        並べなおし待ちのデータのうち、確認日時がuntilより前のもの(Noneの場合はすべて)を
+        確認日時順に検出に反映し、終了が確定した期間を返却する。
+        """
+        events = []
+        pending = self._pending
+        pending_times = self._pending_times
+        update = self._update
+        while pending_times and (until is None or pending_times[0] < until):
+            log_time = heapq.heappop(pending_times)
+            for state, response_time in pending.pop(log_time).items():
+                update(state, log_time, response_time, events)
+            self._released_time = log_time
+        return events
+
+    def _update(self, state: _StreamState, log_time: int, response_time: int,
+                events: list) -> None:
+        """
+        1件のデータを検出途中の状態に反映する。
+        判定方法はResponseTimesの各メソッドと同じ。
+        """
+        # 故障期間
+        if response_time == TIMEOUT:
+            if state.failed_count <= 0:
+                state.fail_start = log_time
+            state.failed_count += 1
+            state.fail_last = log_time
+            if self._live and state.failed_count == self._threshold:
+                events.append(self._event(
+                    "failure_opened", state.address,
+                    (state.fail_start, log_time, None)))
+        elif state.failed_count >= 1:
+            failure = (state.fail_start, state.fail_last, log_time)
+            if state.failed_count >= self._threshold:
+                events.append(self._event("failure", state.address, failure))
+            if state.failed_count >= self._subnet_threshold:
+                state.failures.append(failure)
+                if self._live:
+                    self._live_subnet_failures(state, failure, events)
+            state.failed_count = 0
+        # 過負荷期間(直近threshold_count回分のデータがそろったあとに判定する)
+        window = state.window
+        if window.maxlen <= 0:
+            return
+        if len(window) == window.maxlen:
+            oldest = window[0]
+            if oldest != TIMEOUT:
+                state.window_total -= oldest
+                state.window_count -= 1
+        window.append(response_time)
+        if response_time != TIMEOUT:
+            state.window_total += response_time
+            state.window_count += 1
+        state.seen += 1
+        if state.seen <= window.maxlen:
+            return
+        if state.window_count > 0 and state.window_total \
+           / state.window_count >= self._threshold_average:
+            if state.load_start is None:
+                state.load_start = log_time
+                if self._live:
+                    events.append(self._event(
+                        "high_load_opened", state.address,
+                        (log_time, log_time, None)))
+            state.load_last = log_time
+        elif state.load_start is not None:
+            events.append(self._event(
+                "high_load", state.address,
+                (state.load_start, state.load_last, log_time)))
+            state.load_start = None
+            state.load_last = None
+
+    def _prune_failures(self) -> None:
+        """
+        liveの場合に、これから終了する故障期間と突き合わせることのない古い故障期間と、
+        返却済みのサブネットの故障期間を削除する(PRUNE_INTERVAL秒ごと)。
+        これから終了する故障期間は、継続中の故障期間の開始時刻と反映済みの確認日時のうち
+        最も古いもの以降に始まる。突き合わせる最初のホストの故障期間はそのtolerance秒前以降に、
+        ほかのホストの故障期間はさらにtolerance秒前以降に始まるので、それより前のものは使わない。
+        """
+        released_time = self._released_time
+        if released_time is None or self._pruned_time is not None \
+           and released_time - self._pruned_time \
+           < StreamingAnalyzer.PRUNE_INTERVAL:
+            return
+        self._pruned_time = released_time
+        watermark = min((state.fail_start for state in self._states.values()
+                         if state.failed_count >= 1), default=released_time)
+        cutoff = min(watermark, released_time) - 2 * self._tolerance
+        start_time = operator.itemgetter(0)
+        for state in self._states.values():
+            failures = state.failures
+            if failures and failures[0][0] < cutoff:
+                del failures[:bisect.bisect_left(failures, cutoff,
+                                                 key=start_time)]
+        self._reported = {(subnet, failure)
+                          for subnet, failure in self._reported
+                          if failure[0] >= cutoff}
+
+    def _live_subnet_failures(self, state: _StreamState,
+                              failure: tuple[int, int, int],
+                              events: list) -> None:
+        """
+        サーバアドレスの故障期間が終了したときに、それによって確定したサブネットの故障期間を
+        eventsに加える。判定方法はfinish()(ResponseTimes.find_all_subnet_failure())と同じで、
+        終了した故障期間どうしで一致したものは、finish()でも同じ期間になる。
+        """
+        subnet = _network_keys([state.address])[0]
+        addresses = self._parser._subnets.get(subnet)
+        if addresses is None or len(addresses) < 2:
+            return
+        states = self._states
+        first = states.get(addresses[0])
+        if first is None:
+            return
+        tolerance = self._tolerance
+        start_time = operator.itemgetter(0)
+
+        def overlapping(failures: list[tuple], time: int) -> list[tuple]:
+            # 開始時刻の差が許容誤差以内の故障期間
+            return failures[
+                bisect.bisect_left(failures, time - tolerance,
+                                   key=start_time):
+                bisect.bisect_right(failures, time + tolerance,
+                                    key=start_time)]
+
+        candidates = [failure] if state is first \
+            else overlapping(first.failures, failure[0])
+        for candidate in candidates:
+            if (subnet, candidate) in self._reported:
+                continue
+            for address in addresses[1:]:
+                other = states.get(address)
+                if other is None or not any(
+                        abs(return_time - candidate[2]) <= tolerance
+                        for _, _, return_time
+                        in overlapping(other.failures, candidate[0])):
+                    break
+            else:
+                self._reported.add((subnet, candidate))
+                events.append(self._event("subnet_failure", subnet,
+                                          candidate))
+
+    def _subnet_failures(self, addresses: list[int],
+                         states: dict[int, _StreamState]
+                         ) -> list[tuple[int, int, Optional[int]]]:
+        """
+        サブネット内の各サーバアドレスの故障期間を突き合わせて、サブネットの故障期間を返却する。
+        判定方法はResponseTimes.find_all_subnet_failure()と同じ。
+        """
+        # サブネットに属する2つの以上のホストがリストにない場合は、サブネットの故障とはしない
+        if len(addresses) < 2:
+            return []
+
+        def failure_list(address):
+            state = states.get(address)
+            if state is None:
+                return []
+            failures = list(state.failures)
+            if state.failed_count >= 1 \
+               and state.failed_count >= self._subnet_threshold:
+                failures.append((state.fail_start, state.fail_last, None))
+            return failures
+
+        return _join_subnet_failures(map(failure_list, addresses),
+                                     self._tolerance)
+
+    @staticmethod
+    def _event(kind: str, key, period: tuple) -> dict[str, str]:
+        """
+        検出した期間を、検出の種類とサーバアドレス(またはサブネット)、期間の辞書にする。
+        """
+        name = "subnet" if kind == "subnet_failure" else "address"
+        return {"type": kind, name: _format_address(key),
+                "period": _format_period(*period)}
+
+
+###################################
+# ソケットからの取り込み
+###################################
+class _DatagramReceiver(object):
+    """
+    LiveIngestServerのUDPソケットで受け取ったデータグラムを渡すプロトコル
+    """
+    __slots__ = ['_server']
+
+    def __init__(self, server: 'LiveIngestServer'):
+        self._server = server
+
+    def connection_made(self, transport) -> None:
+        pass
+
+    def datagram_received(self, data: bytes, address: tuple) -> None:
+        self._server._feed(data)
+
+    def error_received(self, exc: Exception) -> None:
+        logger.warning("UDP error: {0:}".format(exc))
+
+    def connection_lost(self, exc: Optional[Exception]) -> None:
+        pass
+
+
+class LiveIngestServer(object):
+    """
+    ローカルのTCP/UDPソケットで、CSVファイルと同じ形式の行を受け取りながら検出するサービス(asyncio)
+
+    受け取った行はStreamingAnalyzer(live=True)で1件ずつ検出途中の状態に反映し、
+    開始・終了した故障期間・過負荷期間と、確定したサブネットの故障期間をsubscribe()で
+    登録したキューに送る。行の検証はCSVファイルの読み込みと同じ。
+    TCPでは行を改行で区切り、UDPでは1つのデータグラムに1行以上を入れる。
+    受け取ったデータはREAD_BLOCK_SIZEごとに検出に反映するので、1件あたりの遅延は
+    そのデータ量の処理時間と、並べなおし(reorder_window)の待ち時間までになる。
+    """
+    __slots__ = [
+        '_analyzer',
+        '_host',
+        '_tcp_port',
+        '_udp_port',
+        '_server',
+        '_transport',
+        '_subscribers',
+        'tcp_address',
+        'udp_address'
+    ]
+
+    # TCPの接続から1度に読み込むバイト数
+    READ_BLOCK_SIZE = 64 * 1024
+    # TCPで改行を待つ行の最大バイト数(超えた行は警告を出力して捨てる)
+    MAX_LINE_SIZE = 4 * 1024
+    # subscribe()で作成するキューの大きさ(あふれた期間は警告を出力して捨てる)
+    SUBSCRIBER_QUEUE_SIZE = 65536
+
+    def __init__(self, analyzer: Optional[StreamingAnalyzer] = None,
+                 host: str = "127.0.0.1", tcp_port: Optional[int] = 0,
+                 udp_port: Optional[int] = None):
+        """
+        analyzerを指定しない場合は、StreamingAnalyzer(live=True)を使う。
+        tcp_port, udp_portがNoneのソケットは開かない。0の場合は空いているポートを使い、
+        開いたアドレスはstart()のあとにtcp_address, udp_addressで参照できる。
+        """
+        self._analyzer = analyzer if analyzer is not None \
+            else StreamingAnalyzer(live=True)
+        self._host = host
+        self._tcp_port = tcp_port
+        self._udp_port = udp_port
+        self._server: Optional['asyncio.base_events.Server'] = None
+        self._transport: Optional['asyncio.DatagramTransport'] = None
+        self._subscribers: list['asyncio.Queue'] = []
+        self.tcp_address: Optional[tuple[str, int]] = None
+        self.udp_address: Optional[tuple[str, int]] = None
+
+    async def start(self) -> None:
+        """
+        ソケットを開いて、受け付けを開始する。
+        """
+        import asyncio
+        if self._tcp_port is not None:
+            self._server = await asyncio.start_server(
+                self._handle_connection, self._host, self._tcp_port)
+            self.tcp_address = self._server.sockets[0].getsockname()[:2]
+        if self._udp_port is not None:
+            self._transport, _ = \
+                await asyncio.get_running_loop().create_datagram_endpoint(
+                    lambda: _DatagramReceiver(self),
+                    local_addr=(self._host, self._udp_port))
+            self.udp_address = \
+                self._transport.get_extra_info('sockname')[:2]
+        logger.info("Started live ingestion: tcp={0:}, udp={1:}".format(
+            self.tcp_address, self.udp_address))
+
+    async def stop(self) -> list[dict[str, str]]:
+        """
+        ソケットを閉じ、並べなおし待ちのデータと継続中の期間を反映した期間を送って返却する。
+        最後に各キューにNoneを送る。
+        """
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        if self._transport is not None:
+            self._transport.close()
+            self._transport = None
+        events = self._analyzer.finish()
+        self._publish(events)
+        for queue in self._subscribers:
+            self._put(queue, None)
+        logger.info("Stopped live ingestion.")
+        return events
+
+    def subscribe(self, maxsize: Optional[int] = None) -> 'asyncio.Queue':
+        """
+        検出した期間(StreamingAnalyzerと同じ形式の辞書)を受け取るキューを登録して返却する。
+        """
+        import asyncio
+        queue = asyncio.Queue(
+            maxsize if maxsize is not None
+            else LiveIngestServer.SUBSCRIBER_QUEUE_SIZE)
+        self._subscribers.append(queue)
+        return queue
+
+    def unsubscribe(self, queue: 'asyncio.Queue') -> None:
+        """
+        subscribe()で登録したキューの登録を解除する。
+        """
+        self._subscribers.remove(queue)
+
+    async def _handle_connection(self, reader: 'asyncio.StreamReader',
+                                 writer: 'asyncio.StreamWriter') -> None:
+        """
+        TCPの1つの接続から、改行で終わった行を読み込んだ分ずつ検出に反映する。
+        改行を待つ行がMAX_LINE_SIZEを超えた場合は、次の改行までを捨てる。
+        """
+        remainder = b""
+        # 長すぎる行の残りを読み捨てている途中か
+        skipping = False
+        try:
+            while True:
+                block = await reader.read(LiveIngestServer.READ_BLOCK_SIZE)
+                if not block:
+                    break
+                if skipping:
+                    newline = block.find(b"\n")
+                    if newline < 0:
+                        continue
+                    block = block[newline + 1:]
+                    skipping = False
+                if remainder:
+                    block = remainder + block
+                end = block.rfind(b"\n") + 1
+                remainder = block[end:]
+                if end > 0:
+                    self._feed(block[:end])
+                if len(remainder) > LiveIngestServer.MAX_LINE_SIZE:
+                    logger.warning("Skipped too long line: {0:}".format(
+                        remainder[:80]))
+                    remainder = b""
+                    skipping = True
+            # 改行で終わっていない最後の行
+            if remainder:
+                self._feed(remainder)
+        finally:
+            writer.close()
+
+    def _feed(self, block: bytes) -> None:
+        """
+        受け取ったデータの行を検出に反映し、検出した期間を送る。
+        """
+        try:
+            lines, terminated = _split_lines(block)
+        except UnicodeDecodeError:
+            logger.warning("Skipped undecodable data: {0:}".format(
+                block[:80]))
+            return
+        self._publish(self._analyzer.feed(lines, terminated))
+
+    def _publish(self, events: list[dict[str, str]]) -> None:
+        for event in events:
+            for queue in self._subscribers:
+                self._put(queue, event)
+
+    @staticmethod
+    def _put(queue: 'asyncio.Queue', event: Optional[dict]) -> None:
+        import asyncio
+        try:
+            queue.put_nowait(event)
+        except asyncio.QueueFull:
+            logger.warning("Dropped event: {0:}".format(event))
+
+    async def __aenter__(self) -> 'LiveIngestServer':
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.stop()
@@ -0,0 +1,52 @@
+import pytest
+from response_times import ResponseTimes
+from generate_csv import generate, make_hosts
+from run_benchmarks import compare
+
+
+def test_generate(tmp_path, caplog):
+    """
+    generate()関数のテスト
+    """
+    path = str(tmp_path / "bench.csv")
+    assert generate(path, 2000, hosts=20, subnets=4, prefixlens=[16, 24],
+                    timeout_rate=0.01, spike_rate=0.01,
+                    subnet_failure_rate=0.01) == 2000
+    response_times = ResponseTimes(path)
+    # スキップする行はない
+    assert "Skipped" not in caplog.text
+    assert len(response_times._records) == 20
+    assert len(response_times._subnets) == 4
+    assert response_times.find_all_failure()
+    assert response_times.find_all_high_load(3, 100)
+    assert response_times.find_all_subnet_failure()
+
+    # 同じ引数からは同じファイルを生成する
+    other_path = str(tmp_path / "bench2.csv")
+    generate(other_path, 2000, hosts=20, subnets=4, prefixlens=[16, 24],
+             timeout_rate=0.01, spike_rate=0.01, subnet_failure_rate=0.01)
+    with open(path, 'rb') as fd, open(other_path, 'rb') as other_fd:
+        assert fd.read() == other_fd.read()
+
+    # サブネットは重ならないように、境界にそろえて並べる
+    assert [host.address for host in make_hosts(4, 2, [30, 24])] \
+        == ["10.0.0.1/30", "10.0.1.1/24", "10.0.0.2/30", "10.0.1.2/24"]
+    # サブネットに入りきらないプレフィックス長は指定できない
+    with pytest.raises(ValueError):
+        make_hosts(3, 1, [30])
+
+
+def test_compare():
+    """
+    compare()関数のテスト
+    """
+    baseline = {"results": {"1000": {"ingest": 1.0, "analyze": 0.001,
+                                     "peak_rss_mb": 10.0}}}
+    result = {"results": {"1000": {"ingest": 1.3, "analyze": 0.005,
+                                   "peak_rss_mb": 10.5},
+                          "10000": {"ingest": 5.0}}}
+    regressions = compare(result, baseline, 0.2, min_time=0.01)
+    assert len(regressions) == 1
+    assert "ingest" in regressions[0]
+    assert len(compare(result, baseline, 0.5)) == 1
+    assert len(compare(result, baseline, 0.01)) == 3
@@ -1,7 +1,12 @@
+import bz2
+import datetime
+import gzip
 import pytest
 import logging
 import os
-from response_times import ResponseTimes
+import subprocess
+import sys
+from response_times import ResponseTimes, StreamingAnalyzer
 
 
 @pytest.fixture
@@ -250,3 +255,1013 @@ def test_find_subnet_failure():
                "period": "2020-10-19 13:33:24 ~ 2020-10-19 13:33:26"}]
     actual = response_times.find_all_subnet_failure(1)
     assert expect == actual
+
+
+def test_columnar_records():
+    """
+    列指向で保持した応答時間データのテスト
+    """
+    from response_times import TIMEOUT, to_datetime
+    # 重複した確認日時は、あとに読み込んだほうのデータが残り、確認日時順に並ぶ
+    test_csv_path = os.path.join(
+        os.path.dirname(os.path.abspath(__file__)),
+        "test_duplication.csv")
+    response_times = ResponseTimes(test_csv_path)
+    assert len(response_times._records) == 1
+    series = next(iter(response_times._records.values()))
+    assert [str(to_datetime(t)) for t in series.times] == [
+        "2020-10-19 13:33:23", "2020-10-19 13:33:25",
+        "2020-10-19 13:33:26", "2020-10-19 13:33:27"]
+    assert list(series.responses) == [TIMEOUT, TIMEOUT, TIMEOUT, 3]
+    # 1件あたり確認日時8バイト + 応答時間4バイト
+    assert series.nbytes() == len(series) * 12
+
+
+def test_integer_addresses():
+    """
+    サーバアドレスを整数で保持し、サブネットを整数のマスクで求めるかのテスト
+    """
+    from response_times import is_address
+    response_times = ResponseTimes()
+    response_times.append([
+        "20201019133324,10.20.30.1/16,-",
+        "20201019133324,10.20.30.2/255.255.0.0,-",
+        "20201019133324,192.168.1.1,-",
+        "20201019133325,10.20.30.1/16,1",
+        "20201019133325,10.20.30.2/255.255.0.0,1",
+        "20201019133325,192.168.1.1,1",
+        "20201019133325,167772161,1",
+        "20201019133325,10.20.30.1/33,1",
+        "20201019133325,fe80::1/64,1",
+        "20201019133325,010.20.30.1/16,1"])
+    assert all(isinstance(address, int)
+               for address in response_times._records)
+    assert len(response_times._records) == 3
+    assert len(response_times._subnets) == 2
+    assert response_times.find_all_subnet_failure(1) == [
+        {"subnet": "10.20.0.0/16",
+         "period": "2020-10-19 13:33:24 ~ 2020-10-19 13:33:25"}]
+    assert list(response_times.stats()["addresses"]) == [
+        "10.20.30.1/16", "10.20.30.2/16", "192.168.1.1/32"]
+    # サーバアドレスの判定は変わらない
+    assert is_address("10.20.30.1/16")
+    assert not is_address("167772161")
+    assert not is_address("10.20.30.1/33")
+    assert not is_address("fe80::1/64")
+
+
+def test_import_csv_small_blocks(caplog, monkeypatch):
+    """
+    読み込みブロックが行の途中で区切られても同じ結果になるかのテスト
+    """
+    caplog.set_level(logging.INFO)
+    monkeypatch.setattr(ResponseTimes, "READ_BLOCK_SIZE", 7)
+    test_csv_path = os.path.join(
+        os.path.dirname(os.path.abspath(__file__)),
+        "test_includes_invalid_line.csv")
+    response_times = ResponseTimes(test_csv_path)
+    expected_log_warn_line3 = "Skipped line(3): 20201019133325,169090561,-\n"
+    assert ("response_times", logging.WARNING, expected_log_warn_line3) in caplog.record_tuples
+    assert len([record for record in caplog.record_tuples
+                if record[1] == logging.WARNING]) == 4
+
+    test_csv_path = os.path.join(
+        os.path.dirname(os.path.abspath(__file__)),
+        "test_1address_4fail.csv")
+    expect = [
+        {"address": "10.20.30.1/16", "period": "2020-10-19 13:33:24 ~ 2020-10-19 13:33:25"},
+        {"address": "10.20.30.1/16", "period": "2020-10-19 13:33:26 ~ 2020-10-19 13:33:28"},
+        {"address": "10.20.30.1/16", "period": "2020-10-19 13:33:29 ~ 2020-10-19 13:33:32"},
+        {"address": "10.20.30.1/16", "period": "2020-10-19 13:33:33 ~ 2020-10-19 13:33:37"}
+        ]
+    assert ResponseTimes(test_csv_path).find_all_failure() == expect
+
+
+def test_refresh(tmp_path):
+    """
+    refresh()メソッドのテスト
+    """
+    test_csv_path = os.path.join(
+        os.path.dirname(os.path.abspath(__file__)),
+        "test_1address_4fail.csv")
+    with open(test_csv_path, "r", encoding="utf-8") as fd:
+        lines = fd.readlines()
+    live_csv_path = tmp_path / "live.csv"
+    live_csv_path.write_text("".join(lines[:3]), encoding="utf-8")
+    response_times = ResponseTimes(str(live_csv_path))
+    # 復帰していない故障は最後の無応答時刻までを故障期間とする
+    assert response_times.find_all_failure() == [
+        {"address": "10.20.30.1/16", "period": "2020-10-19 13:33:24 ~ 2020-10-19 13:33:25"}]
+
+    # 書き込み途中の行は次回に持ち越す
+    with open(live_csv_path, "a", encoding="utf-8") as fd:
+        fd.write("".join(lines[3:]) + "20201019133340,10.20.")
+    assert response_times.refresh() == len(lines) - 3
+    with open(live_csv_path, "a", encoding="utf-8") as fd:
+        fd.write("30.1/16,-\n")
+    assert response_times.refresh() == 1
+    expect = [
+        {"address": "10.20.30.1/16", "period": "2020-10-19 13:33:24 ~ 2020-10-19 13:33:25"},
+        {"address": "10.20.30.1/16", "period": "2020-10-19 13:33:26 ~ 2020-10-19 13:33:28"},
+        {"address": "10.20.30.1/16", "period": "2020-10-19 13:33:29 ~ 2020-10-19 13:33:32"},
+        {"address": "10.20.30.1/16", "period": "2020-10-19 13:33:33 ~ 2020-10-19 13:33:37"},
+        {"address": "10.20.30.1/16", "period": "2020-10-19 13:33:40 ~ 2020-10-19 13:33:40"}
+        ]
+    assert response_times.find_all_failure() == expect
+    # 追記がなければ何も取り込まない
+    assert response_times.refresh() == 0
+
+    # 読み込んだ時点で書き込み途中だった最後の行は、書き終えてから1度だけ取り込む
+    live_csv_path.write_text(
+        "".join(lines[:3]) + "20201019133340,10.20.30.1/16,1",
+        encoding="utf-8")
+    response_times = ResponseTimes(str(live_csv_path))
+    assert response_times.stats()["addresses"] == {"10.20.30.1/16": 3}
+    with open(live_csv_path, "a", encoding="utf-8") as fd:
+        fd.write("5\n")
+    assert response_times.refresh() == 1
+    assert response_times.stats()["addresses"] == {"10.20.30.1/16": 4}
+    assert response_times.latency_percentiles("10.20.30.1/16", [1]) \
+        == {1: 15}
+
+
+def test_append():
+    """
+    append()メソッドのテスト
+    """
+    test_csv_path = os.path.join(
+        os.path.dirname(os.path.abspath(__file__)),
+        "test_1subnet_2address_eachfail.csv")
+    with open(test_csv_path, "r", encoding="utf-8") as fd:
+        lines = fd.readlines()
+    response_times = ResponseTimes()
+    assert response_times.find_all_subnet_failure() == []
+    for line in lines:
+        response_times.append([line])
+    expect = [{"subnet": "10.20.0.0/16",
+               "period": "2020-10-19 13:33:24 ~ 2020-10-19 13:33:26"}]
+    assert response_times.find_all_subnet_failure(1) == expect
+
+
+def test_find_all_high_load_window():
+    """
+    find_high_loadメソッドの直近threshold_count回の平均の計算のテスト
+    """
+    # タイムアウトは平均の計算から除く
+    response_times = ResponseTimes()
+    response_times.append([
+        "20201019133323,10.20.30.1/16,4",
+        "20201019133324,10.20.30.1/16,-",
+        "20201019133325,10.20.30.1/16,2",
+        "20201019133326,10.20.30.1/16,-",
+        "20201019133327,10.20.30.1/16,-",
+        "20201019133328,10.20.30.1/16,-",
+        "20201019133329,10.20.30.1/16,6",
+        "20201019133330,10.20.30.1/16,1",
+        ])
+    expect = [
+        {"address": "10.20.30.1/16", "period": "2020-10-19 13:33:25 ~ 2020-10-19 13:33:27"},
+        {"address": "10.20.30.1/16", "period": "2020-10-19 13:33:29 ~ 2020-10-19 13:33:30"},
+        ]
+    assert response_times.find_all_high_load(2, 2) == expect
+    # タイムアウトしか含まない期間は過負荷としない
+    assert response_times.find_all_high_load(1, 2) == [
+        {"address": "10.20.30.1/16", "period": "2020-10-19 13:33:25 ~ 2020-10-19 13:33:26"},
+        {"address": "10.20.30.1/16", "period": "2020-10-19 13:33:29 ~ 2020-10-19 13:33:30"},
+        ]
+    # データ件数以上のthreshold_countでは判定しない
+    assert response_times.find_all_high_load(8, 0) == []
+    assert response_times.find_all_high_load(7, 0) == [
+        {"address": "10.20.30.1/16", "period": "2020-10-19 13:33:30 ~ 2020-10-19 13:33:30"}]
+
+
+def test_find_subnet_failure_many_hosts():
+    """
+    3つ以上のホストがあるサブネットの故障期間のテスト
+    """
+    lines = []
+    # 3ホストとも13:33:24~13:33:26に故障、ホスト3だけ13:33:40~13:33:42は応答している
+    for host, offsets in ((1, (24, 25, 40, 41)),
+                          (2, (23, 24, 25, 40, 41)),
+                          (3, (24, 25, 26))):
+        for second in range(20, 45):
+            response = "-" if second in offsets else "1"
+            lines.append("202010191333{0:02},10.20.30.{1:}/16,{2:}".format(
+                second, host, response))
+    response_times = ResponseTimes()
+    response_times.append(lines)
+    expect = [{"subnet": "10.20.0.0/16",
+               "period": "2020-10-19 13:33:24 ~ 2020-10-19 13:33:26"}]
+    assert response_times.find_all_subnet_failure(1) == expect
+    # 故障期間の長さがthreshold_countに満たないホストがあれば、サブネットの故障としない
+    assert response_times.find_all_subnet_failure(3) == []
+
+
+def test_find_subnet_failure_prefixlen():
+    """
+    プレフィックス長を指定したサブネットの故障期間のテスト
+    """
+    lines = []
+    # 10.20.30.0/24の2ホストは13:33:24~13:33:26と13:33:40~13:33:41に故障、
+    # 10.20.31.1は13:33:40~13:33:41だけ故障
+    for address, offsets in (("10.20.30.1/16", (24, 25, 40)),
+                             ("10.20.30.2/16", (24, 25, 40)),
+                             ("10.20.31.1/24", (40,))):
+        for second in range(20, 45):
+            response = "-" if second in offsets else "1"
+            lines.append("202010191333{0:02},{1:},{2:}".format(
+                second, address, response))
+    response_times = ResponseTimes()
+    response_times.append(lines)
+    assert response_times.find_all_subnet_failure(1, prefixlen=24) == [
+        {"subnet": "10.20.30.0/24",
+         "period": "2020-10-19 13:33:24 ~ 2020-10-19 13:33:26"},
+        {"subnet": "10.20.30.0/24",
+         "period": "2020-10-19 13:33:40 ~ 2020-10-19 13:33:41"}]
+    # 上位のネットワークでは、すべてのホストが故障していた期間だけ
+    expect = [{"subnet": "10.20.0.0/16",
+               "period": "2020-10-19 13:33:40 ~ 2020-10-19 13:33:41"}]
+    assert response_times.find_all_subnet_failure(1, prefixlen=16) == expect
+    assert response_times.find_all_subnet_failure(1, prefixlen=8) == [
+        {"subnet": "10.0.0.0/8",
+         "period": "2020-10-19 13:33:40 ~ 2020-10-19 13:33:41"}]
+    # 指定しない場合は、各サーバアドレスのプレフィックス長のサブネット
+    assert response_times.find_all_subnet_failure(1) == [
+        {"subnet": "10.20.0.0/16",
+         "period": "2020-10-19 13:33:24 ~ 2020-10-19 13:33:26"},
+        {"subnet": "10.20.0.0/16",
+         "period": "2020-10-19 13:33:40 ~ 2020-10-19 13:33:41"}]
+    # 1ホストだけのネットワークは、サブネットの故障としない
+    assert response_times.find_all_subnet_failure(1, prefixlen=32) == []
+    with pytest.raises(ValueError):
+        response_times.find_all_subnet_failure(1, prefixlen=33)
+    # データを追加したら作りなおす
+    response_times.append(
+        ["20201019133345,{0:},-".format(address) for address in (
+            "10.20.30.1/16", "10.20.30.2/16", "10.20.31.1/24")]
+        + ["20201019133346,{0:},1".format(address) for address in (
+            "10.20.30.1/16", "10.20.30.2/16", "10.20.31.1/24")])
+    assert response_times.find_all_subnet_failure(1, prefixlen=16) == \
+        expect + [{"subnet": "10.20.0.0/16",
+                   "period": "2020-10-19 13:33:45 ~ 2020-10-19 13:33:46"}]
+
+
+def test_cache_info():
+    """
+    検出結果のキャッシュのテスト
+    """
+    test_csv_path = os.path.join(
+        os.path.dirname(os.path.abspath(__file__)),
+        "test_1subnet_2address_eachfail.csv")
+    response_times = ResponseTimes(test_csv_path)
+    response_times.find_all_failure()
+    assert response_times.cache_info()["failure"] == (0, 2, 2)
+    # データが変わらなければ走査しなおさない
+    response_times.find_all_failure(2)
+    response_times.find_all_subnet_failure()
+    assert response_times.cache_info()["failure"] == (4, 2, 2)
+    # データが追加されたサーバアドレスだけ走査しなおす
+    response_times.append(["20201019133330,10.20.30.1/16,-"])
+    response_times.find_all_failure()
+    assert response_times.cache_info()["failure"] == (5, 3, 2)
+
+    response_times.find_all_high_load(2, 2)
+    response_times.find_all_high_load(2, 2)
+    response_times.find_all_high_load(2, 3)
+    assert response_times.cache_info()["high_load"] == (2, 4, 4)
+
+    response_times.cache_clear()
+    assert response_times.cache_info()["failure"] == (0, 0, 0)
+
+
+def test_iter_periods():
+    """
+    iter_failures, iter_high_loads, iter_subnet_failuresメソッドのテスト
+    """
+    from response_times import Period, to_datetime
+    test_csv_path = os.path.join(
+        os.path.dirname(os.path.abspath(__file__)),
+        "test_1subnet_2address_eachfail.csv")
+    response_times = ResponseTimes(test_csv_path)
+    failures = response_times.iter_failures()
+    first = next(failures)
+    # 取り出したサーバアドレスの分だけ検出する
+    assert response_times.cache_info()["failure"].misses == 1
+    assert isinstance(first, Period)
+    assert first.kind == "failure"
+    assert first.address == "10.20.30.1/16"
+    assert first.subnet is None
+    assert first.start == to_datetime(first.start_time) \
+        == datetime.datetime(2020, 10, 19, 13, 33, 24)
+    assert first.return_time == first.end_time
+    assert [first.to_dict()] + [period.to_dict() for period in failures] \
+        == response_times.find_all_failure()
+    assert [period.to_dict() for period in response_times.iter_high_loads(
+        2, 2)] == response_times.find_all_high_load(2, 2)
+    subnet_failures = list(response_times.iter_subnet_failures())
+    assert [period.to_dict() for period in subnet_failures] \
+        == response_times.find_all_subnet_failure()
+    assert subnet_failures[0].subnet == "10.20.0.0/16"
+    assert subnet_failures[0].address is None
+
+
+def test_retention(tmp_path):
+    """
+    max_age, max_samplesを指定したときのテスト
+    """
+    def lines(start, responses):
+        return ["202010191300{0:02d},10.20.30.1/16,{1:}".format(
+            start + index, response) for index, response in enumerate(
+                responses)]
+
+    response_times = ResponseTimes(max_age=10)
+    expected = ResponseTimes()
+    for block in (lines(0, [1, 1, "-", "-", "-", 50, 50]),
+                  lines(7, [50, 1, 1, 1, 1]),
+                  lines(12, ["-", "-", 1, 1, 1, 1, 1, 1, 1, 1])):
+        response_times.append(block)
+        expected.append(block)
+        response_times.find_all_failure(2)
+        response_times.find_all_high_load(2, 40)
+    # 保持期間(最も新しい確認日時から10秒)を過ぎたデータは削除する
+    assert response_times.stats()["addresses"] == {"10.20.30.1/16": 11}
+    assert response_times.stats()["lines"]["evicted"] == 11
+    assert response_times.find_all_failure(2) \
+        == expected.find_all_failure(2)[1:]
+    # 削除したデータをまたぐ区間は、元の開始時刻で返却する
+    response_times.append(lines(22, ["-"] * 8))
+    expected.append(lines(22, ["-"] * 8))
+    assert response_times.find_all_failure(2)[-1] \
+        == expected.find_all_failure(2)[-1] \
+        == {"address": "10.20.30.1/16",
+            "period": "2020-10-19 13:00:22 ~ 2020-10-19 13:00:29"}
+    response_times.append(lines(30, ["-", 1]))
+    expected.append(lines(30, ["-", 1]))
+    assert response_times.find_all_failure(2) \
+        == expected.find_all_failure(2)[-1:]
+
+    # サーバアドレスごとに最大件数を超えた古いデータを削除する
+    response_times = ResponseTimes(max_samples=4)
+    response_times.append(lines(0, [1, 1, 1, 1]))
+    response_times.find_all_high_load(2, 40)
+    response_times.append(lines(4, [50] * 5 + [1]))
+    assert response_times.stats()["addresses"] == {"10.20.30.1/16": 4}
+    expect = [
+        {"address": "10.20.30.1/16",
+         "period": "2020-10-19 13:00:05 ~ 2020-10-19 13:00:09"}]
+    assert response_times.find_all_high_load(2, 40) == expect
+    # 期間を指定した検出、analyze、閾値を変えながらの検出でも同じ開始時刻で返却する
+    start = datetime.datetime(2020, 10, 19, 13, 0, 7)
+    assert response_times.find_all_high_load(2, 40, start=start) == expect
+    assert response_times.analyze(
+        high_load=(2, 40), start=start)["high_load"] == expect
+    assert response_times.high_load_sweep([2], [40, 60], start=start) \
+        == {(2, 40): expect, (2, 60): []}
+    # 削除したデータから引き継いだ状態は、キャッシュを捨てても、
+    # スナップショットやほかのプロセスに渡しても使う
+    response_times.cache_clear()
+    assert response_times.find_all_high_load(2, 40) == expect
+    snapshot_path = str(tmp_path / "retention.snapshot")
+    response_times.save_snapshot(snapshot_path)
+    snapshot = ResponseTimes.open_snapshot(snapshot_path)
+    assert snapshot.find_all_high_load(2, 40) == expect
+    assert snapshot.stats()["lines"]["evicted"] == 6
+    assert ResponseTimes._from_dataset(
+        response_times._dataset()).find_all_high_load(2, 40) == expect
+
+
+def test_latency_percentiles():
+    """
+    latency_percentilesメソッドのテスト
+    """
+    response_times = ResponseTimes()
+    response_times.append(
+        ["20201019{0:06d},10.20.30.1/16,{1:}".format(
+            130000 + index // 60 * 100 + index % 60, index + 1)
+         for index in range(200)]
+        + ["20201019130000,10.20.30.2/16,1000",
+           "20201019130001,10.20.30.2/16,-"])
+    assert response_times.latency_percentiles("10.20.30.1/16") \
+        == {0.5: 100, 0.95: 190.5, 0.99: 198.5}
+    # 誤差は2 ** -LATENCY_SKETCH_BITS以内
+    percentiles = response_times.latency_percentiles(
+        "10.20.30.1/16", [0, 0.9, 1])
+    assert percentiles[0] == 1
+    assert abs(percentiles[0.9] - 180) <= 180 / 128
+    assert abs(percentiles[1] - 200) <= 200 / 128
+    # 期間を指定した場合は、その範囲のデータだけを使う
+    assert response_times.latency_percentiles(
+        "10.20.30.1/16", [0, 1], datetime.datetime(2020, 10, 19, 13, 0, 30),
+        datetime.datetime(2020, 10, 19, 13, 1, 29)) == {0: 31, 1: 90}
+    # サブネットは属するサーバアドレスのデータをまとめる
+    assert response_times.latency_percentiles(
+        "10.20.0.0/16", [1])[1] == pytest.approx(1000, rel=1 / 128)
+    assert response_times.latency_percentiles(
+        "10.20.30.2/16", [0.5], datetime.datetime(2020, 10, 19, 13, 0, 1)) \
+        == {0.5: None}
+    with pytest.raises(ValueError):
+        response_times.latency_percentiles("10.20.30.3/16")
+    with pytest.raises(ValueError):
+        response_times.latency_percentiles("10.20.30.1/16", [1.5])
+
+
+def test_rollups():
+    """
+    iter_rollups, find_all_failure_rollup, find_all_high_load_rollupメソッドのテスト
+    """
+    from response_times import Rollup, to_seconds
+    lines = []
+    for minute, responses in enumerate(
+            [[10, 20], [200, 300], ["-", "-"], [10, "-"], [10, 10]]):
+        for second, response in zip((0, 30), responses):
+            lines.append("2020101913{0:02d}{1:02d},10.20.30.1/16,{2:}".format(
+                minute, second, response))
+    lines.append("20201019130000,10.20.30.2/16,40")
+    response_times = ResponseTimes()
+    response_times.append(lines)
+    rollups = list(response_times.iter_rollups("10.20.30.1/16"))
+    minute = to_seconds(datetime.datetime(2020, 10, 19, 13, 0, 0))
+    assert rollups[0] == Rollup(minute, minute, minute + 30, 2, 0, 30, 10, 20)
+    assert rollups[2] == Rollup(minute + 120, minute + 120, minute + 150,
+                                0, 2, 0, None, None)
+    assert len(rollups) == 5
+    # サブネットは属するサーバアドレスの集計を足し合わせる
+    assert list(response_times.iter_rollups(
+        "10.20.0.0/16", 3600, end=datetime.datetime(2020, 10, 19, 13, 59, 59))
+        ) == [Rollup(minute, minute, minute + 270, 8, 3, 600, 10, 300)]
+    # 期間の範囲に収まらない期間は返却しない
+    assert list(response_times.iter_rollups(
+        "10.20.30.1/16", 3600, end=datetime.datetime(2020, 10, 19, 13, 59, 58))
+        ) == []
+    # 期間の境界で故障・過負荷が起きている場合は、元のデータでの検出と同じ結果になる
+    assert response_times.find_all_failure_rollup(2) \
+        == response_times.find_all_failure(2) \
+        == [{"address": "10.20.30.1/16",
+             "period": "2020-10-19 13:02:00 ~ 2020-10-19 13:03:00"}]
+    assert response_times.find_all_high_load_rollup(100) \
+        == response_times.find_all_high_load(1, 100) \
+        == [{"address": "10.20.30.1/16",
+             "period": "2020-10-19 13:01:00 ~ 2020-10-19 13:02:00"}]
+    # 元のデータでの検出はサーバアドレスごとの最初のデータを判定しないが、
+    # 集計での検出は最初の期間も判定する
+    assert response_times.find_all_high_load(1, 15) \
+        == [{"address": "10.20.30.1/16",
+             "period": "2020-10-19 13:00:30 ~ 2020-10-19 13:02:00"}]
+    assert response_times.find_all_high_load_rollup(15) \
+        == [{"address": "10.20.30.1/16",
+             "period": "2020-10-19 13:00:00 ~ 2020-10-19 13:02:00"},
+            {"address": "10.20.30.2/16",
+             "period": "2020-10-19 13:00:00 ~ 2020-10-19 13:00:00"}]
+    assert response_times.find_all_failure_rollup(
+        1, end=datetime.datetime(2020, 10, 19, 13, 2, 59)) \
+        == [{"address": "10.20.30.1/16",
+             "period": "2020-10-19 13:02:00 ~ 2020-10-19 13:02:30"}]
+    with pytest.raises(ValueError):
+        response_times.find_all_failure_rollup(resolution=10)
+
+
+def test_parallel_workers():
+    """
+    複数プロセスで検出処理を行ったときのテスト
+    """
+    test_csv_path = os.path.join(
+        os.path.dirname(os.path.abspath(__file__)),
+        "test_2subnet_eachfail.csv")
+    serial = ResponseTimes(test_csv_path)
+    with ResponseTimes(test_csv_path, workers=2) as parallel:
+        assert parallel.find_all_failure() == serial.find_all_failure()
+        assert parallel.find_all_high_load(1, 2) \
+            == serial.find_all_high_load(1, 2)
+        assert parallel.find_all_subnet_failure() \
+            == serial.find_all_subnet_failure()
+        # データを追加したら、追加後のデータで検出する
+        lines = ["20201019133340,10.21.30.1/16,-",
+                 "20201019133340,10.21.30.2/16,-"]
+        parallel.append(lines)
+        serial.append(lines)
+        assert parallel.find_all_subnet_failure() \
+            == serial.find_all_subnet_failure()
+
+
+def test_snapshot(tmp_path):
+    """
+    save_snapshot(), open_snapshot()メソッドのテスト
+    """
+    test_csv_path = os.path.join(
+        os.path.dirname(os.path.abspath(__file__)),
+        "test_2subnet_eachfail.csv")
+    response_times = ResponseTimes(test_csv_path)
+    snapshot_path = str(tmp_path / "test.snapshot")
+    response_times.save_snapshot(snapshot_path)
+    snapshot = ResponseTimes.open_snapshot(snapshot_path)
+    assert snapshot.find_all_failure() == response_times.find_all_failure()
+    assert snapshot.find_all_high_load(1, 2) \
+        == response_times.find_all_high_load(1, 2)
+    assert snapshot.find_all_subnet_failure() \
+        == response_times.find_all_subnet_failure()
+
+    # スナップショットから開いたデータにも追加できる
+    lines = ["20201019133340,10.21.30.1/16,-",
+             "20201019133340,10.21.30.2/16,-"]
+    snapshot.append(lines)
+    response_times.append(lines)
+    assert snapshot.find_all_subnet_failure() \
+        == response_times.find_all_subnet_failure()
+
+    # スナップショットではないファイルは開けない
+    with pytest.raises(ValueError):
+        ResponseTimes.open_snapshot(test_csv_path)
+
+
+def test_shared_memory():
+    """
+    publish_shared(), attach_shared()メソッドのテスト
+    """
+    test_csv_path = os.path.join(
+        os.path.dirname(os.path.abspath(__file__)),
+        "test_2subnet_eachfail.csv")
+    with ResponseTimes(test_csv_path) as response_times:
+        name = response_times.publish_shared()
+        # 別のプロセスから参照して検出する
+        script = """
+import sys
+from response_times import ResponseTimes
+with ResponseTimes.attach_shared(sys.argv[1], workers=2) as shared:
+    print(repr((shared.find_all_failure(), shared.find_all_high_load(1, 2),
+                shared.find_all_subnet_failure())))
+    records = shared._records
+# with文の終わりで共有メモリを閉じ、閉じたあとはデータを持たない
+assert shared._snapshot is None and not records
+"""
+        src_path = os.path.join(
+            os.path.dirname(os.path.abspath(__file__)), "..", "src")
+        result = subprocess.run([sys.executable, "-c", script, name],
+                                cwd=src_path, stdout=subprocess.PIPE,
+                                stderr=subprocess.PIPE, text=True)
+        assert result.returncode == 0, result.stderr
+        # 共有メモリを閉じるときに、参照しているデータが残っていてエラーになることはない
+        assert result.stderr == ""
+        assert result.stdout.strip() == repr((
+            response_times.find_all_failure(),
+            response_times.find_all_high_load(1, 2),
+            response_times.find_all_subnet_failure()))
+
+        # 参照したデータにも追加できる(共有メモリは変更しない)
+        shared = ResponseTimes.attach_shared(name)
+        lines = ["20201019133340,10.21.30.1/16,-",
+                 "20201019133340,10.21.30.2/16,-"]
+        shared.append(lines)
+        assert shared.find_all_subnet_failure() \
+            != response_times.find_all_subnet_failure()
+        with ResponseTimes.attach_shared(name) as attached:
+            assert attached.find_all_subnet_failure() \
+                == response_times.find_all_subnet_failure()
+        shared.close()
+    # close()で共有メモリは削除される
+    with pytest.raises(FileNotFoundError):
+        ResponseTimes.attach_shared(name)
+
+
+def test_from_files(tmp_path):
+    """
+    from_files()メソッドのテスト
+    """
+    test_csv_path = os.path.join(
+        os.path.dirname(os.path.abspath(__file__)),
+        "test_2subnet_eachfail.csv")
+    with open(test_csv_path, 'r', encoding='utf-8') as fd:
+        lines = fd.readlines()
+    # 通常のファイルと圧縮したファイルに分けて、マージしながら読み込む
+    with open(str(tmp_path / "test_1.csv"), 'w', encoding='utf-8') as fd:
+        fd.writelines(line for line in lines if "10.20." in line)
+    with gzip.open(str(tmp_path / "test_2.csv.gz"), 'wt',
+                   encoding='utf-8') as fd:
+        fd.writelines(line for line in lines if "10.21." in line)
+    # ファイルを指定順につなげて確認日時順に並べたものと同じになる
+    response_times = ResponseTimes()
+    response_times.append(sorted(
+        [line for line in lines if "10.20." in line]
+        + [line for line in lines if "10.21." in line],
+        key=lambda line: line[:14]))
+    merged = ResponseTimes.from_files(str(tmp_path / "test_*"))
+    assert merged.find_all_failure() == response_times.find_all_failure()
+    assert merged.find_all_subnet_failure() \
+        == response_times.find_all_subnet_failure()
+
+    # 同じ確認日時のデータは、あとに指定したファイルのものを使う
+    with open(str(tmp_path / "dup_1.csv"), 'w', encoding='utf-8') as fd:
+        fd.write("20201019133323,10.20.30.1/16,-\n"
+                 "20201019133324,10.20.30.1/16,1\n")
+    with bz2.open(str(tmp_path / "dup_2.csv.bz2"), 'wt',
+                  encoding='utf-8') as fd:
+        fd.write("20201019133323,10.20.30.1/16,1\n")
+    merged = ResponseTimes.from_files(
+        [str(tmp_path / "dup_2.csv.bz2"), str(tmp_path / "dup_1.csv")])
+    expect = [
+        {"address": "10.20.30.1/16", "period": "2020-10-19 13:33:23 ~ 2020-10-19 13:33:24"},
+        ]
+    assert merged.find_all_failure() == expect
+    merged = ResponseTimes.from_files(
+        [str(tmp_path / "dup_1.csv"), str(tmp_path / "dup_2.csv.bz2")])
+    assert merged.find_all_failure() == []
+
+    # サブネットの故障期間は、ファイルの指定順によらず、1つのファイルにまとめて
+    # 確認日時順に並べた場合と同じになる(サブネット内で最初に現れたホストの期間を使う)
+    host_1 = ["20201019133320,10.20.30.1/16,1",
+              "20201019133321,10.20.30.1/16,-",
+              "20201019133322,10.20.30.1/16,-",
+              "20201019133323,10.20.30.1/16,-",
+              "20201019133326,10.20.30.1/16,1"]
+    host_2 = ["20201019133321,10.20.30.2/16,1",
+              "20201019133322,10.20.30.2/16,-",
+              "20201019133323,10.20.30.2/16,-",
+              "20201019133324,10.20.30.2/16,-",
+              "20201019133327,10.20.30.2/16,1"]
+    with open(str(tmp_path / "host_1.csv"), 'w', encoding='utf-8') as fd:
+        fd.write("\n".join(host_1) + "\n")
+    with open(str(tmp_path / "host_2.csv"), 'w', encoding='utf-8') as fd:
+        fd.write("\n".join(host_2) + "\n")
+    with open(str(tmp_path / "hosts.csv"), 'w', encoding='utf-8') as fd:
+        fd.write("\n".join(sorted(host_2 + host_1,
+                                  key=lambda line: line[:14])) + "\n")
+    merged = ResponseTimes.from_files(
+        [str(tmp_path / "host_2.csv"), str(tmp_path / "host_1.csv")])
+    response_times = ResponseTimes(str(tmp_path / "hosts.csv"))
+    expect = [
+        {"subnet": "10.20.0.0/16", "period": "2020-10-19 13:33:21 ~ 2020-10-19 13:33:26"},
+        ]
+    assert response_times.find_all_subnet_failure() == expect
+    assert merged.find_all_subnet_failure() == expect
+    assert merged.find_all_failure() == response_times.find_all_failure()
+
+
+def test_streaming_analyzer():
+    """
+    StreamingAnalyzerクラスのテスト
+    """
+    test_csv_path = os.path.join(
+        os.path.dirname(os.path.abspath(__file__)),
+        "test_2subnet_eachfail.csv")
+    response_times = ResponseTimes(test_csv_path)
+    analyzer = StreamingAnalyzer(threshold_count=1, threshold_average=2,
+                                 reorder_window=10)
+    events = list(analyzer.run(test_csv_path))
+    # 検出した順に返却するので、種類ごとに並べなおして比べる
+    def select(kind):
+        return sorted(
+            (event.get("address", event.get("subnet")), event["period"])
+            for event in events if event["type"] == kind)
+    assert select("failure") == sorted(
+        (failure["address"], failure["period"])
+        for failure in response_times.find_all_failure())
+    assert select("high_load") == sorted(
+        (high_load["address"], high_load["period"])
+        for high_load in response_times.find_all_high_load(1, 2))
+    assert select("subnet_failure") == sorted(
+        (failure["subnet"], failure["period"])
+        for failure in response_times.find_all_subnet_failure())
+
+    # reorder_windowを超えて遅れたデータはスキップする
+    analyzer = StreamingAnalyzer()
+    assert analyzer.feed(["20201019133324,10.20.30.1/16,-",
+                          "20201019133326,10.20.30.1/16,1"]) == []
+    expect = [
+        {"type": "failure", "address": "10.20.30.1/16", "period": "2020-10-19 13:33:24 ~ 2020-10-19 13:33:26"},
+        ]
+    assert analyzer.feed(["20201019133323,10.20.30.1/16,1",
+                          "20201019133327,10.20.30.1/16,1"]) == expect
+    assert analyzer.finish() == []
+
+
+def test_streaming_live_subnet_failure():
+    """
+    StreamingAnalyzerクラスのliveでのサブネットの故障期間のテスト
+    """
+    lines = []
+    for second, response in ((23, "1"), (24, "-"), (25, "-"), (26, "1")):
+        for host in (1, 2):
+            lines.append("202010191333{0:02},10.20.30.{1:}/16,{2:}".format(
+                second, host, response))
+    analyzer = StreamingAnalyzer(live=True)
+    period = "2020-10-19 13:33:24 ~ 2020-10-19 13:33:26"
+    events = analyzer.feed(lines + ["20201019133327,10.20.30.1/16,1"])
+    assert {"type": "subnet_failure", "subnet": "10.20.0.0/16",
+            "period": period} in events
+    # 返却したあとに加わったホストが故障していなくても、返却済みの期間は取り消さない
+    late_line = "20201019133328,10.20.30.3/16,1"
+    analyzer.feed([late_line])
+    assert analyzer.finish() == []
+    response_times = ResponseTimes()
+    response_times.append(lines + ["20201019133327,10.20.30.1/16,1",
+                                   late_line])
+    assert response_times.find_all_subnet_failure() == []
+
+    # 長時間動かし続けても、突き合わせに使わない古い故障期間は保持しない
+    analyzer = StreamingAnalyzer(live=True)
+    events = []
+    for minute in range(120):
+        for second, response in ((0, "-"), (1, "1")):
+            log_time = datetime.datetime(2020, 10, 19, 13, 0, second) \
+                + datetime.timedelta(minutes=minute)
+            events.extend(analyzer.feed([
+                "{0:%Y%m%d%H%M%S},10.20.30.{1:}/16,{2:}".format(
+                    log_time, host, response) for host in (1, 2)]))
+    assert all(len(state.failures) <= 2
+               for state in analyzer._states.values())
+    assert len(analyzer._reported) <= 2
+    # 最後の確認日時のデータはfinish()で反映する
+    events.extend(analyzer.finish())
+    assert sum(event["type"] == "subnet_failure" for event in events) == 120
+
+
+def test_streaming_checkpoint(tmp_path):
+    """
+    StreamingAnalyzerクラスのsave_checkpoint(), load_checkpoint()メソッドのテスト
+    """
+    test_csv_path = os.path.join(
+        os.path.dirname(os.path.abspath(__file__)),
+        "test_2subnet_eachfail.csv")
+    expect = list(StreamingAnalyzer(2, 1, 2, reorder_window=10).run(
+        test_csv_path))
+    with open(test_csv_path, 'rb') as fd:
+        data = fd.read()
+    # ファイルに追記しながら、前回の続きから検出する(最後の行は書き込み途中)
+    csv_path = str(tmp_path / "test.csv")
+    checkpoint_path = str(tmp_path / "test.checkpoint")
+    events = []
+    analyzer = StreamingAnalyzer(2, 1, 2, reorder_window=10)
+    for size in (len(data) // 3, len(data) * 2 // 3):
+        with open(csv_path, 'wb') as fd:
+            fd.write(data[:size])
+        events.extend(analyzer.run(csv_path, finish=False))
+        analyzer.save_checkpoint(checkpoint_path)
+        analyzer = StreamingAnalyzer.load_checkpoint(checkpoint_path)
+    with open(csv_path, 'wb') as fd:
+        fd.write(data)
+    events.extend(analyzer.run(csv_path))
+    assert events == expect
+
+    # liveの場合は、古い故障期間を削除する間隔も引き継ぎ、中断しなかった場合と同じになる
+    with open(csv_path, 'wb') as fd:
+        fd.write(data[:len(data) // 2])
+    analyzer = StreamingAnalyzer(2, live=True)
+    list(analyzer.run(csv_path, finish=False))
+    analyzer.save_checkpoint(checkpoint_path)
+    restored = StreamingAnalyzer.load_checkpoint(checkpoint_path)
+    assert restored._pruned_time == analyzer._pruned_time is not None
+    with open(csv_path, 'wb') as fd:
+        fd.write(data)
+    assert list(restored.run(csv_path)) == list(analyzer.run(csv_path))
+
+    # チェックポイントではないファイルは読み込めない
+    with pytest.raises(ValueError):
+        StreamingAnalyzer.load_checkpoint(test_csv_path)
+
+
+def test_live_ingest_server(caplog):
+    """
+    LiveIngestServerクラスのテスト(ローカルのTCP/UDPで行を送る)
+    """
+    import asyncio
+    import socket
+    from response_times import LiveIngestServer
+
+    async def receive(queue, count):
+        return [await asyncio.wait_for(queue.get(), 5) for _ in range(count)]
+
+    async def scenario():
+        server = LiveIngestServer(
+            StreamingAnalyzer(threshold=2, live=True), udp_port=0)
+        queue = server.subscribe()
+        async with server:
+            # TCPでは、行の途中で区切って送ってもよい
+            reader, writer = await asyncio.open_connection(
+                *server.tcp_address)
+            # 改行のないまま長すぎる行は、次の改行まで捨てる
+            writer.write(b"9" * (LiveIngestServer.MAX_LINE_SIZE * 2))
+            await writer.drain()
+            for _ in range(500):
+                if any(message.startswith("Skipped too long line")
+                       for message in caplog.messages):
+                    break
+                await asyncio.sleep(0.01)
+            writer.write(b"999\n")
+            for second, address, response in (
+                    (23, 1, "1"), (23, 2, "1"), (24, 1, "-"), (24, 2, "-"),
+                    (25, 1, "-"), (25, 2, "-")):
+                line = "202010191333{0:02},10.20.30.{1:}/16,{2:}\n".format(
+                    second, address, response).encode()
+                writer.write(line[:10])
+                await writer.drain()
+                writer.write(line[10:])
+                await writer.drain()
+            # 送信を終えて、サーバが読み込みを終えて接続を閉じるのを待つ
+            writer.write_eof()
+            assert await reader.read() == b""
+            writer.close()
+            # UDPでは、1つのデータグラムに複数行を入れられる
+            sender = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            sender.sendto(b"20201019133326,10.20.30.1/16,1\n"
+                          b"20201019133326,10.20.30.2/16,1\n"
+                          b"20201019133327,10.20.30.1/16,1\n",
+                          server.udp_address)
+            sender.close()
+            # 各確認日時のデータは、より新しい確認日時のデータを受け取った時点で反映する
+            events = await receive(queue, 5)
+        assert await receive(queue, 1) == [None]
+        return events
+
+    events = asyncio.run(scenario())
+    assert ("response_times", logging.WARNING,
+            "Skipped too long line: " + repr(b"9" * 80)) \
+        in caplog.record_tuples
+    # 捨てた行の残りは、不正な行としても扱わない
+    assert not any("999" in message and "too long" not in message
+                   for message in caplog.messages)
+    assert events[:2] == [
+        {"type": "failure_opened", "address": "10.20.30.1/16",
+         "period": "2020-10-19 13:33:24 ~ 2020-10-19 13:33:25"},
+        {"type": "failure_opened", "address": "10.20.30.2/16",
+         "period": "2020-10-19 13:33:24 ~ 2020-10-19 13:33:25"}]
+    period = "2020-10-19 13:33:24 ~ 2020-10-19 13:33:26"
+    # サブネットの故障期間は、すべてのホストの故障が終了した時点で確定する
+    assert events[2:] == [
+        {"type": "failure", "address": "10.20.30.1/16", "period": period},
+        {"type": "failure", "address": "10.20.30.2/16", "period": period},
+        {"type": "subnet_failure", "subnet": "10.20.0.0/16",
+         "period": period}]
+
+
+def test_analyze():
+    """
+    analyze()メソッドのテスト
+    """
+    test_csv_path = os.path.join(
+        os.path.dirname(os.path.abspath(__file__)),
+        "test_2subnet_eachfail.csv")
+    response_times = ResponseTimes(test_csv_path)
+    expect = {
+        "failure": response_times.find_all_failure(2),
+        "high_load": response_times.find_all_high_load(1, 2),
+        "subnet_failure": response_times.find_all_subnet_failure(1)}
+    assert response_times.analyze(2, (1, 2), 1) == expect
+
+    # 過負荷期間は指定しなければ検出しない
+    start = datetime.datetime(2020, 10, 19, 13, 33, 26)
+    expect = {
+        "failure": response_times.find_all_failure(1, start=start),
+        "high_load": [],
+        "subnet_failure": response_times.find_all_subnet_failure(
+            1, start=start)}
+    assert response_times.analyze(start=start) == expect
+
+
+def test_sweep():
+    """
+    failure_sweep(), subnet_failure_sweep(), high_load_sweep()メソッドのテスト
+    """
+    test_csv_path = os.path.join(
+        os.path.dirname(os.path.abspath(__file__)),
+        "test_1address_4fail.csv")
+    response_times = ResponseTimes(test_csv_path)
+    sweep = response_times.failure_sweep([0, 1, 2, 3, 5])
+    for threshold in [0, 1, 2, 3, 5]:
+        assert sweep[threshold] == response_times.find_all_failure(threshold)
+
+    test_csv_path = os.path.join(
+        os.path.dirname(os.path.abspath(__file__)),
+        "test_2subnet_eachfail.csv")
+    response_times = ResponseTimes(test_csv_path)
+    sweep = response_times.subnet_failure_sweep([1, 2, 3])
+    for threshold in [1, 2, 3]:
+        assert sweep[threshold] \
+            == response_times.find_all_subnet_failure(threshold)
+
+    test_csv_path = os.path.join(
+        os.path.dirname(os.path.abspath(__file__)),
+        "test_1address_4sawtooth.csv")
+    response_times = ResponseTimes(test_csv_path)
+    sweep = response_times.high_load_sweep([1, 2, 3], [2, 2.5, 3])
+    for threshold_count in [1, 2, 3]:
+        for threshold_average in [2, 2.5, 3]:
+            assert sweep[(threshold_count, threshold_average)] \
+                == response_times.find_all_high_load(
+                    threshold_count, threshold_average)
+
+
+def test_stats(caplog):
+    """
+    stats()メソッドと、スキップした行の警告の数の制限のテスト
+    """
+    test_csv_path = os.path.join(
+        os.path.dirname(os.path.abspath(__file__)),
+        "test_includes_invalid_line.csv")
+    response_times = ResponseTimes(test_csv_path, collect_stats=True,
+                                   max_skip_warnings=2)
+    # 3件目以降のスキップした行は、まとめて1回だけ警告する
+    warnings = [message for _, level, message in caplog.record_tuples
+                if level == logging.WARNING]
+    assert warnings == [
+        "Skipped line(2): 20201000133324,10.20.30.1/16,-\n",
+        "Skipped line(3): 20201019133325,169090561,-\n",
+        "Skipped 2 more lines."]
+    response_times.append(["20201019133328,10.20.30.1/16,-",
+                           "20201019133329,10.20.30.1/16,1"])
+    response_times.find_all_failure()
+    stats = response_times.stats()
+    assert stats["lines"] == {"read": 8, "skipped": 4, "duplicated": 1,
+                              "evicted": 0}
+    assert stats["addresses"] == {"10.20.30.1/16": 3}
+    assert stats["phases"]["ingest"]["calls"] == 2
+    assert stats["phases"]["find_all_failure"]["calls"] == 1
+    assert stats["phases"]["parse"]["time"] \
+        <= stats["phases"]["ingest"]["time"]
+
+    # collect_statsを指定しない場合は処理時間を計測しない
+    assert ResponseTimes(test_csv_path).stats()["phases"] == {}
+
+
+def test_lazy_logging():
+    """
+    import時にloggingを設定せず、アプリケーションのログの設定を変えないことのテスト
+    """
+    test_csv_path = os.path.join(
+        os.path.dirname(os.path.abspath(__file__)),
+        "test_1address_1fail.csv")
+    script = """
+import sys
+import response_times
+# import時にはloggingも、並列処理や圧縮ファイルのモジュールも読み込まない
+assert "logging" not in sys.modules
+assert "concurrent.futures" not in sys.modules
+assert "gzip" not in sys.modules
+# 読み込みに時間のかかる型ヒントやアドレスの解析のモジュールも読み込まない
+assert "typing" not in sys.modules
+assert "ipaddress" not in sys.modules
+# アプリケーションが設定したログの設定は変えない
+import logging
+handler = logging.StreamHandler(sys.stderr)
+logging.basicConfig(level=logging.ERROR, handlers=[handler])
+response_times.ResponseTimes(sys.argv[1])
+assert logging.getLogger().handlers == [handler]
+assert logging.getLogger().level == logging.ERROR
+assert logging.getLogger("response_times").level == logging.NOTSET
+"""
+    src_path = os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), "..", "src")
+    result = subprocess.run([sys.executable, "-c", script, test_csv_path],
+                            cwd=src_path, stdout=subprocess.PIPE,
+                            stderr=subprocess.PIPE, text=True)
+    assert result.returncode == 0, result.stderr
+    # INFOのログはアプリケーションの設定(ERROR)に従って出力しない
+    assert result.stdout == ""
+    assert result.stderr == ""
+
+
+def test_find_all_in_time_range():
+    """
+    start, endを指定したときの各メソッドのテスト
+    """
+    test_csv_path = os.path.join(
+        os.path.dirname(os.path.abspath(__file__)),
+        "test_1address_4fail.csv")
+    response_times = ResponseTimes(test_csv_path)
+    # start以前から続いている故障期間も返却し、end以降のデータは使わない
+    expect = [
+        {"address": "10.20.30.1/16", "period": "2020-10-19 13:33:26 ~ 2020-10-19 13:33:28"},
+        {"address": "10.20.30.1/16", "period": "2020-10-19 13:33:29 ~ 2020-10-19 13:33:30"}
+        ]
+    actual = response_times.find_all_failure(
+        start=datetime.datetime(2020, 10, 19, 13, 33, 27),
+        end=datetime.datetime(2020, 10, 19, 13, 33, 30))
+    assert actual == expect
+    expect = [
+        {"address": "10.20.30.1/16", "period": "2020-10-19 13:33:29 ~ 2020-10-19 13:33:32"},
+        {"address": "10.20.30.1/16", "period": "2020-10-19 13:33:33 ~ 2020-10-19 13:33:37"}
+        ]
+    actual = response_times.find_all_failure(
+        start=datetime.datetime(2020, 10, 19, 13, 33, 29))
+    assert actual == expect
+
+    test_csv_path = os.path.join(
+        os.path.dirname(os.path.abspath(__file__)),
+        "test_1address_4sawtooth.csv")
+    response_times = ResponseTimes(test_csv_path)
+    expect = [
+        {"address": "10.20.30.1/16", "period": "2020-10-19 13:33:34 ~ 2020-10-19 13:33:39"},
+        {"address": "10.20.30.1/16", "period": "2020-10-19 13:33:42 ~ 2020-10-19 13:33:44"},
+        ]
+    actual = response_times.find_all_high_load(
+        3, 3, start=datetime.datetime(2020, 10, 19, 13, 33, 35),
+        end=datetime.datetime(2020, 10, 19, 13, 33, 44))
+    assert actual == expect
+
+    test_csv_path = os.path.join(
+        os.path.dirname(os.path.abspath(__file__)),
+        "test_2subnet_eachfail.csv")
+    response_times = ResponseTimes(test_csv_path)
+    assert response_times.find_all_subnet_failure(
+        start=datetime.datetime(2020, 10, 19, 13, 33, 26)) \
+        == response_times.find_all_subnet_failure()
+    assert response_times.find_all_subnet_failure(
+        start=datetime.datetime(2020, 10, 19, 13, 33, 27)) == []